@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the Vendor Recommender System.
+
+Run with the stand-in LLM and embeddings from benchmarks.fakes so no
+Gemini API calls are made.
+"""
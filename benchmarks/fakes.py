@@ -0,0 +1,296 @@
+"""
+Deterministic stand-ins for the Gemini chat model and embeddings.
+
+FakeChatModel answers the extraction, reranking, ranking-only and
+explanation prompts with synthetic (or recorded) JSON, and the vendor
+summary prompt with a summary built from the listed fields, after a
+sampled latency plus an optional per-output-token time; FakeEmbeddings returns
+hash-based vectors so identical texts always embed identically and texts
+sharing words are close together.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+STOPWORDS = {
+    "a", "an", "and", "the", "in", "on", "at", "for", "to", "of", "my", "our", "we",
+    "i", "need", "someone", "looking", "can", "who", "is", "with", "please", "me",
+}
+
+KNOWN_LOCATIONS = (
+    "London", "Leeds", "York", "Manchester", "Birmingham", "Bristol", "Sheffield",
+    "Liverpool", "Newcastle", "Nottingham", "Harrogate", "Tadcaster", "Wellingborough",
+    "Glasgow", "Edinburgh", "Cardiff",
+)
+
+
+# =============================================================================
+# Latency Distributions
+# =============================================================================
+
+class LatencyModel:
+    """
+    Sampled call latency, parsed from a spec string.
+
+    Specs:
+        "0" or "const:0.2"        fixed seconds
+        "uniform:0.1,0.4"         uniform between bounds
+        "normal:0.3,0.05"         normal(mean, stddev), clipped at 0
+        "lognormal:0.3,0.5"       lognormal with median 0.3 and sigma 0.5
+        "spike:0.3,3.0,0.02"      base latency with occasional spikes (probability)
+        "tail:0.3,0.3,3.0,0.02"   lognormal(median, sigma), replaced by a spike with probability
+    """
+
+    def __init__(self, spec: str = "0", seed: int = 0):
+        kind, _, args = spec.partition(":")
+        if not args:
+            kind, args = "const", kind
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",")]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            rng, a = self._rng, self.args
+            if self.kind == "const":
+                return a[0]
+            if self.kind == "uniform":
+                return rng.uniform(a[0], a[1])
+            if self.kind == "normal":
+                return max(0.0, rng.gauss(a[0], a[1]))
+            if self.kind == "lognormal":
+                return rng.lognormvariate(math.log(a[0]), a[1])
+            if self.kind == "spike":
+                return a[1] if rng.random() < a[2] else a[0]
+            if self.kind == "tail":
+                return a[2] if rng.random() < a[3] else rng.lognormvariate(math.log(a[0]), a[1])
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+
+# =============================================================================
+# Chat Model
+# =============================================================================
+
+def _keywords(text: str) -> list[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [w for w in words if w not in STOPWORDS]
+
+
+def synthetic_extraction(query: str) -> dict:
+    """Build a plausible extraction result from the words of a query."""
+    keywords = _keywords(query)
+    location = next((loc for loc in KNOWN_LOCATIONS if loc.lower() in keywords), None)
+    services = [w for w in keywords if not location or w != location.lower()]
+    return {
+        "job_type": services[0] if services else "general",
+        "services_needed": [" ".join(services[i:i + 2]) for i in range(0, len(services), 2)],
+        "location": location,
+        "urgency": "urgent" if {"urgent", "emergency", "now"} & set(keywords) else "normal",
+        "additional_context": None,
+        "optimized_query": " ".join(keywords),
+    }
+
+
+def synthetic_reasoning(cid: str, reasoning_words: int = 40) -> str:
+    return f"Candidate {cid} matches the request: " + " ".join(["evidence"] * reasoning_words)
+
+
+def synthetic_rerank(prompt: str, reasoning_words: int = 40, with_reasoning: bool = True) -> dict:
+    """Rank prompt candidates by their listed similarity score (without reasoning for the ranking-only prompt)."""
+    candidates = re.findall(r"### Candidate ID: (\S+) - .*?- Similarity score: ([0-9.]+)", prompt, re.DOTALL)
+    top_k = int(m.group(1)) if (m := re.search(r"Return ONLY the top (\d+)", prompt)) else 10
+    ordered = sorted(candidates, key=lambda c: float(c[1]), reverse=True)[:top_k]
+    rankings = [
+        {"rank": i + 1, "candidate_id": cid, "relevance_score": round(max(0.0, 1.0 - i * 0.05), 2)}
+        for i, (cid, _) in enumerate(ordered)
+    ]
+    if not with_reasoning:
+        return {"rankings": rankings}
+    for r in rankings:
+        r["reasoning"] = synthetic_reasoning(r["candidate_id"], reasoning_words)
+    return {
+        "user_need_analysis": "Synthetic analysis",
+        "required_service_types": ["synthetic"],
+        "rankings": rankings,
+    }
+
+
+def synthetic_explanations(prompt: str, reasoning_words: int = 40) -> dict:
+    """Reasoning for every vendor listed in an explanation prompt."""
+    ids = re.findall(r"### Candidate ID: (\S+) - ", prompt)
+    return {"explanations": [{"candidate_id": cid, "reasoning": synthetic_reasoning(cid, reasoning_words)} for cid in ids]}
+
+
+def synthetic_summary(prompt: str, max_services: int = 6) -> str:
+    """Compact vendor summary assembled from the "- Label: value" lines of a summary prompt."""
+    fields = dict(re.findall(r"^- (Services|Industry|City|Certifications): (.+)$", prompt, re.MULTILINE))
+    services = [s.strip() for s in re.split(r"[,;]", fields.get("Services", "")) if s.strip()]
+    parts = []
+    if services:
+        parts.append("Services: " + ", ".join(services[:max_services]) + ".")
+    if fields.get("Industry"):
+        parts.append(f"Sector: {fields['Industry']}.")
+    if fields.get("City"):
+        parts.append(f"Region: {fields['City']}.")
+    if fields.get("Certifications"):
+        parts.append(f"Certified: {fields['Certifications']}.")
+    return " ".join(parts) or "No details available."
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatGoogleGenerativeAI with invoke/ainvoke.
+
+    Responses come from a recording (JSONL of {"prompt_sha", "content"}) when
+    one matches the prompt, otherwise they are synthesised from the prompt.
+    Each call takes a sampled latency plus token_latency_s per output token
+    (models generate output tokens sequentially).
+    """
+
+    def __init__(
+        self,
+        latency: str = "0",
+        seed: int = 0,
+        recording: Optional[str] = None,
+        reasoning_words: int = 40,
+        token_latency_s: float = 0.0,
+    ):
+        self.latency = LatencyModel(latency, seed)
+        self.reasoning_words = reasoning_words
+        self.token_latency_s = token_latency_s
+        self.recorded: dict[str, str] = {}
+        self.calls = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+        if recording:
+            for line in Path(recording).read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recorded[entry["prompt_sha"]] = entry["content"]
+
+    @staticmethod
+    def prompt_sha(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _respond(self, prompt: str) -> AIMessage:
+        content = self.recorded.get(self.prompt_sha(prompt))
+        if content is None:
+            if "job request analyzer" in prompt:
+                query = re.findall(r'User: "(.*)"', prompt)[-1]
+                content = json.dumps(synthetic_extraction(query))
+            elif "vendor summary writer" in prompt:
+                content = synthetic_summary(prompt)
+            elif "recommendation explainer" in prompt:
+                content = json.dumps(synthetic_explanations(prompt, self.reasoning_words))
+            else:
+                with_reasoning = "Return rankings only" not in prompt
+                content = json.dumps(synthetic_rerank(prompt, self.reasoning_words, with_reasoning))
+        with self._lock:
+            self.calls += 1
+            self.output_tokens += len(content) // 4
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+
+    def _delay(self, response: AIMessage) -> float:
+        return self.latency.sample() + self.token_latency_s * response.usage_metadata["output_tokens"]
+
+    def invoke(self, prompt, *args, **kwargs) -> AIMessage:
+        response = self._respond(prompt)
+        time.sleep(self._delay(response))
+        return response
+
+    async def ainvoke(self, prompt, *args, **kwargs) -> AIMessage:
+        response = self._respond(prompt)
+        await asyncio.sleep(self._delay(response))
+        return response
+
+
+# =============================================================================
+# Embeddings
+# =============================================================================
+
+def hash_vector(text: str, dimensions: int) -> list[float]:
+    """Signed feature-hashing of the words of text, L2-normalised."""
+    vec = [0.0] * dimensions
+    for word in _keywords(text) or [text]:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vec[value % dimensions] += 1.0 if (value >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-based embeddings with a per-call latency."""
+
+    def __init__(self, dimensions: int = 256, latency: str = "0", seed: int = 0):
+        self.dimensions = dimensions
+        self.latency = LatencyModel(latency, seed)
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _count(self, n: int):
+        with self._lock:
+            self.calls += 1
+            self.texts += n
+
+    def embed_documents(self, texts: list[str], output_dimensionality: Optional[int] = None, **kwargs) -> list[list[float]]:
+        self._count(len(texts))
+        time.sleep(self.latency.sample())
+        return [hash_vector(t, output_dimensionality or self.dimensions) for t in texts]
+
+    def embed_query(self, text: str, output_dimensionality: Optional[int] = None, **kwargs) -> list[float]:
+        self._count(1)
+        time.sleep(self.latency.sample())
+        return hash_vector(text, output_dimensionality or self.dimensions)
+
+
+def install_fakes(
+    llm_latency: str = "0",
+    embedding_latency: str = "0",
+    dimensions: int = 256,
+    seed: int = 0,
+    recording: Optional[str] = None,
+    token_latency_s: float = 0.0,
+) -> tuple[FakeChatModel, FakeEmbeddings]:
+    """Route providers.get_llm/get_embeddings to shared fake instances."""
+    import providers
+
+    llm = FakeChatModel(latency=llm_latency, seed=seed, recording=recording, token_latency_s=token_latency_s)
+    embeddings = FakeEmbeddings(dimensions=dimensions, latency=embedding_latency, seed=seed)
+    providers.set_providers(llm=lambda: llm, embeddings=lambda task_type: embeddings)
+    return llm, embeddings
+
+
+def install_stub_providers(llm_latency: Optional[str] = None, embeddings: bool = False):
+    """
+    Route only the chosen providers to fakes (run_server.py --stub-llm /
+    --stub-embeddings); also used to set up each worker process.
+    """
+    import providers
+
+    llm = FakeChatModel(latency=llm_latency) if llm_latency is not None else None
+    fake_embeddings = FakeEmbeddings() if embeddings else None
+    providers.set_providers(
+        llm=(lambda: llm) if llm else None,
+        embeddings=(lambda task_type: fake_embeddings) if fake_embeddings else None,
+    )
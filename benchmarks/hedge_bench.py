@@ -0,0 +1,143 @@
+"""
+Hedged LLM calls: tail latency vs extra call cost.
+
+Indexes synthetic vendors with the stand-in embeddings, then runs the same
+requests twice against a stand-in LLM whose latency has occasional spikes
+(--llm-latency, default: lognormal around 50 ms, 3% of calls take 1 s):
+  - off: LLM_HEDGING off (calls still bounded by LLM_TIMEOUT_S)
+  - on:  a duplicate call after the node's observed p95 call latency
+
+Each mode starts with --warmup unmeasured requests so the latency
+history the hedge delay comes from is filled. Reports end-to-end p50 /
+p95 / p99, LLM calls per request, extra calls (%) and the token cost of
+responses that lost the race.
+
+Usage:
+    python -m benchmarks.hedge_bench
+    python -m benchmarks.hedge_bench --requests 1000 --concurrency 16 --llm-latency tail:0.3,0.3,3.0,0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Every request must reach the LLM
+os.environ.setdefault("RESULT_CACHE", "0")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.run_benchmarks import bench_indexing  # noqa: E402
+from benchmarks.synthetic import SAMPLE_QUERIES  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure tail latency and extra cost of hedged LLM calls.")
+    parser.add_argument("--vendors", type=int, default=1000, help="Synthetic vendors to index.")
+    parser.add_argument("--requests", type=int, default=400, help="Measured requests per mode.")
+    parser.add_argument("--warmup", type=int, default=40, help="Unmeasured requests per mode.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", default="tail:0.05,0.2,1.0,0.03", help="Stand-in LLM latency distribution.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def longest_call_s(spec: str) -> float:
+    """Spike length of a spike/tail latency spec (0 for other distributions)."""
+    kind, _, params = spec.partition(":")
+    return float(params.split(",")[-2]) if kind in ("spike", "tail") else 0.0
+
+
+def run_mode(name: str, hedging: bool, args, llm) -> dict:
+    import config
+    from graph.instrumentation import REGISTRY
+    from graph.workflow import run_recommendation
+
+    config.LLM_HEDGING = hedging
+    REGISTRY.reset()
+
+    def timed(query: str) -> float:
+        start = time.perf_counter()
+        run_recommendation(query)
+        return time.perf_counter() - start
+
+    # Distinct queries so coalescing never merges requests
+    def queries(tag: str, n: int) -> list[str]:
+        return [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} ({name} {tag} {i})" for i in range(n)]
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(timed, queries("warmup", args.warmup)))
+        calls_before = llm.calls
+        wasted_before = sum(REGISTRY.counter("llm_hedge_wasted_cost_usd_total", node=n) for n in ("extract", "rerank"))
+        cost_before = sum(REGISTRY.counter("llm_cost_usd_total", node=n) for n in ("extract", "rerank"))
+        latencies = list(pool.map(timed, queries("run", args.requests)))
+    # Let abandoned calls finish so their calls and cost are counted
+    time.sleep(max(longest_call_s(args.llm_latency), 0.1))
+
+    calls = llm.calls - calls_before
+    cost = sum(REGISTRY.counter("llm_cost_usd_total", node=n) for n in ("extract", "rerank")) - cost_before
+    wasted = sum(REGISTRY.counter("llm_hedge_wasted_cost_usd_total", node=n) for n in ("extract", "rerank")) - wasted_before
+    result = {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "llm_calls_per_request": round(calls / args.requests, 3),
+        "hedged_calls": int(sum(REGISTRY.counter("hedged_calls_total", node=n) for n in ("extract", "rerank"))),
+        "hedge_wins": int(sum(REGISTRY.counter("hedge_wins_total", node=n) for n in ("extract", "rerank"))),
+        "llm_timeouts": int(sum(REGISTRY.counter("llm_timeouts_total", node=n) for n in ("extract", "rerank"))),
+        "wasted_cost_pct": round(100 * wasted / cost, 2) if cost else 0.0,
+    }
+    print(f"  {name:<4} {json.dumps(result)}", file=sys.stderr)
+    return result
+
+
+def main():
+    args = parse_args()
+    llm, _ = install_fakes(llm_latency=args.llm_latency, embedding_latency="const:0", seed=args.seed)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-hedge-") as workdir:
+        os.chdir(workdir)
+        try:
+            bench_indexing(args.vendors, args.seed)
+            from graph.workflow import run_recommendation
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_recommendation(SAMPLE_QUERIES[0])
+
+            results = {"config": {k: v for k, v in vars(args).items() if k != "output"}}
+            results["off"] = run_mode("off", False, args, llm)
+            results["on"] = run_mode("on", True, args, llm)
+        finally:
+            os.chdir(cwd)
+
+    off, on = results["off"], results["on"]
+    results["p99_reduction_pct"] = round(100 * (1 - on["p99_ms"] / off["p99_ms"]), 1)
+    results["extra_calls_pct"] = round(100 * (on["llm_calls_per_request"] / off["llm_calls_per_request"] - 1), 1)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved hedging results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Import-time budget check for the CLI entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each target, keeps the best of several runs, and fails (exit 1) when a
+target exceeds its budget or pulls in one of the heavy SDKs that should
+only load on first use.
+
+Usage (from the repo root):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 5 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Entry module -> budget in milliseconds (cumulative import time)
+TARGETS = {
+    "config": 100,
+    "providers": 150,
+    "preprocessing.embeddings": 200,
+    "run_preprocessing": 250,
+    "graph.workflow": 500,
+    "run_recommender": 500,
+    "run_server": 150,
+}
+
+# Packages that must not be imported until a client / store / graph is built
+FORBIDDEN = (
+    "langchain_google_genai",
+    "google.genai",
+    "langchain_chroma",
+    "chromadb",
+    "langgraph",
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check import time of the entry points.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per target (best is kept).")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list per target.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget (slow machines).")
+    return parser.parse_args()
+
+
+def measure(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds per module imported by the target."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name == "site":
+            # Everything so far was interpreter startup, not the target
+            times.clear()
+            continue
+        times[name] = int(cumulative)
+    return times
+
+
+def main():
+    args = parse_args()
+    failures = []
+
+    for module, budget_ms in TARGETS.items():
+        runs = [measure(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda times: times.get(module, 0))
+        total_ms = best.get(module, 0) / 1000
+        budget_ms *= args.scale
+
+        heavy = sorted(name for name in best if name.split(".")[0] in FORBIDDEN or name in FORBIDDEN)
+        status = "ok" if total_ms <= budget_ms and not heavy else "FAIL"
+        print(f"{module:28s} {total_ms:8.1f} ms  (budget {budget_ms:.0f} ms)  {status}")
+
+        slowest = sorted(
+            ((name, us) for name, us in best.items() if name != module),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        for name, us in slowest:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+
+        if total_ms > budget_ms:
+            failures.append(f"{module}: {total_ms:.1f} ms > {budget_ms:.0f} ms")
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy[:5])}")
+
+    if failures:
+        print("\nImport-time check failed:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nAll entry points within budget.")
+
+
+if __name__ == "__main__":
+    main()
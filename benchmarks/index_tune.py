@@ -0,0 +1,266 @@
+"""
+HNSW parameter sweep: recall / latency / memory Pareto front.
+
+Embeds the processed vendors once (cached in --cache), then for every
+distance space, M and ef_construction builds a Chroma collection from the
+precomputed vectors and queries it at each ef_search. Each configuration is
+scored on:
+  - recall@k against exact (brute-force) nearest neighbours in the same space
+  - query latency (mean / p95 ms, one query per call as in retrieval)
+  - index size (HNSW segment files on disk, which the index keeps in memory)
+  - build time
+
+Configurations that no other point beats on all three of recall, latency
+and size form the Pareto front. The fastest front point reaching
+--target-recall is printed as an INDEX_PROFILES entry.
+
+Queries are the sample queries plus vendor service lists used as
+pseudo-queries, or one query per line from --queries.
+
+Usage (Gemini embeddings, needs GOOGLE_API_KEY):
+    python -m benchmarks.index_tune
+    python -m benchmarks.index_tune --spaces cosine --m 8,16,32 --ef-search 16,32,64,128
+Offline, with the hash-based stand-in embeddings:
+    python -m benchmarks.index_tune --stub-embeddings --input vendors_processed.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.synthetic import SAMPLE_QUERIES  # noqa: E402
+from config import INDEX_BATCH_SIZE, TOP_K_RETRIEVAL  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters and report the recall/latency/memory Pareto front.")
+    parser.add_argument("--input", help="Processed vendors (default: newest of vendors_processed.json / .jsonl).")
+    parser.add_argument("--queries", help="File with one query per line (default: sample + pseudo-queries).")
+    parser.add_argument("--pseudo-queries", type=int, default=200, help="Vendor service lists used as queries.")
+    parser.add_argument("--spaces", default="l2,cosine,ip")
+    parser.add_argument("--m", default="8,16,32", help="Comma-separated M (max_neighbors) values.")
+    parser.add_argument("--ef-construction", default="64,128,256")
+    parser.add_argument("--ef-search", default="16,32,64,128")
+    parser.add_argument("--k", type=int, default=TOP_K_RETRIEVAL)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use the offline hash-based embeddings.")
+    parser.add_argument("--cache", default="output/index_tune_vectors.npz",
+                        help="Embedding cache, reused while the texts are unchanged.")
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",")]
+
+
+def load_inputs(args) -> tuple[list[str], list[str], list[str]]:
+    """(vendor ids, vendor texts, query strings)."""
+    from graph.catalog import current_processed_path
+    from preprocessing.jsonstream import iter_records
+
+    path = args.input or current_processed_path()
+    if not path:
+        sys.exit("No processed vendors found; run run_preprocessing.py first or pass --input.")
+    ids, texts, services = [], [], []
+    for record in iter_records(path):
+        ids.append(str(record["id"]))
+        texts.append(record["text"])
+        services.append(record.get("metadata", {}).get("services"))
+
+    if args.queries:
+        queries = [line.strip() for line in Path(args.queries).read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        step = max(1, len(services) // max(args.pseudo_queries, 1))
+        pseudo = [s if isinstance(s, str) else ", ".join(s) for s in services[::step] if s]
+        queries = list(SAMPLE_QUERIES) + pseudo[:args.pseudo_queries]
+    print(f"Loaded {len(ids)} vendors from {path} and {len(queries)} queries", file=sys.stderr)
+    return ids, texts, queries
+
+
+def embed_all(args, texts: list[str], queries: list[str]):
+    """Document and query vectors as float32 arrays, cached on disk."""
+    import numpy as np
+    import providers
+
+    if args.stub_embeddings:
+        from benchmarks.fakes import install_fakes
+        install_fakes()
+
+    digest = hashlib.sha256()
+    digest.update(b"stub" if args.stub_embeddings else b"live")
+    for text in (*texts, "\0", *queries):
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\n")
+    digest = digest.hexdigest()
+
+    if args.cache and os.path.exists(args.cache):
+        cached = np.load(args.cache)
+        if str(cached["digest"]) == digest:
+            print(f"Using cached embeddings from {args.cache}", file=sys.stderr)
+            return cached["docs"], cached["queries"]
+
+    doc_embeddings = providers.get_embeddings(task_type="RETRIEVAL_DOCUMENT")
+    query_embeddings = providers.get_embeddings(task_type="RETRIEVAL_QUERY")
+    print(f"Embedding {len(texts)} vendors and {len(queries)} queries...", file=sys.stderr)
+    docs = []
+    for start in range(0, len(texts), INDEX_BATCH_SIZE):
+        docs.extend(doc_embeddings.embed_documents(texts[start:start + INDEX_BATCH_SIZE]))
+    query_vectors = query_embeddings.embed_documents(queries)
+    docs, query_vectors = np.asarray(docs, dtype=np.float32), np.asarray(query_vectors, dtype=np.float32)
+
+    if args.cache:
+        os.makedirs(os.path.dirname(args.cache) or ".", exist_ok=True)
+        np.savez(args.cache, digest=digest, docs=docs, queries=query_vectors)
+    return docs, query_vectors
+
+
+def exact_neighbours(docs, queries, space: str, k: int):
+    """Indices of the true k nearest documents per query, using Chroma's distance definitions."""
+    import numpy as np
+
+    if space == "l2":
+        distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ docs.T + (docs ** 2).sum(1)[None, :]
+    elif space == "cosine":
+        qn = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        dn = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+        distances = 1 - qn @ dn.T
+    else:
+        distances = 1 - queries @ docs.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def index_bytes(path: str) -> int:
+    """Size of the HNSW segment files under a persist directory (excludes the SQLite metadata)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        if root == path:
+            continue
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def build(workdir: str, ids: list[str], docs, space: str, m: int, ef_construction: int):
+    import chromadb
+
+    path = os.path.join(workdir, f"{space}-m{m}-efc{ef_construction}")
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(
+        "tune",
+        configuration={"hnsw": {"space": space, "max_neighbors": m, "ef_construction": ef_construction}},
+    )
+    batch = client.get_max_batch_size()
+    start = time.perf_counter()
+    for offset in range(0, len(ids), batch):
+        collection.add(ids=ids[offset:offset + batch], embeddings=docs[offset:offset + batch])
+    return collection, path, time.perf_counter() - start
+
+
+def reopen_with_ef(collection, path: str, ef_search: int):
+    """Set ef_search and reopen the collection; a loaded index keeps the ef it was opened with."""
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+
+    collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(path=path).get_collection("tune")
+
+
+def measure(collection, ids: list[str], queries, truth, k: int) -> dict:
+    position = {doc_id: i for i, doc_id in enumerate(ids)}
+    latencies, hits = [], 0
+    for vector, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = collection.query(query_embeddings=[vector], n_results=k, include=[])["ids"][0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({position[doc_id] for doc_id in found} & set(expected.tolist()))
+    latencies.sort()
+    return {
+        "recall": round(hits / (len(truth) * k), 4),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+    }
+
+
+def pareto_front(points: list[dict]) -> list[dict]:
+    """Points not dominated on (recall higher, mean_ms lower, index_mb lower)."""
+    def dominates(a, b):
+        better_or_equal = a["recall"] >= b["recall"] and a["mean_ms"] <= b["mean_ms"] and a["index_mb"] <= b["index_mb"]
+        strictly = a["recall"] > b["recall"] or a["mean_ms"] < b["mean_ms"] or a["index_mb"] < b["index_mb"]
+        return better_or_equal and strictly
+    return [p for p in points if not any(dominates(q, p) for q in points if q is not p)]
+
+
+def main():
+    args = parse_args()
+    if args.stub_embeddings:
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+    ids, texts, queries = load_inputs(args)
+    docs, query_vectors = embed_all(args, texts, queries)
+    k = min(args.k, len(ids))
+
+    points = []
+    with tempfile.TemporaryDirectory(prefix="vendor-tune-") as workdir:
+        for space in args.spaces.split(","):
+            truth = exact_neighbours(docs, query_vectors, space, k)
+            for m in ints(args.m):
+                for ef_construction in ints(args.ef_construction):
+                    collection, path, build_s = build(workdir, ids, docs, space, m, ef_construction)
+                    size_mb = round(index_bytes(path) / 2**20, 3)
+                    for ef_search in ints(args.ef_search):
+                        collection = reopen_with_ef(collection, path, ef_search)
+                        point = {
+                            "space": space, "M": m, "ef_construction": ef_construction, "ef_search": ef_search,
+                            **measure(collection, ids, query_vectors, truth, k),
+                            "index_mb": size_mb, "build_s": round(build_s, 3),
+                        }
+                        points.append(point)
+                        print(f"  {space:<6} M={m:<3} efc={ef_construction:<4} ef={ef_search:<4} "
+                              f"recall={point['recall']:.3f} mean={point['mean_ms']:.2f}ms "
+                              f"index={size_mb:.2f}MB build={build_s:.1f}s", file=sys.stderr)
+
+    front = sorted(pareto_front(points), key=lambda p: (-p["recall"], p["mean_ms"]))
+    for point in points:
+        point["pareto"] = point in front
+    good = [p for p in front if p["recall"] >= args.target_recall]
+    recommended = min(good, key=lambda p: p["mean_ms"]) if good else front[0]
+
+    print(f"\nPareto front ({len(front)} of {len(points)} configurations):", file=sys.stderr)
+    print(f"  {'space':<7}{'M':>4}{'efc':>6}{'ef':>6}{'recall':>9}{'mean ms':>10}{'p95 ms':>9}{'index MB':>10}",
+          file=sys.stderr)
+    for p in front:
+        print(f"  {p['space']:<7}{p['M']:>4}{p['ef_construction']:>6}{p['ef_search']:>6}{p['recall']:>9.3f}"
+              f"{p['mean_ms']:>10.2f}{p['p95_ms']:>9.2f}{p['index_mb']:>10.2f}", file=sys.stderr)
+    profile = {key: recommended[key] for key in ("space", "M", "ef_construction", "ef_search")}
+    print(f"\nRecommended (fastest with recall >= {args.target_recall}): "
+          f'INDEX_PROFILES["tuned"] = {json.dumps(profile)}', file=sys.stderr)
+
+    results = {
+        "config": {key: v for key, v in vars(args).items() if key != "output"},
+        "vendors": len(ids),
+        "queries": len(queries),
+        "k": k,
+        "points": points,
+        "pareto_front": front,
+        "recommended": profile,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved index tuning results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Closed-loop load test against a running recommendation service.
+
+Start the service with the stub LLM first, e.g.:
+    python run_server.py --stub-llm --stub-latency lognormal:0.3,0.3
+
+Then:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 32 --requests 500
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from benchmarks.synthetic import SAMPLE_QUERIES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the /recommend endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/recommend")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client socket timeout.")
+    parser.add_argument("--output", help="Write results JSON to this path.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    target = urlparse(args.url)
+    local = threading.local()
+
+    def connection() -> http.client.HTTPConnection:
+        # One keep-alive connection per client thread
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=args.timeout)
+        return local.conn
+
+    def one(i: int) -> tuple[int, float]:
+        body = json.dumps({"query": SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]})
+        start = time.perf_counter()
+        try:
+            conn = connection()
+            conn.request("POST", args.path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            local.__dict__.pop("conn", None)
+            status = 0
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    ok = sorted(latency for status, latency in results if status == 200)
+
+    def pct(q: float):
+        return round(ok[min(len(ok) - 1, round(q * (len(ok) - 1)))] * 1000, 1) if ok else None
+
+    report = {
+        "url": args.url + args.path,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "statuses": dict(statuses),
+        "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Sequential versus pipelined indexing with the stand-in embeddings.
+
+Indexes the same synthetic vendors twice into a fresh collection:
+  - sequential: iter_processed -> index_vendor_stream (each batch is
+    preprocessed, embedded and written before the next starts)
+  - pipelined:  run_index_pipeline with concurrent embed workers
+
+and reports wall time next to the pipeline's per-stage times, so the
+result can be compared with max(stage) and sum(stage).
+
+Usage:
+    python -m benchmarks.pipeline_bench
+    python -m benchmarks.pipeline_bench --vendors 20000 --embedding-latency lognormal:0.3,0.3 --embed-workers 8
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.synthetic import write_vendors  # noqa: E402
+from config import INDEX_BATCH_SIZE, PIPELINE_EMBED_WORKERS, PIPELINE_QUEUE_SIZE  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare sequential and pipelined indexing.")
+    parser.add_argument("--vendors", type=int, default=5000)
+    parser.add_argument("--embedding-latency", default="const:0.1",
+                        help="Per-call latency of the fake embeddings (a remote API round trip).")
+    parser.add_argument("--embed-workers", type=int, default=PIPELINE_EMBED_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    install_fakes(embedding_latency=args.embedding_latency)
+
+    from preprocessing.embeddings import index_vendor_stream
+    from preprocessing.jsonstream import iter_records
+    from preprocessing.pipeline import run_index_pipeline
+    from preprocessing.preprocess import iter_processed
+
+    results = {"config": {k: v for k, v in vars(args).items() if k != "output"}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-pipe-") as workdir:
+        os.chdir(workdir)
+        try:
+            write_vendors("all_results.jsonl", args.vendors, jsonl=True)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                # Open the store once so neither run pays client start-up
+                index_vendor_stream([], reset=True)
+
+                start = time.perf_counter()
+                index_vendor_stream(
+                    iter_processed(iter_records("all_results.jsonl")), reset=True, batch_size=args.batch_size,
+                )
+                sequential_s = time.perf_counter() - start
+
+                report = run_index_pipeline(
+                    iter_processed(iter_records("all_results.jsonl")),
+                    reset=True,
+                    embed_workers=args.embed_workers,
+                    batch_size=args.batch_size,
+                    queue_size=args.queue_size,
+                )
+        finally:
+            os.chdir(cwd)
+
+    results["sequential"] = {
+        "wall_s": round(sequential_s, 3),
+        "records_per_sec": round(args.vendors / sequential_s, 1),
+    }
+    results["pipelined"] = report
+    results["speedup"] = round(sequential_s / report["wall_s"], 2)
+    results["wall_over_max_stage"] = round(report["wall_s"] / report["max_stage_s"], 2)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved pipeline results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Peak memory of preprocessing as the vendor dump grows.
+
+For each dataset size, writes a synthetic all_results.json (or JSONL) and
+measures the traced peak of:
+  - list:   preprocess_vendors + save_processed (whole file in memory)
+  - stream: iter_records -> iter_processed -> JSONL, one record at a time
+  - index:  the stream mode feeding index_vendor_stream with fake embeddings
+            (only with --index; Chroma's own HNSW index still grows with size)
+
+Usage:
+    python -m benchmarks.preprocess_memory --sizes 10000,50000,200000
+    python -m benchmarks.preprocess_memory --sizes 2000,8000 --index
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.synthetic import write_vendors  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocessing peak memory vs dataset size.")
+    parser.add_argument("--sizes", default="5000,20000,80000", help="Comma-separated vendor counts.")
+    parser.add_argument("--jsonl", action="store_true", help="Write the raw dump as JSON Lines.")
+    parser.add_argument("--index", action="store_true", help="Also stream into a Chroma index (fake embeddings).")
+    parser.add_argument("--skip-list", action="store_true", help="Skip the whole-file baseline (large sizes).")
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def traced(fn) -> dict:
+    """Run fn with tracemalloc and report elapsed time and traced peak."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "peak_mb": round(peak / 2**20, 2)}
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    from preprocessing.preprocess import preprocess_vendors, save_processed, iter_processed
+    from preprocessing.jsonstream import iter_records, write_jsonl, tee_jsonl
+
+    if args.index:
+        from benchmarks.fakes import install_fakes
+        install_fakes(embedding_latency="const:0")
+
+    results = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "sizes": {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-prep-") as workdir:
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                raw = "all_results.jsonl" if args.jsonl else "all_results.json"
+                write_vendors(raw, size, jsonl=args.jsonl)
+                row = {"input_mb": round(os.path.getsize(raw) / 2**20, 2)}
+
+                if not args.skip_list:
+                    row["list"] = traced(lambda: save_processed(preprocess_vendors(raw), "processed.json"))
+                row["stream"] = traced(lambda: write_jsonl(iter_processed(iter_records(raw)), "processed.jsonl"))
+
+                if args.index:
+                    from preprocessing.embeddings import index_vendor_stream
+
+                    # Open the Chroma client once untraced so rows compare steady-state memory
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        index_vendor_stream([], reset=True)
+
+                    def stream_index():
+                        records = tee_jsonl(iter_processed(iter_records(raw)), "processed.jsonl")
+                        index_vendor_stream(records, reset=True)
+                    row["index"] = traced(stream_index)
+
+                results["sizes"][str(size)] = row
+                print(f"{size:>9} vendors: {json.dumps(row)}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved preprocessing memory results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Preprocessing throughput (records/sec) versus worker processes.
+
+Writes a synthetic vendor dump (1M vendors by default, JSON Lines) once,
+then preprocesses it serially in-process and with process pools of
+increasing size, checking that every run produces the same ids.
+
+Usage:
+    python -m benchmarks.preprocess_parallel
+    python -m benchmarks.preprocess_parallel --vendors 200000 --workers 1,2,4,8 --chunk-size 5000
+    python -m benchmarks.preprocess_parallel --input big_dump.jsonl --keep
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.synthetic import write_vendors  # noqa: E402
+from config import PREPROCESS_CHUNK_SIZE  # noqa: E402
+from preprocessing.jsonstream import iter_records  # noqa: E402
+from preprocessing.parallel import iter_processed_parallel, iter_raw_units  # noqa: E402
+from preprocessing.preprocess import iter_processed  # noqa: E402
+
+
+def parse_args():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)) | {cores})
+    parser = argparse.ArgumentParser(description="Preprocessing records/sec vs worker processes.")
+    parser.add_argument("--vendors", type=int, default=1_000_000, help="Synthetic vendors to generate.")
+    parser.add_argument("--input", help="Use an existing raw dump instead of generating one.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated dump (prints its path).")
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)),
+                        help="Comma-separated worker counts for the process pool.")
+    parser.add_argument("--chunk-size", type=int, default=PREPROCESS_CHUNK_SIZE)
+    parser.add_argument("--unordered", action="store_true", help="Yield chunks as they finish.")
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def consume(records) -> tuple[int, str]:
+    """Count records and fingerprint their ids (order-independent)."""
+    count = 0
+    digest = 0
+    for record in records:
+        count += 1
+        digest ^= int.from_bytes(hashlib.blake2b(record["id"].encode(), digest_size=8).digest(), "big")
+    return count, f"{digest:016x}"
+
+
+def timed(records) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        count, fingerprint = consume(records)
+        elapsed = time.perf_counter() - start
+    return {
+        "records": count,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round(count / elapsed, 1),
+        "ids": fingerprint,
+    }
+
+
+def main():
+    args = parse_args()
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    tmpdir = None
+    path = args.input
+    if path is None:
+        tmpdir = tempfile.mkdtemp(prefix="vendor-par-")
+        path = os.path.join(tmpdir, "all_results.jsonl")
+        print(f"Generating {args.vendors} synthetic vendors...", file=sys.stderr)
+        write_vendors(path, args.vendors, jsonl=True)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "cpu_count": os.cpu_count(),
+        "input_mb": round(os.path.getsize(path) / 2**20, 1),
+        "runs": {},
+    }
+    try:
+        serial = timed(iter_processed(iter_records(path)))
+        results["runs"]["serial"] = serial
+        print(f"  serial: {serial['records_per_sec']:>10.0f} rec/s", file=sys.stderr)
+
+        for workers in worker_counts:
+            run = timed(iter_processed_parallel(
+                iter_raw_units(path), workers=workers, chunk_size=args.chunk_size, ordered=not args.unordered,
+            ))
+            run["speedup_vs_serial"] = round(run["records_per_sec"] / serial["records_per_sec"], 2)
+            run["ids_match_serial"] = run["ids"] == serial["ids"] and run["records"] == serial["records"]
+            results["runs"][f"workers_{workers}"] = run
+            print(f"  {workers:>2} workers: {run['records_per_sec']:>10.0f} rec/s "
+                  f"(x{run['speedup_vs_serial']})", file=sys.stderr)
+    finally:
+        if tmpdir and not args.keep:
+            os.remove(path)
+            os.rmdir(tmpdir)
+        elif tmpdir:
+            print(f"Kept dump at {path}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved parallel preprocessing results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
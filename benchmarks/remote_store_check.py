@@ -0,0 +1,223 @@
+"""
+Remote Chroma check (CHROMA_MODE=http) against a locally launched server.
+
+Starts `chroma run` on a free port in a temporary directory, then, with the
+stand-in embeddings and LLM:
+  - indexes synthetic vendors through the server and verifies the
+    collection count, with no Chroma files written locally
+  - runs concurrent requests and verifies they all succeed over at most
+    CHROMA_POOL_SIZE pooled connections
+  - stops the server, verifies /health reports it down, starts it again and
+    verifies a request issued during the restart succeeds through retries
+  - rebuilds the index with reset and verifies the count again
+
+Usage:
+    python -m benchmarks.remote_store_check
+    python -m benchmarks.remote_store_check --vendors 5000 --requests 200 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Every request must reach the vector store
+os.environ.setdefault("RESULT_CACHE", "0")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index and search through a locally launched Chroma server.")
+    parser.add_argument("--vendors", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--restart-delay", type=float, default=0.5, help="Seconds the server stays down.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Wait for the server to start.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ChromaServer:
+    """A `chroma run` subprocess on a local port."""
+
+    def __init__(self, path: str, port: int, log_path: str):
+        self.path = path
+        self.port = port
+        self.log_path = log_path
+        self.proc = None
+
+    def start(self, timeout: float):
+        import httpx
+
+        command = shutil.which("chroma")
+        if command is None:
+            raise RuntimeError("The 'chroma' command (from the chromadb package) is not on PATH")
+        with open(self.log_path, "a") as log:
+            self.proc = subprocess.Popen(
+                [command, "run", "--path", self.path, "--host", "127.0.0.1", "--port", str(self.port)],
+                stdout=log, stderr=subprocess.STDOUT,
+            )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Chroma server exited (code {self.proc.returncode}); see {self.log_path}")
+            try:
+                httpx.get(f"http://127.0.0.1:{self.port}/api/v2/heartbeat", timeout=1.0).raise_for_status()
+                return
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"Chroma server not ready after {timeout:g}s")
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            self.proc.wait(timeout=30)
+        self.proc = None
+
+
+def collection_count() -> int:
+    from config import COLLECTION_NAME
+    from preprocessing.chroma_client import get_http_client
+
+    return get_http_client().get_collection(COLLECTION_NAME).count()
+
+
+def local_chroma_files() -> list[str]:
+    from config import CHROMA_PERSIST_DIR
+
+    if not os.path.isdir(CHROMA_PERSIST_DIR):
+        return []
+    # The checkpoint manifest stays local; any Chroma data file would not
+    return [name for name in os.listdir(CHROMA_PERSIST_DIR) if name != os.path.basename("index_manifest.json")]
+
+
+def open_connections() -> int:
+    from preprocessing.chroma_client import get_http_client
+
+    # Pool of the httpx transport wrapped by the retrying transport
+    return len(get_http_client()._server._session._transport.transport._pool.connections)
+
+
+def run_requests(args) -> dict:
+    from graph.workflow import run_recommendation
+    from benchmarks.synthetic import SAMPLE_QUERIES
+
+    # Distinct queries so coalescing never merges requests
+    queries = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} ({i})" for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        states = list(pool.map(run_recommendation, queries))
+    elapsed = time.perf_counter() - start
+    failed = [s["error"] for s in states if s.get("error") or not s.get("candidates")]
+    return {"requests": len(states), "failed": len(failed), "errors": failed[:3], "qps": round(len(states) / elapsed, 2)}
+
+
+def check_restart(args, server: ChromaServer) -> dict:
+    from graph.nodes.retrieve import get_vector_store
+    from preprocessing.chroma_client import chroma_health
+
+    server.stop()
+    down = chroma_health(max_age_s=0)
+    restarter = threading.Timer(args.restart_delay, server.start, args=(args.timeout,))
+    restarter.start()
+    start = time.perf_counter()
+    try:
+        results = get_vector_store().similarity_search_with_score("emergency plumber", k=5)
+        error = None
+    except Exception as e:
+        results, error = [], f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    restarter.join()
+    up = chroma_health(max_age_s=0)
+    return {
+        "health_while_down": down["ok"],
+        "search_during_restart_s": round(elapsed, 2),
+        "search_results": len(results),
+        "search_error": error,
+        "health_after_restart": up["ok"],
+    }
+
+
+def main():
+    args = parse_args()
+    port = free_port()
+    # Read by config at import
+    os.environ.update(CHROMA_MODE="http", CHROMA_HOST="127.0.0.1", CHROMA_PORT=str(port))
+
+    from benchmarks.fakes import install_fakes
+    from benchmarks.run_benchmarks import bench_indexing
+    from config import CHROMA_POOL_SIZE, PROCESSED_DATA_PATH
+
+    install_fakes(llm_latency="const:0", embedding_latency="const:0", seed=args.seed)
+    results: dict = {"config": {k: v for k, v in vars(args).items() if k != "output"}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-remote-") as workdir:
+        os.chdir(workdir)
+        server = ChromaServer(os.path.join(workdir, "server_data"), port, os.path.join(workdir, "chroma.log"))
+        try:
+            server.start(args.timeout)
+            indexed = bench_indexing(args.vendors, args.seed)
+            results["index"] = {
+                "docs_per_sec": indexed["docs_per_sec"],
+                "server_count": collection_count(),
+                "local_chroma_files": local_chroma_files(),
+            }
+            print(f"  index    {json.dumps(results['index'])}", file=sys.stderr)
+
+            results["requests"] = run_requests(args)
+            results["requests"]["open_connections"] = open_connections()
+            print(f"  requests {json.dumps(results['requests'])}", file=sys.stderr)
+
+            results["restart"] = check_restart(args, server)
+            print(f"  restart  {json.dumps(results['restart'])}", file=sys.stderr)
+
+            from preprocessing.embeddings import index_vendors_with_dedup
+
+            index_vendors_with_dedup(PROCESSED_DATA_PATH, reset=True)
+            results["reset"] = {"server_count": collection_count()}
+            print(f"  reset    {json.dumps(results['reset'])}", file=sys.stderr)
+        finally:
+            server.stop()
+            os.chdir(cwd)
+
+    results["ok"] = (
+        results["index"]["server_count"] == indexed["docs"]
+        and not results["index"]["local_chroma_files"]
+        and results["requests"]["failed"] == 0
+        and results["requests"]["open_connections"] <= CHROMA_POOL_SIZE
+        and results["restart"]["health_while_down"] is False
+        and results["restart"]["search_results"] > 0
+        and results["restart"]["health_after_restart"] is True
+        and results["reset"]["server_count"] == indexed["docs"]
+    )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved remote store check results to {args.output}")
+    else:
+        print(text)
+    if not results["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
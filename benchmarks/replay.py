@@ -0,0 +1,172 @@
+"""
+Replay a query log against the current build.
+
+Re-runs the queries of a query log (graph.query_log, written with
+QUERY_LOG=1) through the pipeline with the result and semantic caches off,
+and compares each run with the logged one:
+  - latency: logged vs replayed end-to-end and per-node p50 / p95 (logged
+    cache hits are left out of the logged latencies)
+  - ranking: overlap of the ranked candidate ids and top-1 agreement
+  - extraction: share of queries whose extracted_info changed
+
+The queries with the lowest ranking overlap are listed for inspection.
+
+Usage (Gemini, needs GOOGLE_API_KEY):
+    python -m benchmarks.replay --log output/query_log.jsonl
+    python -m benchmarks.replay --log output/query_log.jsonl --unique --limit 200 --concurrency 4
+Offline, with the stand-in LLM and embeddings (index built with the same stand-ins):
+    python -m benchmarks.replay --stub
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+# Measure the pipeline itself, and don't log the replay as traffic
+os.environ["RESULT_CACHE"] = "0"
+os.environ["SEMANTIC_CACHE"] = "0"
+os.environ["QUERY_LOG"] = "0"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from config import QUERY_LOG_PATH  # noqa: E402
+
+NODES = ("extract", "retrieve", "rerank")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-run a query log and compare latency and rankings.")
+    parser.add_argument("--log", default=QUERY_LOG_PATH, help="Query log to replay.")
+    parser.add_argument("--limit", type=int, help="Replay at most this many entries (most recent).")
+    parser.add_argument("--unique", action="store_true", help="Replay each normalized query once (its latest entry).")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent replayed queries.")
+    parser.add_argument("--worst", type=int, default=10, help="Lowest-overlap queries to list.")
+    parser.add_argument("--stub", action="store_true", help="Use the offline stand-in LLM and embeddings.")
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+    return {"count": len(ordered), "p50_ms": round(at(0.50) * 1000, 1), "p95_ms": round(at(0.95) * 1000, 1)}
+
+
+def load_entries(args) -> list[dict]:
+    from graph.query_log import read_log
+    from graph.workflow import normalize_query
+
+    entries = [e for e in read_log(args.log) if e.get("query")]
+    if args.unique:
+        # Latest entry per query, preferring one that ran the pipeline over a cache hit
+        latest = {}
+        for e in entries:
+            key = normalize_query(e["query"])
+            if key not in latest or not e.get("cache") or latest[key].get("cache"):
+                latest[key] = e
+        entries = sorted(latest.values(), key=lambda e: e.get("ts") or 0)
+    if args.limit:
+        entries = entries[-args.limit:]
+    return entries
+
+
+def replay_one(entry: dict) -> dict:
+    from graph.instrumentation import request_context
+    from graph.workflow import build_initial_state, get_graph
+
+    # The graph is invoked directly (as run_recommendation does with the caches off)
+    # to keep the request record with its node timings
+    with request_context(entry["query"]) as request:
+        state = get_graph().invoke(build_initial_state(entry["query"]))
+        request["error"] = state.get("error")
+    return {"state": state, "latency_s": request["latency_s"], "nodes": request["nodes"]}
+
+
+def compare(entry: dict, replayed: dict) -> dict:
+    from graph.semantic_cache import ranking_agreement
+
+    state = replayed["state"]
+    logged_ranking = entry.get("ranking") or []
+    new_ranking = state.get("ranked_vendors") or []
+    logged_top = logged_ranking[0]["candidate_id"] if logged_ranking else None
+    new_top = new_ranking[0]["candidate_id"] if new_ranking else None
+    return {
+        "query": entry["query"],
+        "overlap": round(ranking_agreement(logged_ranking, new_ranking), 4),
+        "top1_match": logged_top == new_top,
+        "extraction_changed": (entry.get("extracted_info") or None) != (state.get("extracted_info") or None),
+        "error": state.get("error"),
+    }
+
+
+def main():
+    args = parse_args()
+    if args.stub:
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+        from benchmarks.fakes import install_fakes
+        install_fakes()
+
+    if not os.path.exists(args.log):
+        raise SystemExit(f"No query log at {args.log} (serve with QUERY_LOG=1 to record one)")
+    entries = load_entries(args)
+    if not entries:
+        raise SystemExit(f"No entries in {args.log}")
+    print(f"Replaying {len(entries)} logged queries...", file=sys.stderr)
+
+    # Compile the graph and open the vector store and catalog before timing
+    replay_one(entries[0])
+
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        replayed = list(pool.map(replay_one, entries))
+    comparisons = [compare(e, r) for e, r in zip(entries, replayed)]
+
+    # Logged cache hits didn't run the pipeline, so their timings aren't comparable
+    ran = [e for e in entries if not e.get("cache")]
+    latency = {
+        "logged": {
+            "total": percentiles([e["timings"]["total_s"] for e in ran if e.get("timings", {}).get("total_s") is not None]),
+            **{node: percentiles([e["timings"][node] for e in ran if e.get("timings", {}).get(node) is not None])
+               for node in NODES},
+        },
+        "replayed": {
+            "total": percentiles([r["latency_s"] for r in replayed]),
+            **{node: percentiles([r["nodes"][node]["latency_s"] for r in replayed if node in r["nodes"]])
+               for node in NODES},
+        },
+    }
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "queries": len(entries),
+        "latency": latency,
+        "ranking": {
+            "mean_overlap": round(statistics.mean(c["overlap"] for c in comparisons), 4),
+            "top1_agreement": round(sum(c["top1_match"] for c in comparisons) / len(comparisons), 4),
+            "extraction_changed": round(sum(c["extraction_changed"] for c in comparisons) / len(comparisons), 4),
+            "errors": sum(1 for c in comparisons if c["error"]),
+        },
+        "worst": sorted(comparisons, key=lambda c: c["overlap"])[:args.worst],
+    }
+    for side in ("logged", "replayed"):
+        print(f"  {side:<9} {json.dumps(latency[side]['total'])}", file=sys.stderr)
+    print(f"  ranking   {json.dumps(results['ranking'])}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved replay results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
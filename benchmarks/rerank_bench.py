@@ -0,0 +1,156 @@
+"""
+Two-phase rerank: time-to-ranking and output tokens vs the single CoT call.
+
+Indexes synthetic vendors with the stand-in embeddings, then runs the same
+requests in two modes against a stand-in LLM whose latency grows with the
+length of its response (--token-latency seconds per output token):
+  - full:      RERANK_MODE=full, the ranking arrives with reasoning for every vendor
+  - two_phase: RERANK_MODE=two_phase, the ranking arrives with IDs and scores only;
+               reasoning is then written for the top --expand vendors (what a
+               client opening a few results asks for), then for the rest
+
+Reports time-to-ranking p50 / p95, output tokens per request for the
+ranking alone, with --expand explanations and with all explanations, and
+the latency of the explanation calls.
+
+Usage:
+    python -m benchmarks.rerank_bench
+    python -m benchmarks.rerank_bench --requests 200 --concurrency 8 --token-latency 0.004 --expand 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Every request must reach the LLM
+os.environ.setdefault("RESULT_CACHE", "0")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.run_benchmarks import bench_indexing  # noqa: E402
+from benchmarks.synthetic import SAMPLE_QUERIES  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare single-call and two-phase reranking.")
+    parser.add_argument("--vendors", type=int, default=1000, help="Synthetic vendors to index.")
+    parser.add_argument("--requests", type=int, default=60, help="Measured requests per mode.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--expand", type=int, default=3, help="Vendors whose reasoning is requested first.")
+    parser.add_argument("--llm-latency", default="lognormal:0.3,0.2", help="Stand-in LLM base latency per call.")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Stand-in LLM seconds per output token.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def latency_ms(values: list[float]) -> dict:
+    return {"p50_ms": round(percentile(values, 0.50) * 1000, 1), "p95_ms": round(percentile(values, 0.95) * 1000, 1)}
+
+
+def timed(fn, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run_mode(mode: str, args, llm) -> dict:
+    import config
+    from graph.explanations import get_explanations
+    from graph.workflow import run_recommendation
+
+    config.RERANK_MODE = mode
+    # Distinct queries so coalescing and the explanation cache never merge requests
+    queries = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} ({mode} {i})" for i in range(args.requests)]
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        tokens_before = llm.output_tokens
+        runs = list(pool.map(lambda q: timed(run_recommendation, q), queries))
+        ranking_tokens = llm.output_tokens - tokens_before
+        result = {
+            "time_to_ranking": latency_ms([t for t, _ in runs]),
+            "output_tokens_per_request": {"ranking": round(ranking_tokens / args.requests, 1)},
+        }
+        if mode != "two_phase":
+            result["output_tokens_per_request"]["all_reasoning"] = result["output_tokens_per_request"]["ranking"]
+            return result
+
+        ranked_ids = [[v["candidate_id"] for v in state["ranked_vendors"]] for _, state in runs]
+        explain = get_explanations().explain
+
+        tokens_before = llm.output_tokens
+        expanded = list(pool.map(lambda qi: timed(explain, qi[0], qi[1][:args.expand]), zip(queries, ranked_ids)))
+        expand_tokens = llm.output_tokens - tokens_before
+        rest = list(pool.map(lambda qi: timed(explain, qi[0], qi[1]), zip(queries, ranked_ids)))
+        rest_tokens = llm.output_tokens - tokens_before - expand_tokens
+
+    explained = sum(len(e) for _, e in rest)
+    result["explain_top_n"] = latency_ms([t for t, _ in expanded])
+    result["explain_rest"] = latency_ms([t for t, _ in rest])
+    result["output_tokens_per_request"][f"with_top_{args.expand}_reasoning"] = round(
+        (ranking_tokens + expand_tokens) / args.requests, 1
+    )
+    result["output_tokens_per_request"]["all_reasoning"] = round(
+        (ranking_tokens + expand_tokens + rest_tokens) / args.requests, 1
+    )
+    result["explained_share"] = round(explained / max(1, sum(len(ids) for ids in ranked_ids)), 4)
+    return result
+
+
+def main():
+    args = parse_args()
+    llm, _ = install_fakes(
+        llm_latency=args.llm_latency, embedding_latency="const:0", seed=args.seed, token_latency_s=args.token_latency,
+    )
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-rerank-") as workdir:
+        os.chdir(workdir)
+        try:
+            bench_indexing(args.vendors, args.seed)
+            from graph.workflow import run_recommendation
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_recommendation(SAMPLE_QUERIES[0])
+
+            results = {"config": {k: v for k, v in vars(args).items() if k != "output"}}
+            for mode in ("full", "two_phase"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[mode] = run_mode(mode, args, llm)
+                print(f"  {mode:<9} {json.dumps(results[mode])}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    full, two = results["full"], results["two_phase"]
+    results["time_to_ranking_p50_reduction_pct"] = round(
+        100 * (1 - two["time_to_ranking"]["p50_ms"] / full["time_to_ranking"]["p50_ms"]), 1
+    )
+    results["ranking_output_tokens_reduction_pct"] = round(
+        100 * (1 - two["output_tokens_per_request"]["ranking"] / full["output_tokens_per_request"]["ranking"]), 1
+    )
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved two-phase rerank results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Kill/resume check for checkpointed indexing.
+
+For each indexing mode, runs run_preprocessing.py with the stand-in
+embeddings in a subprocess, SIGKILLs it once the checkpoint manifest shows
+some committed batches, then reruns it with --resume and verifies that:
+  - no document from a committed batch is embedded again
+  - the final collection holds every processed vendor exactly once
+  - the manifest is marked complete
+
+Usage:
+    python -m benchmarks.resume_check
+    python -m benchmarks.resume_check --vendors 5000 --modes stream,pipelined --kill-after 0.5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.synthetic import write_vendors  # noqa: E402
+from config import (  # noqa: E402
+    CHROMA_PERSIST_DIR,
+    INDEX_MANIFEST_PATH,
+    PROCESSED_DATA_PATH,
+    PROCESSED_JSONL_PATH,
+    RAW_DATA_PATH,
+)
+from preprocessing.jsonstream import iter_records  # noqa: E402
+from preprocessing.manifest import IndexManifest  # noqa: E402
+
+MODES = {
+    "default": ([], PROCESSED_DATA_PATH),
+    "stream": (["--stream"], PROCESSED_JSONL_PATH),
+    "pipelined": (["--pipelined"], PROCESSED_JSONL_PATH),
+}
+RESULT_PREFIX = "RESUME_CHECK_RESULT "
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kill indexing mid-run, resume, and verify nothing is re-embedded.")
+    parser.add_argument("--vendors", type=int, default=3000)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to check.")
+    parser.add_argument("--embedding-latency", default="const:0.1",
+                        help="Per-call latency of the fake embeddings (slows the run enough to kill it).")
+    parser.add_argument("--kill-after", type=float, default=0.4,
+                        help="Kill once this fraction of vendors is committed.")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    # Internal: run run_preprocessing.py in this process with fake embeddings
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("cli_args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def run_child(args):
+    """Run the real CLI with embeddings that record every document text they embed."""
+    import providers
+    import run_preprocessing
+    from benchmarks.fakes import FakeEmbeddings
+    from preprocessing.embeddings import load_vector_store
+
+    class RecordingEmbeddings(FakeEmbeddings):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.embedded: list[str] = []
+
+        def embed_documents(self, texts, *a, **kw):
+            with self._lock:
+                self.embedded.extend(text_key(t) for t in texts)
+            return super().embed_documents(texts, *a, **kw)
+
+    embeddings = RecordingEmbeddings(latency=args.embedding_latency)
+    providers.set_providers(embeddings=lambda task_type: embeddings)
+
+    cli_args = [a for a in args.cli_args if a != "--"]
+    sys.argv = ["run_preprocessing.py", *cli_args]
+    run_preprocessing.main()
+
+    count = load_vector_store(embeddings)._collection.count()
+    print(RESULT_PREFIX + json.dumps({"embedded": embeddings.embedded, "count": count}), flush=True)
+
+
+def child_command(args, cli_args: list[str]) -> list[str]:
+    return [
+        sys.executable, "-m", "benchmarks.resume_check", "--child",
+        "--embedding-latency", args.embedding_latency, "--", *cli_args,
+    ]
+
+
+def read_manifest() -> Optional[dict]:
+    """Manifest data, journal included, without compacting it under the running indexer."""
+    try:
+        manifest = IndexManifest.read(INDEX_MANIFEST_PATH)
+    except json.JSONDecodeError:
+        return None
+    return manifest.data if manifest is not None else None
+
+
+def committed_documents() -> int:
+    manifest = read_manifest()
+    return manifest["documents"] if manifest is not None else 0
+
+
+def committed_keys(manifest: dict, processed_path: str) -> set[str]:
+    """Text keys of every processed record inside a committed batch."""
+    ranges = [tuple(map(int, key.split("-"))) for key in manifest["batches"]]
+    keys = set()
+    for position, record in enumerate(iter_records(processed_path)):
+        if any(start <= position < end for start, end in ranges):
+            keys.add(text_key(record["text"]))
+    return keys
+
+
+def check_mode(args, mode: str, env: dict) -> dict:
+    flags, processed_path = MODES[mode]
+    for path in (CHROMA_PERSIST_DIR, PROCESSED_DATA_PATH, PROCESSED_JSONL_PATH):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    # First run: kill it once enough batches are committed
+    target = int(args.vendors * args.kill_after)
+    with open(f"{mode}_killed.log", "w") as log:
+        proc = subprocess.Popen(child_command(args, flags), stdout=log, stderr=subprocess.STDOUT, env=env)
+        deadline = time.monotonic() + args.timeout
+        while committed_documents() < target:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{mode}: run finished before it could be killed; "
+                                   "raise --embedding-latency or lower --kill-after")
+            if time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError(f"{mode}: no progress within {args.timeout}s")
+            time.sleep(0.02)
+        proc.send_signal(signal.SIGKILL)
+        proc.wait()
+
+    manifest_at_kill = read_manifest()
+
+    # Second run: resume
+    start = time.perf_counter()
+    resumed = subprocess.run(child_command(args, [*flags, "--resume"]), capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    Path(f"{mode}_resumed.log").write_text(resumed.stdout + resumed.stderr)
+    if resumed.returncode != 0:
+        raise RuntimeError(f"{mode}: resumed run failed:\n{resumed.stdout[-2000:]}{resumed.stderr[-2000:]}")
+    line = next(l for l in resumed.stdout.splitlines() if l.startswith(RESULT_PREFIX))
+    result = json.loads(line[len(RESULT_PREFIX):])
+
+    manifest_final = read_manifest()
+    # Streaming modes publish the processed file only at the end, so map the
+    # committed ranges onto the (deterministic) output of the resumed run
+    committed = committed_keys(manifest_at_kill, processed_path)
+    expected = sum(1 for _ in iter_records(processed_path))
+
+    re_embedded = sum(1 for key in result["embedded"] if key in committed)
+    row = {
+        "committed_at_kill": len(committed),
+        "embedded_on_resume": len(result["embedded"]),
+        "re_embedded_committed": re_embedded,
+        "final_count": result["count"],
+        "expected_count": expected,
+        "manifest_complete": manifest_final["complete"],
+        "resume_seconds": round(elapsed, 2),
+    }
+    row["ok"] = (
+        re_embedded == 0
+        and len(committed) > 0
+        and result["count"] == expected
+        and manifest_final["complete"]
+    )
+    return row
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+    results = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "child", "cli_args")}, "modes": {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-resume-") as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs(os.path.dirname(RAW_DATA_PATH), exist_ok=True)
+            write_vendors(RAW_DATA_PATH, args.vendors)
+            for mode in args.modes.split(","):
+                row = check_mode(args, mode, env)
+                results["modes"][mode] = row
+                print(f"  {mode:<10} {'OK' if row['ok'] else 'FAIL'} {json.dumps(row)}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved resume check results to {args.output}")
+    else:
+        print(text)
+    if not all(row["ok"] for row in results["modes"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
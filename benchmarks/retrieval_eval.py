@@ -0,0 +1,367 @@
+"""
+Retrieval quality-vs-speed evaluation across index settings.
+
+Takes a labelled JSONL file, one query per line:
+
+    {"query": "burst pipe in Leeds restaurant", "relevant_ids": ["12", "40"],
+     "optimized_query": "...", "services_needed": ["..."], "location": "Leeds"}
+
+(only "query" and "relevant_ids" are required) and sweeps configurations of
+top-k, embedding dimensions, document text variant, index backend,
+multi-query retrieval and the adaptive candidate cut (where top-k is the
+cut's upper bound and the mean number of candidates kept is reported). Document and query vectors are cached on disk, so
+re-running a sweep only embeds texts it has not seen before.
+
+Reports recall@k, MRR, nDCG@k and per-query search latency per
+configuration, and picks the cheapest configuration meeting a recall floor.
+
+Usage:
+    python -m benchmarks.retrieval_eval --labels eval/labels.jsonl
+    python -m benchmarks.retrieval_eval --labels eval/labels.jsonl \\
+        --top-k 10,20,30 --dimensions 768,3072 --text-variants full,core \\
+        --backends chroma,exact --recall-floor 0.9 --output eval.json
+    python -m benchmarks.retrieval_eval --labels eval/labels.jsonl --adaptive off,gap,elbow
+    python -m benchmarks.retrieval_eval --labels eval/labels.jsonl --fake
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import sqlite3
+import sys
+import time
+from array import array
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from config import ADAPTIVE_K_FETCH, EMBEDDING_MODEL  # noqa: E402
+
+# Lines dropped by the "core" text variant: contact and bookkeeping details
+NON_CORE_PREFIXES = (
+    "Record index:", "Address:", "Phone:", "Email:", "Website:", "Employees:",
+    "Extraction confidence:", "Extraction status:",
+)
+
+TEXT_VARIANTS = {
+    "full": lambda text: text,
+    "core": lambda text: "\n".join(
+        line for line in text.splitlines() if not line.startswith(NON_CORE_PREFIXES)
+    ),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency across settings.")
+    parser.add_argument("--labels", required=True, help="Labelled JSONL of queries and relevant ids.")
+    parser.add_argument("--processed",
+                        help="Processed vendors (default: newest of vendors_processed.json / .jsonl).")
+    parser.add_argument("--top-k", default="10,20,30", help="Comma-separated k values.")
+    parser.add_argument("--dimensions", default="3072", help="Comma-separated embedding dimensions.")
+    parser.add_argument("--text-variants", default="full", help=f"Comma-separated: {','.join(TEXT_VARIANTS)}.")
+    parser.add_argument("--backends", default="chroma", help="Comma-separated: chroma,exact.")
+    parser.add_argument("--multi-query", default="off", help="Comma-separated: off,on.")
+    parser.add_argument("--adaptive", default="off", help="Comma-separated adaptive cut methods: off,gap,elbow.")
+    parser.add_argument("--recall-floor", type=float, default=0.9, help="Minimum mean recall@k.")
+    parser.add_argument("--cache", default="output/eval_vector_cache.sqlite", help="Vector cache path.")
+    parser.add_argument("--fake", action="store_true", help="Use hash-based fake embeddings (offline).")
+    parser.add_argument("--output", help="Write results JSON to this path.")
+    return parser.parse_args()
+
+
+# =============================================================================
+# Vector Cache
+# =============================================================================
+
+class VectorCache:
+    """SQLite cache of embeddings keyed by model, task, dimensions and text."""
+
+    def __init__(self, path: str, model: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB)")
+        self.model = model
+
+    def _key(self, text: str, task_type: str, dimensions: int) -> str:
+        raw = f"{self.model}|{task_type}|{dimensions}|{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def embed(self, embeddings, texts: list[str], task_type: str, dimensions: int) -> list[list[float]]:
+        """Return vectors for texts, embedding only cache misses (in one batched call)."""
+        keys = [self._key(t, task_type, dimensions) for t in texts]
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update({k: array("f", v).tolist() for k, v in rows})
+
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            vectors = embeddings.embed_documents(
+                [texts[i] for i in missing], task_type=task_type, output_dimensionality=dimensions
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors VALUES (?, ?)",
+                [(keys[i], array("f", v).tobytes()) for i, v in zip(missing, vectors)],
+            )
+            self.conn.commit()
+            found.update({keys[i]: v for i, v in zip(missing, vectors)})
+
+        return [found[k] for k in keys]
+
+
+# =============================================================================
+# Index Backends
+# =============================================================================
+
+class ExactIndex:
+    """Brute-force L2 search with numpy (ground-truth backend)."""
+
+    def __init__(self, ids: list[str], vectors: list[list[float]]):
+        import numpy as np
+
+        self.np = np
+        self.ids = ids
+        self.matrix = np.asarray(vectors, dtype=np.float32)
+
+    def search(self, vector: list[float], k: int) -> list[tuple[str, float]]:
+        np = self.np
+        dists = ((self.matrix - np.asarray(vector, dtype=np.float32)) ** 2).sum(axis=1)
+        top = np.argsort(dists)[:k]
+        return [(self.ids[i], float(dists[i])) for i in top]
+
+
+class ChromaIndex:
+    """In-memory Chroma collection queried through the langchain retrieval layer."""
+
+    def __init__(self, ids: list[str], vectors: list[list[float]], name: str):
+        import chromadb
+        from langchain_chroma import Chroma
+
+        self.store = Chroma(client=chromadb.EphemeralClient(), collection_name=name)
+        for i in range(0, len(ids), 5000):
+            batch = ids[i:i + 5000]
+            # langchain_chroma drops hits without a document, so store the id as one
+            self.store._collection.add(
+                ids=batch,
+                embeddings=vectors[i:i + 5000],
+                metadatas=[{"doc_id": d} for d in batch],
+                documents=batch,
+            )
+
+    def search(self, vector: list[float], k: int) -> list[tuple[str, float]]:
+        results = self.store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+        return [(doc.metadata["doc_id"], distance) for doc, distance in results]
+
+
+def build_index(backend: str, ids: list[str], vectors: list[list[float]], name: str):
+    if backend == "exact":
+        return ExactIndex(ids, vectors)
+    if backend == "chroma":
+        return ChromaIndex(ids, vectors, name)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+def recall_at_k(retrieved: list[str], relevant: set[str]) -> float:
+    return len(relevant.intersection(retrieved)) / len(relevant) if relevant else 0.0
+
+
+def reciprocal_rank(retrieved: list[str], relevant: set[str]) -> float:
+    for rank, doc_id in enumerate(retrieved, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(retrieved: list[str], relevant: set[str]) -> float:
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, d in enumerate(retrieved, start=1) if d in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), len(retrieved)) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+# =============================================================================
+# Evaluation
+# =============================================================================
+
+def load_labels(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def query_texts(label: dict, multi_query: bool) -> list[str]:
+    """Search texts for one labelled query (optimized query plus sub-queries if enabled)."""
+    from graph.nodes.retrieve import build_sub_queries
+
+    extracted = {
+        "optimized_query": label.get("optimized_query") or label["query"],
+        "services_needed": label.get("services_needed") or [],
+        "location": label.get("location"),
+    }
+    return build_sub_queries(extracted) if multi_query else [extracted["optimized_query"]]
+
+
+class _IdDoc:
+    """Minimal document stand-in carrying only a doc_id for RRF fusion."""
+
+    __slots__ = ("metadata", "page_content")
+
+    def __init__(self, doc_id: str):
+        self.metadata = {"doc_id": doc_id}
+        self.page_content = doc_id
+
+
+def evaluate(index, labels: list[dict], query_vectors: dict, k: int, multi_query: bool, adaptive: str = "off") -> dict:
+    """
+    Search every labelled query and aggregate quality and latency metrics.
+    With an adaptive method, ADAPTIVE_K_FETCH results are fetched and cut as
+    retrieve_node does, with k as the upper bound.
+    """
+    from graph.nodes.retrieve import adaptive_cut_lists, reciprocal_rank_fusion
+
+    fetch_k = k if adaptive == "off" else max(k, ADAPTIVE_K_FETCH)
+    recalls, rrs, ndcgs, latencies, kept = [], [], [], [], []
+    for label in labels:
+        relevant = set(map(str, label["relevant_ids"]))
+        vectors = [query_vectors[t] for t in query_texts(label, multi_query)]
+
+        start = time.perf_counter()
+        result_lists = [index.search(v, fetch_k) for v in vectors]
+        top_k = fetch_k
+        if adaptive != "off":
+            # Each list cut on its own scores before fusion, as retrieve_node does (squared L2 on both backends)
+            result_lists = adaptive_cut_lists(result_lists, "l2", method=adaptive, k_max=k)
+            top_k = k
+        if len(result_lists) > 1:
+            # Fuse with the same RRF used by retrieve_node (docs wrapped as id holders)
+            wrapped = [[(_IdDoc(d), dist) for d, dist in results] for results in result_lists]
+            results = [(doc.metadata["doc_id"], dist) for doc, dist in reciprocal_rank_fusion(wrapped, k=top_k)]
+        else:
+            results = result_lists[0][:top_k]
+        retrieved = [d for d, _ in results]
+        latencies.append((time.perf_counter() - start) * 1000)
+        kept.append(len(retrieved))
+
+        recalls.append(recall_at_k(retrieved, relevant))
+        rrs.append(reciprocal_rank(retrieved, relevant))
+        ndcgs.append(ndcg_at_k(retrieved, relevant))
+
+    n = len(labels)
+    return {
+        "recall_at_k": round(sum(recalls) / n, 4),
+        "mrr": round(sum(rrs) / n, 4),
+        "ndcg_at_k": round(sum(ndcgs) / n, 4),
+        "latency_p50_ms": round(percentile(latencies, 0.50), 3),
+        "latency_p95_ms": round(percentile(latencies, 0.95), 3),
+        "mean_k": round(sum(kept) / n, 2),
+    }
+
+
+def estimated_rerank_tokens(vendors: list[dict], k: float) -> int:
+    """Approximate rerank prompt tokens for k candidates (4 chars per token)."""
+    from graph.nodes.rerank import format_candidates_for_prompt
+
+    sample = vendors[:200]
+    candidates = [{**v["metadata"], "candidate_id": v["id"], "similarity_score": 0.0} for v in sample]
+    avg_chars = len(format_candidates_for_prompt(candidates)) / max(1, len(sample))
+    return int(avg_chars * k / 4)
+
+
+def cheapest(results: list[dict], floor: float):
+    """Cheapest config meeting the recall floor: fewest rerank tokens, then dims, then latency."""
+    passing = [r for r in results if r["metrics"]["recall_at_k"] >= floor]
+    if not passing:
+        return None
+    return min(passing, key=lambda r: (
+        r["cost"]["est_rerank_input_tokens"], r["config"]["dimensions"], r["metrics"]["latency_p50_ms"],
+    ))
+
+
+def main():
+    args = parse_args()
+
+    if args.fake:
+        from benchmarks.fakes import FakeEmbeddings
+        embeddings = FakeEmbeddings()
+    else:
+        import providers
+        embeddings = providers.get_embeddings()
+
+    from graph.catalog import current_processed_path
+    from preprocessing.jsonstream import iter_records
+
+    processed = args.processed or current_processed_path()
+    if not processed:
+        sys.exit("No processed vendors found; run run_preprocessing.py first or pass --processed.")
+    vendors = list(iter_records(processed))
+    labels = load_labels(args.labels)
+    ids = [str(v["id"]) for v in vendors]
+    cache = VectorCache(args.cache, "fake" if args.fake else EMBEDDING_MODEL)
+
+    ks = [int(k) for k in args.top_k.split(",")]
+    dims_list = [int(d) for d in args.dimensions.split(",")]
+    variants = args.text_variants.split(",")
+    backends = args.backends.split(",")
+    multi_modes = [m == "on" for m in args.multi_query.split(",")]
+    adaptive_modes = args.adaptive.split(",")
+
+    print(f"Evaluating {len(labels)} labelled queries against {len(vendors)} vendors")
+    results = []
+    for dims, variant in itertools.product(dims_list, variants):
+        texts = [TEXT_VARIANTS[variant](v["text"]) for v in vendors]
+        doc_vectors = cache.embed(embeddings, texts, "RETRIEVAL_DOCUMENT", dims)
+
+        all_query_texts = sorted({t for label in labels for m in multi_modes for t in query_texts(label, m)})
+        query_vectors = dict(zip(all_query_texts, cache.embed(embeddings, all_query_texts, "RETRIEVAL_QUERY", dims)))
+
+        for backend in backends:
+            start = time.perf_counter()
+            index = build_index(backend, ids, doc_vectors, f"eval_{variant}_{dims}_{backend}")
+            build_s = time.perf_counter() - start
+
+            for k, multi_query, adaptive in itertools.product(ks, multi_modes, adaptive_modes):
+                config = {"top_k": k, "dimensions": dims, "text_variant": variant,
+                          "backend": backend, "multi_query": multi_query, "adaptive": adaptive}
+                metrics = evaluate(index, labels, query_vectors, k, multi_query, adaptive)
+                cost = {
+                    "est_rerank_input_tokens": estimated_rerank_tokens(vendors, metrics["mean_k"]),
+                    "index_vector_mb": round(len(ids) * dims * 4 / (1024 * 1024), 2),
+                    "index_build_s": round(build_s, 3),
+                }
+                results.append({"config": config, "metrics": metrics, "cost": cost})
+                print(
+                    f"  k={k:<3} dims={dims:<5} text={variant:<5} backend={backend:<6} multi={str(multi_query):<5} "
+                    f"adaptive={adaptive:<5} mean_k={metrics['mean_k']:<5} "
+                    f"recall={metrics['recall_at_k']:.3f} mrr={metrics['mrr']:.3f} "
+                    f"ndcg={metrics['ndcg_at_k']:.3f} p50={metrics['latency_p50_ms']:.2f}ms"
+                )
+
+    best = cheapest(results, args.recall_floor)
+    if best:
+        print(f"\nCheapest config with recall@k >= {args.recall_floor}: {best['config']}")
+    else:
+        print(f"\nNo config reached recall@k >= {args.recall_floor}")
+
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps({"recall_floor": args.recall_floor, "results": results, "cheapest": best}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"Saved evaluation results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
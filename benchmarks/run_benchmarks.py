@@ -0,0 +1,225 @@
+"""
+Offline performance benchmark for the recommendation pipeline.
+
+Measures cold start, indexing throughput, per-node latency percentiles,
+end-to-end throughput at several concurrency levels and peak RSS, using
+the stand-in LLM and embeddings from benchmarks.fakes.
+
+Usage:
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --llm-latency lognormal:0.4,0.3 --concurrency 1,8,32
+    python -m benchmarks.run_benchmarks --compare baseline.json --tolerance 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Repeated queries must run the pipeline, not hit the result cache
+os.environ.setdefault("RESULT_CACHE", "0")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.synthetic import SAMPLE_QUERIES, write_vendors  # noqa: E402
+
+# Metrics where a larger value is an improvement; everything else is lower-is-better
+HIGHER_IS_BETTER = ("docs_per_sec", "qps")
+
+NODES = ("extract", "retrieve", "rerank")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark with fake LLM and embeddings.")
+    parser.add_argument("--vendors", type=int, default=2000, help="Synthetic vendors to index.")
+    parser.add_argument("--queries", type=int, default=50, help="Queries for latency percentiles.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--llm-latency", default="lognormal:0.05,0.3", help="LLM latency distribution.")
+    parser.add_argument("--embedding-latency", default="const:0.01", help="Embedding latency distribution.")
+    parser.add_argument("--dimensions", type=int, default=256, help="Fake embedding dimensions.")
+    parser.add_argument("--recording", help="JSONL of recorded LLM responses to replay.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression.")
+    return parser.parse_args()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def bench_cold_start() -> dict:
+    """Time a fresh interpreter importing the pipeline and compiling the graph."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        "from graph.workflow import create_graph; create_graph(); "
+        "print(time.perf_counter() - t)"
+    )
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "GOOGLE_API_KEY": os.environ["GOOGLE_API_KEY"]},
+    )
+    return {
+        "process_s": round(time.perf_counter() - start, 4),
+        "import_and_compile_s": round(float(out.stdout.strip().splitlines()[-1]), 4),
+    }
+
+
+def bench_indexing(vendor_count: int, seed: int) -> dict:
+    """Preprocess and index synthetic vendors into a fresh store in the cwd."""
+    from config import RAW_DATA_PATH, PROCESSED_DATA_PATH
+    from preprocessing.preprocess import preprocess_vendors, save_processed
+    from preprocessing.embeddings import index_vendors_with_dedup
+
+    Path(RAW_DATA_PATH).parent.mkdir(parents=True, exist_ok=True)
+    write_vendors(RAW_DATA_PATH, vendor_count, seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        processed = preprocess_vendors(RAW_DATA_PATH)
+        save_processed(processed, PROCESSED_DATA_PATH)
+        preprocess_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index_vendors_with_dedup(PROCESSED_DATA_PATH, dedup=True, reset=True)
+        index_s = time.perf_counter() - start
+
+    return {
+        "docs": len(processed),
+        "preprocess_s": round(preprocess_s, 4),
+        "index_s": round(index_s, 4),
+        "docs_per_sec": round(len(processed) / index_s, 2),
+    }
+
+
+def bench_latency(query_count: int) -> dict:
+    """Run queries sequentially and report per-node and end-to-end percentiles."""
+    from graph.workflow import run_recommendation
+    from graph.instrumentation import REGISTRY
+
+    REGISTRY.reset()
+    for i in range(query_count):
+        run_recommendation(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+
+    result = {}
+    for node in (*NODES, None):
+        name, labels = ("request_latency_seconds", {}) if node is None else ("node_latency_seconds", {"node": node})
+        result[node or "end_to_end"] = {
+            f"p{int(q * 100)}_ms": round(REGISTRY.quantile(name, q, **labels) * 1000, 3)
+            for q in (0.50, 0.95, 0.99)
+        }
+    return result
+
+
+def bench_throughput(levels: list[int], query_count: int) -> dict:
+    """End-to-end requests/sec at each concurrency level."""
+    from graph.workflow import run_recommendation
+
+    result = {}
+    for level in levels:
+        queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(max(query_count, level * 4))]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            list(pool.map(run_recommendation, queries))
+        elapsed = time.perf_counter() - start
+        result[f"c{level}"] = {"requests": len(queries), "qps": round(len(queries) / elapsed, 2)}
+    return result
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Flatten nested numeric results into dotted metric names."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a line per metric that regressed beyond tolerance."""
+    regressions = []
+    cur, base = flatten(current["metrics"]), flatten(baseline["metrics"])
+    for name in sorted(cur.keys() & base.keys()):
+        old, new = base[name], cur[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        higher_better = name.endswith(HIGHER_IS_BETTER)
+        worse = -change if higher_better else change
+        marker = "REGRESSION" if worse > tolerance else ""
+        print(f"  {name:<45} {old:>12.3f} -> {new:>12.3f} ({change:+.1%}) {marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "metrics": {"cold_start": bench_cold_start()},
+    }
+
+    install_fakes(
+        llm_latency=args.llm_latency,
+        embedding_latency=args.embedding_latency,
+        dimensions=args.dimensions,
+        seed=args.seed,
+        recording=args.recording,
+    )
+
+    # Everything below uses relative paths (chroma_db/, output/) inside a scratch dir
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            results["metrics"]["indexing"] = bench_indexing(args.vendors, args.seed)
+            results["metrics"]["latency"] = bench_latency(args.queries)
+            results["metrics"]["throughput"] = bench_throughput(levels, args.queries)
+        finally:
+            os.chdir(cwd)
+
+    results["metrics"]["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved benchmark results to {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nComparison against {args.compare} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed.")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
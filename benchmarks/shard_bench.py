@@ -0,0 +1,162 @@
+"""
+Single collection versus sharded indexes (region, industry, hash).
+
+Indexes the same synthetic vendors with the stand-in embeddings once into
+a single collection and once per shard key. For each layout it reports:
+  - build time in total, and for the largest shard (the cost of rebuilding one shard)
+  - search latency over synthetic "<service> in <city>" queries, routed
+    the way the retrieve node routes them
+  - shards searched per query, and overlap of the top k with the
+    single-collection top k
+
+Usage:
+    python -m benchmarks.shard_bench
+    python -m benchmarks.shard_bench --vendors 20000 --keys region,hash --queries 300
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.fakes import KNOWN_LOCATIONS, install_fakes  # noqa: E402
+from benchmarks.synthetic import TRADES, write_vendors  # noqa: E402
+from config import TOP_K_RETRIEVAL  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare a single collection with sharded indexes.")
+    parser.add_argument("--vendors", type=int, default=8000)
+    parser.add_argument("--keys", default="region,industry,hash", help="Comma-separated shard keys.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=TOP_K_RETRIEVAL)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def make_queries(count: int, seed: int) -> list[dict]:
+    """Extracted-info dicts shaped like the extract node's output."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        industry = rng.choice(list(TRADES))
+        service = rng.choice(TRADES[industry])
+        city = rng.choice(KNOWN_LOCATIONS)
+        queries.append({
+            "job_type": industry,
+            "services_needed": [service],
+            "location": city,
+            "optimized_query": f"{service} {industry} {city}",
+        })
+    return queries
+
+
+def search_all(store, queries: list[dict], vectors: list, k: int, route: bool) -> tuple[list, list[float]]:
+    """Top-k doc ids and latency (ms) per query."""
+    ids, latencies = [], []
+    for info, vector in zip(queries, vectors):
+        start = time.perf_counter()
+        target = store.route(info) if route else store
+        results = target.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([doc.metadata["doc_id"] for doc, _ in results])
+    return ids, latencies
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    args = parse_args()
+    _, embeddings = install_fakes()
+
+    from graph.shard_router import open_sharded_store, route_shards
+    from preprocessing.embeddings import index_vendor_stream, load_vector_store
+    from preprocessing.jsonstream import iter_jsonl, iter_records, write_jsonl
+    from preprocessing.preprocess import iter_processed
+    from preprocessing.sharding import partition_records, shard_dir, shard_manifest_path, shard_partition_path
+
+    queries = make_queries(args.queries, args.seed)
+    vectors = embeddings.embed_documents([q["optimized_query"] for q in queries])
+    results = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "layouts": {}}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-shard-") as workdir:
+        os.chdir(workdir)
+        try:
+            write_vendors("all_results.jsonl", args.vendors, seed=args.seed, jsonl=True)
+            write_jsonl(iter_processed(iter_records("all_results.jsonl")), "processed.jsonl")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                index_vendor_stream(iter_jsonl("processed.jsonl"), reset=True)
+                build = time.perf_counter() - start
+            single = load_vector_store(embeddings)
+            baseline, latencies = search_all(single, queries, vectors, args.k, route=False)
+            results["layouts"]["single"] = {
+                "shards": 1, "build_s": round(build, 2), "largest_shard_build_s": round(build, 2),
+                **latency_summary(latencies), "shards_searched": 1.0, "overlap_at_k": 1.0,
+            }
+            print(f"  single:   {json.dumps(results['layouts']['single'])}", file=sys.stderr)
+
+            for key in args.keys.split(","):
+                counts = partition_records(iter_jsonl("processed.jsonl"), key)
+                shard_builds = {}
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for shard in counts:
+                        start = time.perf_counter()
+                        index_vendor_stream(
+                            iter_jsonl(shard_partition_path(shard, key)), reset=True,
+                            manifest_path=shard_manifest_path(shard, key), persist_directory=shard_dir(shard, key),
+                        )
+                        shard_builds[shard] = time.perf_counter() - start
+
+                store = open_sharded_store(embeddings, key)
+                found, latencies = search_all(store, queries, vectors, args.k, route=True)
+                overlap = statistics.mean(
+                    len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(found, baseline)
+                )
+                searched = statistics.mean(len(route_shards(q, list(store.stores), key)) for q in queries)
+                row = {
+                    "shards": len(counts),
+                    "build_s": round(sum(shard_builds.values()), 2),
+                    "largest_shard_build_s": round(max(shard_builds.values()), 2),
+                    **latency_summary(latencies),
+                    "shards_searched": round(searched, 2),
+                    "overlap_at_k": round(overlap, 3),
+                    "vendors_per_shard": counts,
+                }
+                results["layouts"][key] = row
+                print(f"  {key + ':':<9} {json.dumps({k: v for k, v in row.items() if k != 'vendors_per_shard'})}",
+                      file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved shard benchmark results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
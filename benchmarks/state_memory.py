@@ -0,0 +1,146 @@
+"""
+Per-request allocation and peak memory of the recommendation pipeline.
+
+Indexes synthetic vendors with the stand-in embeddings, then uses
+tracemalloc to measure:
+  - bytes allocated at peak while one request runs (sequential runs)
+  - retained size of the final state returned to the caller
+  - traced peak while many requests run concurrently
+
+Usage:
+    python -m benchmarks.state_memory
+    python -m benchmarks.state_memory --vendors 5000 --concurrency 1,16,64 --output mem.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Repeated queries must run the pipeline, not hit the result cache
+os.environ.setdefault("RESULT_CACHE", "0")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.run_benchmarks import bench_indexing  # noqa: E402
+from benchmarks.synthetic import SAMPLE_QUERIES  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure per-request allocation and peak memory.")
+    parser.add_argument("--vendors", type=int, default=2000, help="Synthetic vendors to index.")
+    parser.add_argument("--queries", type=int, default=40, help="Sequential requests to measure.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--llm-latency", default="const:0.02", help="LLM latency distribution.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def deep_size(obj, seen=None) -> int:
+    """Approximate retained size of nested dicts/lists/strings in bytes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, name, None), seen) for name in obj.__slots__)
+    return size
+
+
+def bench_sequential(query_count: int) -> dict:
+    """Traced peak per request and retained size of each returned state."""
+    from graph.workflow import run_recommendation
+
+    peaks, retained = [], []
+    for i in range(query_count):
+        # Distinct queries so coalescing or caches never hide the work
+        query = f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} (request {i})"
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        state = run_recommendation(query)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+        retained.append(deep_size(state))
+
+    return {
+        "requests": query_count,
+        "peak_alloc_kb_p50": round(statistics.median(peaks) / 1024, 1),
+        "peak_alloc_kb_max": round(max(peaks) / 1024, 1),
+        "state_kb_p50": round(statistics.median(retained) / 1024, 1),
+    }
+
+
+def bench_concurrent(levels: list[int]) -> dict:
+    """Traced peak above baseline while `level` requests run at once."""
+    from graph.workflow import run_recommendation
+
+    result = {}
+    for level in levels:
+        queries = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} (c{level} #{i})" for i in range(level * 4)]
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            states = list(pool.map(run_recommendation, queries))
+        _, peak = tracemalloc.get_traced_memory()
+        result[f"c{level}"] = {
+            "requests": len(queries),
+            "peak_kb": round((peak - base) / 1024, 1),
+            "peak_kb_per_request": round((peak - base) / 1024 / level, 1),
+            "retained_states_kb": round(deep_size(states) / 1024, 1),
+        }
+    return result
+
+
+def main():
+    args = parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    install_fakes(llm_latency=args.llm_latency, embedding_latency="const:0", seed=args.seed)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-mem-") as workdir:
+        os.chdir(workdir)
+        try:
+            bench_indexing(args.vendors, args.seed)
+            from graph.workflow import run_recommendation
+
+            # Warm the graph, clients and any lazily loaded data before tracing
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_recommendation(SAMPLE_QUERIES[0])
+
+            tracemalloc.start()
+            results = {
+                "config": {k: v for k, v in vars(args).items() if k != "output"},
+                "sequential": bench_sequential(args.queries),
+                "concurrent": bench_concurrent(levels),
+            }
+            tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved memory results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Vendor summaries: rerank prompt size and regeneration with the stand-in LLM.
+
+Summarises synthetic vendors with the fake chat model three times against
+one summary cache:
+  - cold:    every vendor is summarised
+  - warm:    unchanged vendors come from the cache (no LLM calls)
+  - changed: only the --changed vendors whose fields were edited are redone
+
+Then formats random candidate sets of TOP_K_RETRIEVAL vendors in "full" and
+"summary" mode and reports the candidate section's estimated tokens per
+rerank prompt, and the input cost at --requests-per-day.
+
+Usage:
+    python -m benchmarks.summary_bench
+    python -m benchmarks.summary_bench --vendors 5000 --changed 50 --requests-per-day 20000
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.fakes import install_fakes, synthetic_rerank  # noqa: E402
+from benchmarks.synthetic import write_vendors  # noqa: E402
+from config import LLM_INPUT_COST_PER_1M, RERANKING_PROMPT, TOP_K_RERANK, TOP_K_RETRIEVAL  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure summary-mode rerank prompts and summary regeneration.")
+    parser.add_argument("--vendors", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=20, help="Vendors edited before the third run.")
+    parser.add_argument("--prompts", type=int, default=200, help="Random candidate sets formatted per mode.")
+    parser.add_argument("--requests-per-day", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    llm, _ = install_fakes(seed=args.seed)
+
+    from graph.nodes.rerank import format_candidates_for_prompt
+    from preprocessing.jsonstream import iter_records
+    from preprocessing.preprocess import iter_processed
+    from preprocessing.summaries import estimate_tokens, iter_summarized
+
+    rng = random.Random(args.seed)
+    results = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "runs": {}}
+
+    with tempfile.TemporaryDirectory(prefix="vendor-summary-") as workdir:
+        raw_path = os.path.join(workdir, "all_results.jsonl")
+        cache_path = os.path.join(workdir, "vendor_summaries.jsonl")
+        write_vendors(raw_path, args.vendors, seed=args.seed, jsonl=True)
+        processed = list(iter_processed(iter_records(raw_path), skipped=[]))
+
+        changed = rng.sample(range(len(processed)), min(args.changed, len(processed)))
+        for name in ("cold", "warm", "changed"):
+            records = copy.deepcopy(processed)
+            if name == "changed":
+                for i in changed:
+                    metadata = records[i]["metadata"]
+                    metadata["services"] = f"{metadata.get('services') or ''}, Emergency Call-Outs".lstrip(", ")
+            before = llm.calls
+            stats: dict = {}
+            summarized = list(iter_summarized(records, cache_path=cache_path, stats=stats))
+            results["runs"][name] = {**stats, "llm_calls": llm.calls - before}
+            print(f"  {name:<8} {json.dumps(results['runs'][name])}", file=sys.stderr)
+
+    lengths = [estimate_tokens(r["metadata"]["summary"]) for r in summarized]
+    results["summary_tokens"] = {"mean": round(statistics.mean(lengths), 1), "max": max(lengths)}
+
+    modes = {}
+    k = min(TOP_K_RETRIEVAL, len(summarized))
+    samples = [rng.sample(summarized, k) for _ in range(args.prompts)]
+    for mode in ("full", "summary"):
+        tokens = []
+        for sample in samples:
+            candidates = [
+                {**r["metadata"], "candidate_id": r["id"], "similarity_score": round(rng.random(), 4)}
+                for r in sample
+            ]
+            text = format_candidates_for_prompt(candidates, mode=mode)
+            tokens.append(estimate_tokens(text))
+        # The stand-in reranker parses candidates the same way in both modes
+        prompt = RERANKING_PROMPT.format(original_query="test", candidates=text, top_k=TOP_K_RERANK)
+        assert len(synthetic_rerank(prompt)["rankings"]) == min(TOP_K_RERANK, k)
+        mean = statistics.mean(tokens)
+        modes[mode] = {
+            "candidate_tokens_per_prompt": round(mean),
+            "daily_input_tokens": round(mean * args.requests_per_day),
+            "daily_input_cost_usd": round(mean * args.requests_per_day * LLM_INPUT_COST_PER_1M / 1e6, 2),
+        }
+        print(f"  {mode:<8} {json.dumps(modes[mode])}", file=sys.stderr)
+    modes["reduction_pct"] = round(
+        100 * (1 - modes["summary"]["candidate_tokens_per_prompt"] / modes["full"]["candidate_tokens_per_prompt"]), 1,
+    )
+    results["prompt"] = modes
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved summary benchmark results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic vendor data and queries for offline benchmarks.
+
+Records follow the shape of output/all_results.json so they can be fed
+straight into preprocess_vendors.
+"""
+
+import json
+import random
+from typing import Iterator
+
+from benchmarks.fakes import KNOWN_LOCATIONS
+
+TRADES = {
+    "plumbing": ["pipe repair", "boiler installation", "emergency plumbing", "drainage"],
+    "electrical": ["rewiring", "lighting installation", "electrical testing", "ev chargers"],
+    "construction": ["excavation", "groundwork", "brickwork", "extensions"],
+    "fire protection": ["fire sprinklers", "fire suppression", "fire alarms", "extinguisher servicing"],
+    "facilities management": ["security guarding", "cctv monitoring", "office cleaning", "pest control"],
+    "surveying": ["quantity surveying", "building surveys", "cost estimation", "tendering support"],
+    "catering": ["event catering", "commercial kitchens", "corporate lunches", "bar services"],
+    "it services": ["network installation", "it support", "cyber security", "cloud migration"],
+}
+
+SAMPLE_QUERIES = [
+    "Emergency! Water pipe burst in my restaurant kitchen in Leeds",
+    "I need to dig a hole behind the pub I have",
+    "Install fire sprinklers in our new office building in Manchester",
+    "Need a quantity surveyor for our housing project in Wellingborough",
+    "Service our fire sprinkler system at a Leeds warehouse",
+    "Security guards and CCTV monitoring for a retail store",
+    "Looking for office cleaning and pest control in London",
+    "Rewire an old terraced house in Sheffield",
+    "Catering for a corporate event in Bristol",
+    "Network installation and IT support for a small office in York",
+]
+
+
+def generate_vendor(index: int, rng: random.Random) -> dict:
+    """Generate one raw vendor record (about 1 in 10 has a failed extraction)."""
+    industry = rng.choice(list(TRADES))
+    services = rng.sample(TRADES[industry], k=rng.randint(2, 4))
+    city = rng.choice(KNOWN_LOCATIONS)
+    name = f"{city} {industry.title()} {index} Ltd"
+    record = {
+        "index": index,
+        "vendor": name,
+        "company_name": name.upper(),
+        "known_address": f"{index} High Street, {city}",
+        "status": "success" if rng.random() > 0.1 else "failed",
+        "extracted": None,
+    }
+    if record["status"] == "success":
+        record["extracted"] = {
+            "company_name": name.upper(),
+            "trading_name": f"{city} {industry.title()}",
+            "services": ", ".join(s.title() for s in services),
+            "products": None,
+            "industry": industry.title(),
+            "about": f"{name} provides {', '.join(services)} across {city} and the surrounding area.",
+            "sic_codes": str(40000 + rng.randint(0, 9999)),
+            "city": city,
+            "country": "United Kingdom",
+            "address": record["known_address"],
+            "phone": f"0{rng.randint(1000000000, 1999999999)}",
+            "email": f"info@vendor{index}.co.uk",
+            "website": f"https://vendor{index}.co.uk",
+            "employees": rng.randint(1, 500),
+            "certifications": rng.choice([None, "ISO 9001", "Gas Safe", "NICEIC", "BAFE"]),
+            "confidence": round(rng.uniform(0.5, 1.0), 2),
+        }
+    return record
+
+
+def iter_vendors(count: int, seed: int = 0) -> Iterator[dict]:
+    """Yield count synthetic raw vendor records deterministically."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield generate_vendor(index, rng)
+
+
+def write_vendors(path: str, count: int, seed: int = 0, jsonl: bool = False):
+    """Write count synthetic vendors as a JSON array in all_results.json format (or JSON Lines)."""
+    with open(path, "w", encoding="utf-8") as f:
+        if jsonl:
+            for vendor in iter_vendors(count, seed):
+                f.write(json.dumps(vendor) + "\n")
+            return
+        f.write("[\n")
+        for i, vendor in enumerate(iter_vendors(count, seed)):
+            if i:
+                f.write(",\n")
+            json.dump(vendor, f)
+        f.write("\n]\n")
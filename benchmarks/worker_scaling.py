@@ -0,0 +1,136 @@
+"""
+Worker processes: throughput scaling against worker count, and memory per worker.
+
+Indexes synthetic vendors with the stand-in embeddings, runs the same
+requests once in-process (Chroma backend, --threads threads) as the
+baseline, then through a WorkerPool of each --workers count sharing the
+memory-mapped export. With the default --llm-latency of 0 the pipeline is
+CPU-bound (embedding, search, JSON parsing, prompt building), which is the
+work more processes can spread across cores; a slow LLM is I/O-bound and
+already overlaps on threads.
+
+Reports queries/s, speedup over one worker, parallel efficiency, and each
+worker's rss / pss / private MB (pss counts the shared mapping once across
+workers; private is what every extra worker costs).
+
+Usage:
+    python -m benchmarks.worker_scaling
+    python -m benchmarks.worker_scaling --workers 1,2,4,8 --requests 400 --vendors 20000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Every request must run the pipeline (inherited by the workers)
+os.environ.setdefault("RESULT_CACHE", "0")
+os.environ.setdefault("SEMANTIC_CACHE", "0")
+
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.run_benchmarks import bench_indexing  # noqa: E402
+from benchmarks.synthetic import SAMPLE_QUERIES  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure throughput scaling of worker processes.")
+    parser.add_argument("--vendors", type=int, default=5000, help="Synthetic vendors to index.")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per configuration.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per worker (and in-process baseline).")
+    parser.add_argument("--llm-latency", default="0", help="Stand-in LLM latency per call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout).")
+    return parser.parse_args()
+
+
+def queries_for(label: str, n: int) -> list[str]:
+    # Distinct queries so coalescing and caches never merge requests
+    return [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} ({label} {i})" for i in range(n)]
+
+
+def run_in_process(args) -> dict:
+    from graph.workflow import run_recommendation
+    from service.workers import process_memory
+
+    queries = queries_for("in-process", args.requests)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(run_recommendation, queries))
+        elapsed = time.perf_counter() - start
+    return {"qps": round(args.requests / elapsed, 2), "memory": process_memory()}
+
+
+def run_pool(workers: int, args) -> dict:
+    from service.workers import WorkerPool
+
+    initargs = (args.llm_latency, "const:0", 256, args.seed)
+    queries = queries_for(f"workers={workers}", args.requests)
+    with WorkerPool(workers, threads=args.threads, initializer=install_fakes, initargs=initargs) as pool:
+        pool.map(queries_for("warm-up", workers * args.threads))
+        start = time.perf_counter()
+        pool.map(queries)
+        elapsed = time.perf_counter() - start
+        memory = dict(pool.memory)
+    per_worker = {
+        key: round(sum(m.get(key, 0) for m in memory.values()) / len(memory), 1)
+        for key in ("rss_mb", "pss_mb", "private_mb")
+    }
+    return {"qps": round(args.requests / elapsed, 2), "memory_per_worker": per_worker}
+
+
+def main():
+    args = parse_args()
+    install_fakes(llm_latency=args.llm_latency, embedding_latency="const:0", seed=args.seed)
+    counts = [int(n) for n in args.workers.split(",")]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="vendor-workers-") as workdir:
+        os.chdir(workdir)
+        try:
+            bench_indexing(args.vendors, args.seed)
+            from graph.workflow import run_recommendation
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_recommendation(SAMPLE_QUERIES[0])
+                baseline = run_in_process(args)
+            print(f"  in-process  {json.dumps(baseline)}", file=sys.stderr)
+
+            runs = {}
+            for workers in counts:
+                runs[workers] = run_pool(workers, args)
+                print(f"  workers={workers:<3} {json.dumps(runs[workers])}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    single = runs.get(1, runs[counts[0]])["qps"]
+    for workers, run in runs.items():
+        run["speedup"] = round(run["qps"] / single, 2)
+        run["efficiency"] = round(run["speedup"] / workers, 2)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "cpus": os.cpu_count(),
+        "in_process": baseline,
+        "workers": {str(workers): run for workers, run in runs.items()},
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved worker scaling results to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ All parameters, model settings, and prompts in one place.
 """
 
 import os
-import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,14 +15,27 @@ load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Early validation - fail fast with clear error
-if not GOOGLE_API_KEY:
-    print("ERROR: GOOGLE_API_KEY not found in environment variables.")
-    print("Please set it in your .env file or environment:")
-    print("  export GOOGLE_API_KEY='your-api-key'")
-    print("  # or in .env file:")
-    print("  GOOGLE_API_KEY=your-api-key")
-    sys.exit(1)
+MISSING_API_KEY_MESSAGE = """GOOGLE_API_KEY not found in environment variables.
+Please set it in your .env file or environment:
+  export GOOGLE_API_KEY='your-api-key'
+  # or in .env file:
+  GOOGLE_API_KEY=your-api-key"""
+
+
+class MissingAPIKeyError(RuntimeError):
+    """Raised when a Gemini client is needed but GOOGLE_API_KEY is not set."""
+
+
+def require_google_api_key() -> str:
+    """
+    Return the Gemini API key, validated at the point of use.
+    Importing config never exits, so --help and offline paths work without a key.
+    """
+    key = GOOGLE_API_KEY or os.getenv("GOOGLE_API_KEY")
+    if not key:
+        raise MissingAPIKeyError(MISSING_API_KEY_MESSAGE)
+    return key
+
 
 # =============================================================================
 # MODEL CONFIGURATION
@@ -43,6 +55,104 @@ LLM_TEMPERATURE = 0.0  # Deterministic outputs
 
 CHROMA_PERSIST_DIR = "chroma_db"
 COLLECTION_NAME = "vendors"
+INDEX_BATCH_SIZE = 256  # Documents embedded and written per batch when indexing a stream
+INDEX_MANIFEST_PATH = "chroma_db/index_manifest.json"  # Committed batches, for --resume
+# Bumped on every index change (kept outside chroma_db so --reset-index keeps counting;
+# with CHROMA_MODE="http" it is kept on the server instead)
+INDEX_GENERATION_PATH = "output/index_generation.json"
+# Query-time search backend: "chroma" (HNSW, a copy of the index per process)
+# or "mmap" (exact search over a float32 matrix exported from the store into
+# VECTOR_EXPORT_PATH and memory-mapped read-only, shared by every process)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# Where Chroma runs: "embedded" (a PersistentClient on CHROMA_PERSIST_DIR, so
+# every node needs its own copy of the index) or "http" (one Chroma server,
+# e.g. `chroma run --path chroma_db --port 8001`, shared by the indexer and
+# every app node; see preprocessing/chroma_client.py)
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded")
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))  # Not 8000, which run_server.py uses
+CHROMA_SSL = os.getenv("CHROMA_SSL", "0") == "1"
+CHROMA_AUTH_TOKEN = os.getenv("CHROMA_AUTH_TOKEN")  # Sent as "Authorization: Bearer <token>"
+CHROMA_POOL_SIZE = 32              # Keep-alive connections to the server, shared by all threads
+CHROMA_TIMEOUT_S = 10.0            # Per HTTP request
+CHROMA_RETRIES = 4                 # Retries after a connection error or a 429 / 502 / 503 / 504
+CHROMA_RETRY_BACKOFF_S = 0.25      # Wait before the first retry, doubled after each
+CHROMA_HEALTH_INTERVAL_S = 15.0    # Heartbeat result reused this long by /health
+INDEX_GENERATION_TTL_S = 2.0       # Index generation read from the server reused this long
+
+# HNSW index profiles: distance space ("l2", "cosine" or "ip"), graph degree M,
+# and candidate list sizes at build (ef_construction) and query (ef_search) time.
+# The profile is stored with the collection when it is created; changing it
+# takes effect on the next --reset-index. Tune with benchmarks/index_tune.py.
+INDEX_PROFILES = {
+    "default": {"space": "l2", "M": 16, "ef_construction": 100, "ef_search": 100},  # Chroma defaults
+    "cosine": {"space": "cosine", "M": 16, "ef_construction": 100, "ef_search": 100},
+    "fast": {"space": "cosine", "M": 8, "ef_construction": 64, "ef_search": 32},
+    "accurate": {"space": "cosine", "M": 32, "ef_construction": 200, "ef_search": 200},
+}
+INDEX_PROFILE = os.getenv("INDEX_PROFILE", "default")
+
+# Parallel preprocessing (run_preprocessing.py --workers)
+PREPROCESS_WORKERS = 1         # Processes for preprocessing (1 = in-process, 0 = one per CPU)
+PREPROCESS_CHUNK_SIZE = 2000   # Vendors per work unit sent to a worker
+
+# Pipelined indexing (run_preprocessing.py --pipelined)
+PIPELINE_EMBED_WORKERS = 4      # Concurrent embedding calls
+PIPELINE_QUEUE_SIZE = 8         # Batches buffered between stages before the producer blocks
+CHROMA_WRITE_BATCH_SIZE = 1024  # Vectors per Chroma upsert
+
+# =============================================================================
+# SHARDING
+# =============================================================================
+
+# Split the index into shards, each an independently built Chroma directory
+# under SHARD_PERSIST_DIR/<SHARD_KEY>/<shard>. None keeps the single
+# collection in CHROMA_PERSIST_DIR.
+#   "region":   vendor city -> SHARD_REGIONS; queries are routed by extracted location
+#   "industry": vendor industry -> SHARD_INDUSTRY_BUCKETS; queries are routed by job_type
+#   "hash":     stable hash of the vendor id into SHARD_COUNT shards (no routing)
+SHARD_KEY = os.getenv("SHARD_KEY") or None
+SHARD_COUNT = 4                   # Shards when SHARD_KEY = "hash"
+SHARD_PERSIST_DIR = "chroma_shards"
+SHARD_PARTITION_DIR = "output/shards"  # Processed vendors split per shard (JSONL)
+SHARD_SEARCH_WORKERS = 8          # Concurrent shard searches per query vector
+# Vendors (and queries) that match no region or bucket go to this shard,
+# which is searched alongside any routed shard
+SHARD_OTHER = "other"
+
+# Place names (and region aliases) matched as whole words, case-insensitively (first region wins)
+SHARD_REGIONS = {
+    "london": ("london", "greater london"),
+    "south-east": ("south east", "brighton", "reading", "oxford", "southampton", "portsmouth",
+                   "kent", "surrey", "sussex", "milton keynes", "guildford", "canterbury"),
+    "south-west": ("south west", "bristol", "bath", "exeter", "plymouth", "cornwall", "devon",
+                   "gloucester", "swindon", "bournemouth"),
+    "east": ("east anglia", "cambridge", "norwich", "ipswich", "peterborough", "essex",
+             "chelmsford", "colchester", "luton"),
+    "midlands": ("midlands", "birmingham", "nottingham", "leicester", "coventry", "derby",
+                 "wolverhampton", "northampton", "wellingborough", "stoke", "lincoln"),
+    "north-west": ("north west", "manchester", "liverpool", "preston", "bolton", "chester",
+                   "lancaster", "blackpool", "stockport", "wigan", "warrington"),
+    "yorkshire": ("yorkshire", "leeds", "york", "sheffield", "bradford", "hull", "harrogate",
+                  "tadcaster", "wakefield", "huddersfield", "doncaster", "halifax"),
+    "north-east": ("north east", "newcastle", "sunderland", "durham", "middlesbrough", "gateshead"),
+    "scotland": ("scotland", "glasgow", "edinburgh", "aberdeen", "dundee", "inverness", "stirling"),
+    "wales": ("wales", "cardiff", "swansea", "newport", "wrexham", "bangor"),
+    "northern-ireland": ("northern ireland", "belfast", "londonderry", "derry"),
+}
+
+# Industry / job_type keywords matched as whole words, case-insensitively (first bucket wins)
+SHARD_INDUSTRY_BUCKETS = {
+    "construction": ("construction", "building", "builders", "groundwork", "groundworks", "excavation",
+                     "demolition", "roofing", "surveying", "surveyor", "architecture", "civil"),
+    "building-services": ("plumbing", "heating", "electrical", "hvac", "gas", "drainage", "fire",
+                          "sprinkler", "sprinklers", "mechanical"),
+    "facilities": ("facilities", "cleaning", "security", "pest", "maintenance", "waste", "landscaping"),
+    "hospitality": ("catering", "food", "hospitality", "events", "restaurant"),
+    "technology": ("it", "software", "network", "cyber", "telecoms", "technology", "computer"),
+    "manufacturing": ("manufacturing", "printing", "engineering", "fabrication", "industrial", "packaging"),
+}
 
 # =============================================================================
 # RETRIEVAL CONFIGURATION
@@ -51,12 +161,194 @@ COLLECTION_NAME = "vendors"
 TOP_K_RETRIEVAL = 30  # Number of candidates to retrieve
 TOP_K_RERANK = 10     # Number of final recommendations
 
+# Multi-query retrieval: search with optimized_query plus each services_needed
+# phrase (embedded in one batched call) and fuse with reciprocal rank fusion
+MULTI_QUERY_RETRIEVAL = False
+MAX_SUB_QUERIES = 5   # Service phrases used in addition to optimized_query
+RRF_K = 60            # Reciprocal rank fusion constant (standard value)
+
+# Adaptive candidate count: over-fetch ADAPTIVE_K_FETCH candidates (cheap for
+# the vector index), then send only the head of the similarity distribution
+# to rerank, cut where scores fall away, bounded by ADAPTIVE_K_MIN..ADAPTIVE_K_MAX
+ADAPTIVE_K = False
+ADAPTIVE_K_METHOD = "gap"   # "gap": largest drop between neighbours; "elbow": knee of the score curve
+ADAPTIVE_K_FETCH = 50
+ADAPTIVE_K_MIN = 5
+ADAPTIVE_K_MAX = TOP_K_RETRIEVAL
+ADAPTIVE_K_MIN_GAP = 0.25   # "gap": smallest drop that counts, as a fraction of the fetched score range
+ADAPTIVE_K_MIN_DEPTH = 0.1  # "elbow": smallest knee depth below the first-to-last line, normalised to [0, 1]
+
+# =============================================================================
+# VENDOR SUMMARIES
+# =============================================================================
+
+# Short, ranking-oriented vendor summaries written offline by an LLM
+# (run_preprocessing.py --summarize) and cached by content hash, so only
+# new or changed vendors are summarised again
+SUMMARY_MAX_TOKENS = 60   # Cap per summary (approx. 4 characters per token)
+SUMMARY_WORKERS = 4       # Concurrent summary LLM calls
+# How the rerank prompt describes candidates: "full" (raw fields) or
+# "summary" (precomputed summary + location; raw fields if a vendor has none)
+RERANK_CANDIDATE_FORMAT = os.getenv("RERANK_CANDIDATE_FORMAT", "full")
+
+# =============================================================================
+# TWO-PHASE RERANK
+# =============================================================================
+
+# "full": one rerank call returns the ranking with step-by-step reasoning per vendor.
+# "two_phase": the rerank call returns only IDs, ranks and scores (RANKING_PROMPT);
+# reasoning is written afterwards by graph/explanations.py and cached
+RERANK_MODE = os.getenv("RERANK_MODE", "full")
+# When two-phase reasoning is written: "lazy" (when a client asks for it,
+# POST /recommend/explain) or "background" (one batch per ranking, right after rerank)
+EXPLAIN_MODE = os.getenv("EXPLAIN_MODE", "lazy")
+EXPLAIN_CACHE_SIZE = 5000          # Explanations kept (per query + vendor + index generation)
+EXPLAIN_WORKERS = 4                # Concurrent explanation batches
+# Optional SQLite tier shared by processes (None = memory only; worker pools
+# use WORKER_EXPLAIN_CACHE_DB then, so the supervisor sees reasoning workers wrote)
+EXPLAIN_CACHE_DB = os.getenv("EXPLAIN_CACHE_DB") or None
+
+# =============================================================================
+# REQUEST COALESCING
+# =============================================================================
+
+# Identical concurrent requests share one pipeline run (keyed by normalized query)
+REQUEST_COALESCING = True
+# Identical concurrent extract/rerank LLM calls and query embeddings share one upstream call
+NODE_COALESCING = True
+
+# =============================================================================
+# LLM CALL DEADLINES AND HEDGING
+# =============================================================================
+
+# Deadline for one extract / rerank LLM call; past it the node uses its fallback
+LLM_TIMEOUT_S = {"extract": 10.0, "rerank": 30.0, "explain": 30.0}
+# Hedged requests: when a call has not answered after the node's observed
+# LLM_HEDGE_QUANTILE call latency, a duplicate is sent and the first valid
+# response wins
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0") == "1"
+LLM_HEDGE_QUANTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = 20         # Calls observed per node before hedging starts
+LLM_HEDGE_MIN_DELAY_S = 0.05       # Never hedge earlier than this
+LLM_HEDGE_MAX_PER_REQUEST = 1      # Duplicate calls allowed per request
+LLM_CALL_WORKERS = 64              # Threads running LLM calls (incl. abandoned ones still finishing)
+
+# =============================================================================
+# REQUEST DEADLINE
+# =============================================================================
+
+# Time budget per request in seconds (None = no deadline). The HTTP service
+# always applies one: the smaller of this and its request timeout.
+# A node that would not fit in the time left (its observed latency at
+# DEGRADE_QUANTILE) takes its cheap path instead:
+#   extract  -> raw query, retrieve -> DEGRADE_TOP_K_RETRIEVAL candidates,
+#   rerank   -> similarity order
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "0")) or None
+DEGRADE_QUANTILE = 0.9
+DEGRADE_MIN_SAMPLES = 20           # Full runs observed per node before it may degrade early
+DEGRADE_TOP_K_RETRIEVAL = 10
+
+# =============================================================================
+# RESULT CACHE
+# =============================================================================
+
+# Final rankings cached per normalized query, pipeline configuration and
+# index generation (a reindex invalidates every entry). Errors are not cached.
+RESULT_CACHE = os.getenv("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_SIZE = 1024           # Entries kept in memory (LRU)
+RESULT_CACHE_TTL_S = 24 * 3600.0   # Entry lifetime (seconds)
+# Optional SQLite tier shared by processes and kept across restarts (None = memory only)
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB") or None
+
+# =============================================================================
+# SEMANTIC CACHE
+# =============================================================================
+
+# Near-duplicate queries ("burst pipe in Leeds restaurant" / "restaurant pipe
+# burst Leeds") reuse a cached result when their embeddings are within
+# SEMANTIC_CACHE_THRESHOLD (cosine) and they name the same location.
+# Costs one embedding call per uncached query; saves extract + rerank on a hit.
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = 0.92    # Minimum cosine similarity to the cached query
+SEMANTIC_CACHE_SIZE = 2000         # Queries kept in the in-process index (LRU)
+SEMANTIC_CACHE_TTL_S = 6 * 3600.0  # Entry lifetime (seconds)
+# Fraction of hits re-run through the full pipeline in the background to
+# measure how often the served result agrees with a fresh one
+SEMANTIC_CACHE_AUDIT_RATE = 0.05
+
+# =============================================================================
+# QUERY LOG
+# =============================================================================
+
+# Append-only JSONL of served requests (query, extracted info, candidate ids,
+# ranking, timings), written by a background thread. Read by
+# benchmarks.replay and by the service's startup pre-warm.
+QUERY_LOG = os.getenv("QUERY_LOG", "0") == "1"
+QUERY_LOG_QUEUE_SIZE = 10000       # Entries buffered for the writer; beyond this they are dropped
+# Most frequent logged queries run through the pipeline at service startup
+# to fill the result/semantic caches (0 = off)
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "0"))
+PREWARM_WORKERS = 4                # Concurrent pre-warm queries
+
+# =============================================================================
+# HTTP SERVICE CONFIGURATION
+# =============================================================================
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+SERVICE_MAX_CONCURRENCY = 8       # Pipelines running at once (worker threads)
+SERVICE_MAX_QUEUE = 32            # Requests allowed to wait for a worker; beyond this -> 503
+SERVICE_REQUEST_TIMEOUT_S = 30.0  # Per-request deadline (queue wait + pipeline) -> 504
+SERVICE_SHUTDOWN_GRACE_S = 20.0   # Time allowed for in-flight requests to drain on shutdown
+
+# =============================================================================
+# WORKER PROCESSES
+# =============================================================================
+
+# Multi-process execution (service/workers.py, run_server.py --workers,
+# run_recommender.py --batch): a supervisor feeds queries through one work
+# queue to worker processes, which search the memory-mapped vector export and
+# catalog (VECTOR_BACKEND "mmap") so the index is held once, not per worker
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))  # 0 = one per CPU
+WORKER_THREADS = 4                 # Queries each worker runs at once (LLM calls are I/O bound)
+WORKER_START_TIMEOUT_S = 120.0     # Time allowed for a worker to load the graph, index and catalog
+WORKER_MAX_RETRIES = 1             # Times a query is re-queued after its worker died
+WORKER_EXPLAIN_CACHE_DB = "output/explanations.db"  # Explanation cache shared by the pool when EXPLAIN_CACHE_DB is unset
+
+# =============================================================================
+# OBSERVABILITY
+# =============================================================================
+
+# Node log level (set WARNING to silence per-request logs on the hot path)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Structured JSON metrics lines are emitted at INFO on "vendor_recommender.metrics"
+METRICS_LOG_LEVEL = os.getenv("METRICS_LOG_LEVEL", "WARNING")
+
+# Profiling (run_recommender.py / run_preprocessing.py --profile cpu|mem; see profiling.py)
+PROFILE_DIR = "output/profiles"  # One subdirectory per profiled run
+PROFILE_TOP_N = 25               # Functions / allocation sites listed per section
+PROFILE_TRACEMALLOC_FRAMES = 1   # Frames kept per allocation (1 = the allocating line)
+
+# LLM pricing in USD per 1M tokens (gemini-2.0-flash), used for cost estimates
+LLM_INPUT_COST_PER_1M = 0.10
+LLM_OUTPUT_COST_PER_1M = 0.40
+
 # =============================================================================
 # FILE PATHS
 # =============================================================================
 
 RAW_DATA_PATH = "output/all_results.json"
 PROCESSED_DATA_PATH = "output/vendors_processed.json"
+# Written by streaming preprocessing (run_preprocessing.py --stream)
+PROCESSED_JSONL_PATH = "output/vendors_processed.jsonl"
+# Memory-mapped vendor details, compiled from PROCESSED_DATA_PATH on first use
+CATALOG_PATH = "output/vendors_catalog.bin"
+# Vectors exported from the store for VECTOR_BACKEND="mmap", per index generation
+VECTOR_EXPORT_PATH = "output/vectors.bin"
+# Generated vendor summaries: one {"id", "hash", "summary"} line per vendor
+SUMMARY_CACHE_PATH = "output/vendor_summaries.jsonl"
+# Served requests, one JSON line each (when QUERY_LOG is on)
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "output/query_log.jsonl")
 
 # =============================================================================
 # PROMPTS
@@ -296,3 +588,109 @@ Return a JSON object with your analysis and rankings. IMPORTANT: Use the candida
 
 Now analyze the candidates and provide your rankings. Return ONLY valid JSON.
 '''
+
+
+RANKING_PROMPT = '''You are an expert vendor matching specialist with deep knowledge of contractor services and capabilities.
+
+## Your Task
+
+Rank the candidate vendors below by how well they suit the user's job request.
+Return rankings only: no reasoning or analysis text.
+
+## User's Original Request
+
+"{original_query}"
+
+## Candidate Vendors
+
+{candidates}
+
+## Evaluation
+
+For each candidate, consider:
+- **Service Match**: Do their services directly address the user's need?
+- **Industry Relevance**: Is their industry aligned with the job type?
+- **Capability Evidence**: Does their description suggest they can handle this work?
+- **Location Proximity**: If the user specified a location, prefer vendors in or near that city (use your knowledge of UK geography).
+
+## Scoring Guidelines
+
+- **0.9-1.0**: Perfect match - services directly address the need, and located in/near user's location (if specified)
+- **0.7-0.8**: Strong match - clearly relevant services/industry, reasonably close location
+- **0.5-0.6**: Partial match - some relevant capabilities, or good service match but distant location
+- **0.3-0.4**: Weak match - tangentially related or very far from user's location
+- **0.0-0.2**: Poor match - not relevant to the request
+
+Among vendors with similar service relevance, rank those closer to the user's location higher.
+
+## Output Format
+
+Use the candidate_id (the value shown as "ID:" for each candidate) to identify vendors.
+
+{{
+  "rankings": [
+    {{"rank": 1, "candidate_id": 0, "relevance_score": 0.95}},
+    {{"rank": 2, "candidate_id": 3, "relevance_score": 0.82}}
+  ]
+}}
+
+- Return ONLY the top {top_k} most relevant vendors
+- If fewer than {top_k} are relevant (score > 0.3), return only those that are relevant
+
+Return ONLY valid JSON.
+'''
+
+
+EXPLANATION_PROMPT = '''You are a vendor recommendation explainer. The vendors below were ranked for a user's job request; explain each one.
+
+## User's Original Request
+
+"{original_query}"
+
+## Vendors
+
+{candidates}
+
+## Instructions
+
+For each vendor, reason step by step:
+1) What the user needs
+2) Which of the vendor's services, industry or certifications address it (or don't)
+3) How the vendor's location relates to the user's, if a location was given
+4) The conclusion: how good a match this is
+
+Reference actual vendor details. Be honest about weak matches.
+
+## Output Format
+
+{{
+  "explanations": [
+    {{"candidate_id": 0, "reasoning": "Step-by-step reasoning: 1) User needs X. 2) This vendor provides X service. ..."}}
+  ]
+}}
+
+Return one entry per vendor listed above. Return ONLY valid JSON.
+'''
+
+
+VENDOR_SUMMARY_PROMPT = '''You are a vendor summary writer preparing compact profiles for a vendor ranking system.
+
+Summarise the vendor below in at most {max_words} words, for someone deciding whether the vendor fits a job request.
+
+Cover, in this order and only when known:
+- Key services (most specific first)
+- Sectors / industries served
+- Region or city
+- Certifications and accreditations
+
+Rules:
+- Plain text on a single line, no markdown, no contact details
+- Use only facts stated below; never invent services or certifications
+- Prefer concrete service names over marketing language
+
+## Vendor
+
+{vendor}
+
+Return ONLY the summary.
+'''
@@ -2,6 +2,13 @@
 Vendor Recommender Graph - LangGraph implementation
 """
 
-from graph.workflow import create_graph, run_recommendation
-
 __all__ = ["create_graph", "run_recommendation"]
+
+
+def __getattr__(name):
+    # Resolve lazily so importing graph.state or graph.instrumentation
+    # does not pull in LangGraph and the model clients.
+    if name in __all__:
+        from graph import workflow
+        return getattr(workflow, name)
+    raise AttributeError(f"module 'graph' has no attribute {name!r}")
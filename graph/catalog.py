@@ -0,0 +1,286 @@
+"""
+Read-only, columnar vendor catalog.
+
+Graph state carries only candidate_id plus scores. Vendor details are looked
+up here when the rerank prompt is built and when results are returned.
+
+The catalog is compiled once from the processed vendors file into a binary file
+that is memory-mapped:
+  - free-text fields (services, about, ...) stay as UTF-8 bytes in the
+    mapping and are decoded only for the records actually used
+  - low-cardinality fields (city, industry, ...) are held as interned
+    strings, so each distinct value exists once per process
+
+File layout (native byte order):
+    MAGIC | uint64 header length | JSON header (source stamp, ids, interned
+    columns), padded to 8 bytes | uint64 offsets, one per (row, text field)
+    plus a final end offset | UTF-8 text blob
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from config import CATALOG_PATH, PROCESSED_DATA_PATH, PROCESSED_JSONL_PATH
+from graph.state import VendorDetails
+
+MAGIC = b"VCAT\x00\x00\x00\x02"
+
+# Display fields, in output order
+FIELDS = tuple(VendorDetails.__annotations__)
+
+# Few distinct values across vendors: interned Python strings
+INTERNED_FIELDS = ("industry", "city", "employees", "certifications")
+# Everything else stays encoded in the mapping until a record is materialized
+TEXT_FIELDS = tuple(name for name in FIELDS if name not in INTERNED_FIELDS)
+
+
+class VendorRecord:
+    """Display fields for one vendor, built on demand from the catalog."""
+
+    __slots__ = ("candidate_id",) + FIELDS
+
+    def __init__(self, candidate_id: str, values: dict):
+        self.candidate_id = candidate_id
+        for name in FIELDS:
+            setattr(self, name, values.get(name))
+
+    def get(self, name: str, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def __getitem__(self, name: str):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+class VendorCatalog:
+    """Memory-mapped vendor details keyed by candidate_id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a vendor catalog: {path}")
+
+        (header_len,) = struct.unpack_from("=Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + header_len])
+
+        self.source: dict = header["source"]
+        self._ids: list[str] = header["ids"]
+        self._rows = {candidate_id: row for row, candidate_id in enumerate(self._ids)}
+        self._columns = {
+            name: [None if value is None else sys.intern(value) for value in header["columns"][name]]
+            for name in INTERNED_FIELDS
+        }
+
+        start += _padded(header_len)
+        offsets_len = (len(self._ids) * len(TEXT_FIELDS) + 1) * 8
+        self._offsets = memoryview(self._mm)[start:start + offsets_len].cast("Q")
+        self._blob_start = start + offsets_len
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, candidate_id: str) -> bool:
+        return candidate_id in self._rows
+
+    def ids(self) -> list[str]:
+        return self._ids
+
+    def record(self, candidate_id: str) -> Optional[VendorRecord]:
+        """Materialize one vendor's details (None if the ID is unknown)."""
+        row = self._rows.get(candidate_id)
+        if row is None:
+            return None
+
+        values = {name: self._columns[name][row] for name in INTERNED_FIELDS}
+        base = row * len(TEXT_FIELDS)
+        for i, name in enumerate(TEXT_FIELDS):
+            begin, end = self._offsets[base + i], self._offsets[base + i + 1]
+            if end > begin:
+                values[name] = self._mm[self._blob_start + begin:self._blob_start + end].decode("utf-8")
+        return VendorRecord(candidate_id, values)
+
+    def close(self):
+        self._offsets.release()
+        self._mm.close()
+
+
+def _padded(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def _clean(name: str, value) -> Optional[str]:
+    """Catalog value for a metadata field ('' and None are both stored as missing)."""
+    if value is None or value == "":
+        return "Unknown" if name == "company_name" else None
+    return value if isinstance(value, str) else str(value)
+
+
+def build_catalog(rows: Iterable[tuple[str, dict]], path: str, source: dict) -> int:
+    """
+    Compile (candidate_id, metadata) rows into a catalog file.
+
+    Text is spooled to a temporary file as rows arrive, and the result is
+    moved into place atomically so readers never see a partial catalog.
+
+    Returns:
+        Number of vendors written.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    ids: list[str] = []
+    columns: dict[str, list] = {name: [] for name in INTERNED_FIELDS}
+    offsets = array("Q", [0])
+
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        position = 0
+        for candidate_id, metadata in rows:
+            ids.append(str(candidate_id))
+            for name in INTERNED_FIELDS:
+                columns[name].append(_clean(name, metadata.get(name)))
+            for name in TEXT_FIELDS:
+                value = _clean(name, metadata.get(name))
+                if value is not None:
+                    position += blob.write(value.encode("utf-8"))
+                offsets.append(position)
+
+        header = json.dumps({"source": source, "ids": ids, "columns": columns}).encode("utf-8")
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(MAGIC)
+                out.write(struct.pack("=Q", len(header)))
+                out.write(header.ljust(_padded(len(header)), b" "))
+                out.write(offsets.tobytes())
+                blob.seek(0)
+                while chunk := blob.read(1 << 20):
+                    out.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    return len(ids)
+
+
+def source_stamp(path: str) -> dict:
+    """Identity of a processed vendors file, used to detect a stale catalog."""
+    stat = os.stat(path)
+    return {"processed": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def current_processed_path() -> Optional[str]:
+    """The most recently written processed vendors file (JSON or JSON Lines), if any."""
+    existing = [path for path in (PROCESSED_DATA_PATH, PROCESSED_JSONL_PATH) if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else None
+
+
+def iter_processed_rows(path: str) -> Iterator[tuple[str, dict]]:
+    """(candidate_id, metadata) rows streamed from a processed vendors file."""
+    from preprocessing.jsonstream import iter_records
+
+    for vendor in iter_records(path):
+        yield str(vendor["id"]), vendor.get("metadata") or {}
+
+
+def iter_vector_store_rows(vector_store) -> Iterator[tuple[str, dict]]:
+    """(candidate_id, metadata) rows read back from the vector store."""
+    data = vector_store.get(include=["metadatas"])
+    for chroma_id, metadata in zip(data["ids"], data["metadatas"]):
+        metadata = metadata or {}
+        yield str(metadata.get("doc_id", chroma_id)), metadata
+
+
+def load_catalog(path: str = CATALOG_PATH, processed_path: Optional[str] = None) -> VendorCatalog:
+    """
+    Open the catalog, (re)compiling it first if it is missing or stale.
+
+    Built from the newest processed vendors file when present, otherwise
+    from the metadata stored in the vector store.
+    """
+    processed_path = processed_path or current_processed_path()
+    if processed_path:
+        source = source_stamp(processed_path)
+        vector_store = None
+    else:
+        from graph.nodes.retrieve import get_vector_store
+
+        vector_store = get_vector_store()
+        source = {"vector_store": len(vector_store.get(include=[])["ids"])}
+
+    if os.path.exists(path):
+        try:
+            catalog = VendorCatalog(path)
+        except (ValueError, OSError, KeyError):
+            catalog = None
+        if catalog is not None:
+            if catalog.source == source:
+                return catalog
+            catalog.close()
+
+    if vector_store is None:
+        rows = iter_processed_rows(processed_path)
+    else:
+        rows = iter_vector_store_rows(vector_store)
+    build_catalog(rows, path, source)
+    return VendorCatalog(path)
+
+
+@lru_cache(maxsize=1)
+def get_catalog() -> VendorCatalog:
+    """Process-wide catalog shared by every request."""
+    return load_catalog()
+
+
+def refresh_catalog() -> VendorCatalog:
+    """Reopen the catalog if its source changed since it was loaded."""
+    catalog = get_catalog()
+    processed_path = current_processed_path()
+    if processed_path and catalog.source == source_stamp(processed_path):
+        return catalog
+    get_catalog.cache_clear()
+    return get_catalog()
+
+
+def materialize_vendors(vendors: list[dict], catalog: Optional[VendorCatalog] = None) -> list[dict]:
+    """
+    Expand candidate_id references into full vendor dicts for output.
+
+    Keys are ordered rank, candidate_id, vendor details, then the
+    reference's own scores and reasoning.
+    """
+    if not vendors:
+        return []
+    catalog = catalog or get_catalog()
+
+    expanded = []
+    for vendor in vendors:
+        record = catalog.record(vendor["candidate_id"])
+        details = record.to_dict() if record else dict.fromkeys(FIELDS)
+        head = {key: vendor[key] for key in ("rank", "candidate_id") if key in vendor}
+        expanded.append({**head, **details, **{k: v for k, v in vendor.items() if k not in head}})
+    return expanded
+
+
+def materialize_state(state: dict) -> dict:
+    """State with ranked_vendors expanded to full records (candidates stay as IDs)."""
+    if not state.get("ranked_vendors"):
+        return state
+    return {**state, "ranked_vendors": materialize_vendors(state["ranked_vendors"])}
@@ -0,0 +1,72 @@
+"""
+Per-request deadline carried in GraphState.
+
+build_initial_state stores an absolute time.monotonic() deadline in
+state["deadline"]. Before its expensive work, each node calls
+should_degrade(): a node degrades when the time left is below its observed
+latency (full, non-degraded runs at DEGRADE_QUANTILE), or is already spent.
+A node that degrades takes its cheap path and adds a tag to
+state["degradations"], which is returned with the response.
+
+Retrieval itself is fast; it shrinks k so that rerank, whose prompt size
+depends on k, can still fit. It therefore compares the time left against
+retrieve + rerank.
+"""
+
+import time
+from typing import Optional
+
+from config import DEGRADE_MIN_SAMPLES, DEGRADE_QUANTILE, LLM_TIMEOUT_S
+from graph.instrumentation import REGISTRY, record
+
+# Stages whose remaining work a node's degradation is meant to make room for
+_COVERS = {"extract": ("extract",), "retrieve": ("retrieve", "rerank"), "rerank": ("rerank",)}
+
+
+def time_left(state: dict) -> Optional[float]:
+    """Seconds until the request's deadline (None without a deadline)."""
+    deadline = state.get("deadline")
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_passed(state: dict) -> bool:
+    """Whether the request has a deadline and it has passed."""
+    left = time_left(state)
+    return left is not None and left <= 0
+
+
+def stage_estimate(node: str) -> Optional[float]:
+    """Observed latency of a node's full runs (None until DEGRADE_MIN_SAMPLES were seen)."""
+    if REGISTRY.sample_count("stage_latency_seconds", node=node) < DEGRADE_MIN_SAMPLES:
+        return None
+    return REGISTRY.quantile("stage_latency_seconds", DEGRADE_QUANTILE, node=node)
+
+
+def should_degrade(state: dict, node: str) -> bool:
+    """Whether node should take its cheap path to meet the deadline."""
+    left = time_left(state)
+    if left is None:
+        return False
+    if left <= 0:
+        return True
+    estimates = [stage_estimate(stage) for stage in _COVERS[node]]
+    if any(estimate is None for estimate in estimates):
+        return False
+    return left < sum(estimates)
+
+
+def degrade(state: dict, tag: str) -> list[str]:
+    """state["degradations"] with tag added; marks the current node record as degraded."""
+    record("degraded")
+    return [*(state.get("degradations") or []), tag]
+
+
+def llm_timeout(state: dict, node: str) -> Optional[float]:
+    """The node's LLM_TIMEOUT_S, capped at the time left before the deadline."""
+    timeout = LLM_TIMEOUT_S.get(node)
+    left = time_left(state)
+    if left is None:
+        return timeout
+    # Never 0: invoke_llm treats a falsy timeout as "no deadline"
+    left = max(left, 0.001)
+    return left if timeout is None else min(timeout, left)
@@ -0,0 +1,279 @@
+"""
+Vendor explanations for two-phase rerank.
+
+With RERANK_MODE="two_phase" the rerank call returns only IDs, ranks and
+scores, so the ranking is ready after a short response. The step-by-step
+reasoning per ranked vendor is written here, one LLM call per batch of
+vendors (EXPLANATION_PROMPT): when a client expands a vendor
+(POST /recommend/explain), or for the whole ranking in the background right
+after rerank (EXPLAIN_MODE="background").
+
+Explanations are cached per normalized query, vendor and index generation.
+Vendors whose explanation is already being written are not requested
+again; callers wait for the batch in flight. With EXPLAIN_CACHE_DB they are
+also kept in a SQLite file, shared with other processes (worker pools use
+WORKER_EXPLAIN_CACHE_DB), so reasoning a worker wrote in the background is
+found by the supervisor serving POST /recommend/explain.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import ValidationError
+
+import config
+import providers
+from config import EXPLAIN_CACHE_SIZE, EXPLAIN_WORKERS, EXPLANATION_PROMPT
+from graph.catalog import get_catalog
+from graph.instrumentation import REGISTRY, instrument_node, record_llm_usage
+from graph.llm_call import LLMTimeout, invoke_llm
+from graph.nodes.rerank import extract_json_from_text, format_candidates_for_prompt, is_json_response
+from graph.state import ExplanationOutputModel
+from preprocessing.index_generation import current_generation
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def explain_batch(state: dict) -> dict:
+    """
+    Write the reasoning for a batch of ranked vendors in one LLM call.
+
+    Input: original_query, candidate_ids
+    Output: explanations ({candidate_id: reasoning}; vendors the response
+    left out are missing), error
+    """
+    query, candidate_ids = state["original_query"], state["candidate_ids"]
+    refs = [{"candidate_id": cid} for cid in candidate_ids]
+    prompt = EXPLANATION_PROMPT.format(
+        original_query=query,
+        candidates=format_candidates_for_prompt(refs, get_catalog(), with_score=False),
+    )
+    logger.info("[Explain] Writing reasoning for %d vendors...", len(candidate_ids))
+
+    try:
+        response = invoke_llm("explain", providers.get_llm(), prompt, is_json_response)
+    except LLMTimeout as e:
+        logger.error("[Explain] %s", e)
+        return {"explanations": {}, "error": "Explanation timed out"}
+    record_llm_usage(response)
+
+    wanted = set(candidate_ids)
+    try:
+        validated = ExplanationOutputModel(**json.loads(extract_json_from_text(response.content)))
+    except (json.JSONDecodeError, ValidationError, TypeError) as e:
+        logger.error("[Explain] Parse failed: %s", e)
+        return {"explanations": {}, "error": "Explanation parse failed"}
+    explanations = {e.candidate_id: e.reasoning for e in validated.explanations if e.candidate_id in wanted}
+    return {"explanations": explanations, "error": None}
+
+
+_explain_node = instrument_node("explain", explain_batch)
+
+
+def _done(value) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+class Explanations:
+    """LRU of vendor explanations, with the batches being written in flight and an optional SQLite tier."""
+
+    def __init__(self, size: int = EXPLAIN_CACHE_SIZE, workers: int = EXPLAIN_WORKERS, db_path: Optional[str] = None):
+        self.size = size
+        self.workers = workers
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # (normalized query, candidate_id, generation) -> reasoning
+        self._cache: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+        # Same key -> batch future resolving to {candidate_id: reasoning}
+        self._pending: dict[tuple[str, str, str], Future] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_generation: Optional[str] = None
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS explanations (query TEXT, candidate_id TEXT, generation TEXT, "
+                "reasoning TEXT, PRIMARY KEY (query, candidate_id, generation))"
+            )
+            self._db.commit()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="explain")
+        return self._pool
+
+    def _remember(self, key: tuple[str, str, str], reasoning: str):
+        self._cache[key] = reasoning
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, norm: str, candidate_ids: list[str], generation: str) -> dict[str, str]:
+        """Cached reasoning for these vendors: memory, then disk (lock held)."""
+        found = {}
+        for cid in candidate_ids:
+            key = (norm, cid, generation)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[cid] = self._cache[key]
+        rest = [cid for cid in candidate_ids if cid not in found]
+        if self._db is not None and rest:
+            rows = self._db.execute(
+                "SELECT candidate_id, reasoning FROM explanations WHERE query = ? AND generation = ? "
+                f"AND candidate_id IN ({', '.join('?' * len(rest))})",
+                (norm, generation, *rest),
+            ).fetchall()
+            for cid, reasoning in rows:
+                self._remember((norm, cid, generation), reasoning)
+                found[cid] = reasoning
+        return found
+
+    def cached(self, query: str, candidate_ids: list[str]) -> dict[str, str]:
+        """Explanations already written for these vendors (no LLM calls)."""
+        norm, generation = _normalize(query), current_generation()
+        with self._lock:
+            return self._lookup(norm, list(candidate_ids), generation)
+
+    def schedule(self, query: str, candidate_ids: list[str]) -> dict[str, Future]:
+        """
+        A future per vendor resolving to {candidate_id: reasoning} of its batch.
+        Vendors neither cached nor in flight are written in one new batch.
+        """
+        norm, generation = _normalize(query), current_generation()
+        futures, missing = {}, []
+        with self._lock:
+            candidate_ids = list(dict.fromkeys(map(str, candidate_ids)))
+            found = self._lookup(norm, candidate_ids, generation)
+            for cid in candidate_ids:
+                key = (norm, cid, generation)
+                if cid in found:
+                    futures[cid] = _done({cid: found[cid]})
+                    self.hits += 1
+                elif key in self._pending:
+                    futures[cid] = self._pending[key]
+                    self.joined += 1
+                else:
+                    missing.append(cid)
+            if missing:
+                self.misses += len(missing)
+                batch = self._executor().submit(self._write, query, norm, missing, generation)
+                for cid in missing:
+                    self._pending[(norm, cid, generation)] = batch
+                    futures[cid] = batch
+        REGISTRY.inc("explanation_cache_hits_total", len(futures) - len(missing))
+        if missing:
+            REGISTRY.inc("explanation_cache_misses_total", len(missing))
+        return futures
+
+    def explain(self, query: str, candidate_ids: list[str], timeout: Optional[float] = None) -> dict[str, str]:
+        """
+        Reasoning for each vendor, writing the missing ones (blocking). Vendors
+        whose batch failed or did not finish within timeout are left out.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        explanations = {}
+        for cid, future in self.schedule(query, candidate_ids).items():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                reasoning = future.result(remaining).get(cid)
+            except Exception as e:
+                logger.warning("[Explain] No reasoning for %s: %s", cid, e)
+                continue
+            if reasoning is not None:
+                explanations[cid] = reasoning
+        return explanations
+
+    def _write(self, query: str, norm: str, candidate_ids: list[str], generation: str) -> dict[str, str]:
+        explanations: dict[str, str] = {}
+        try:
+            explanations = _explain_node({"original_query": query, "candidate_ids": candidate_ids})["explanations"]
+            return explanations
+        finally:
+            with self._lock:
+                for cid, reasoning in explanations.items():
+                    self._remember((norm, cid, generation), reasoning)
+                if self._db is not None and explanations:
+                    self._store(norm, explanations, generation)
+                for cid in candidate_ids:
+                    self._pending.pop((norm, cid, generation), None)
+
+    def _store(self, norm: str, explanations: dict[str, str], generation: str):
+        if generation != current_generation():
+            return
+        if generation != self._db_generation:
+            # Entries of older generations can never be hit again
+            self._db.execute("DELETE FROM explanations WHERE generation != ?", (generation,))
+            self._db_generation = generation
+        self._db.executemany(
+            "INSERT OR REPLACE INTO explanations VALUES (?, ?, ?, ?)",
+            [(norm, cid, generation, reasoning) for cid, reasoning in explanations.items()],
+        )
+        self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requested = self.hits + self.joined + self.misses
+            return {
+                "size": len(self._cache),
+                "in_flight": len(self._pending),
+                "hits": self.hits,
+                "joined": self.joined,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.joined) / requested, 4) if requested else None,
+                "disk": self.db_path,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_explanations() -> Explanations:
+    """Process-wide explanation cache."""
+    return Explanations(db_path=config.EXPLAIN_CACHE_DB)
+
+
+def explanation_query(state: dict) -> str:
+    """
+    Query the ranking in state was made for, which its reasoning is written
+    and cached under: on a semantic cache hit, the matched query.
+    """
+    return (state.get("semantic_match") or {}).get("query") or state["original_query"]
+
+
+def with_explanations(state: dict) -> dict:
+    """State with cached reasoning filled in for ranked vendors that have none yet."""
+    ranked = state.get("ranked_vendors") or []
+    missing = [v["candidate_id"] for v in ranked if v.get("reasoning") is None]
+    if not missing:
+        return state
+    found = get_explanations().cached(explanation_query(state), missing)
+    if not found:
+        return state
+    return {
+        **state,
+        "ranked_vendors": [
+            {**v, "reasoning": found[v["candidate_id"]]} if v["candidate_id"] in found else v for v in ranked
+        ],
+    }
+
+
+def explanation_stats() -> Optional[dict]:
+    """Stats of the process-wide cache (None unless RERANK_MODE is "two_phase")."""
+    return get_explanations().stats() if config.RERANK_MODE == "two_phase" else None
@@ -0,0 +1,340 @@
+"""
+Instrumentation for the recommendation graph.
+
+Wraps graph nodes to record wall time, LLM token usage, embedding calls,
+candidate counts, cache hits and fallbacks per request. Records are emitted
+as structured JSON log lines and aggregated into in-process histograms that
+can be exported as a JSON snapshot or Prometheus text.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+import profiling
+from config import (
+    LOG_LEVEL,
+    METRICS_LOG_LEVEL,
+    LLM_INPUT_COST_PER_1M,
+    LLM_OUTPUT_COST_PER_1M,
+)
+
+# Separate logger so structured metrics can be silenced independently of node logs
+metrics_logger = logging.getLogger("vendor_recommender.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 30, 50, 100)
+
+# Per-request record (shared by all nodes of one run) and per-node record
+_request_record: ContextVar[Optional[dict]] = ContextVar("request_record", default=None)
+_node_record: ContextVar[Optional[dict]] = ContextVar("node_record", default=None)
+
+
+# =============================================================================
+# Histograms and Registry
+# =============================================================================
+
+class Histogram:
+    """Cumulative bucket histogram with a bounded sample window for quantiles."""
+
+    def __init__(self, buckets: tuple, window: int = 1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile over the recent sample window (None if no samples)."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.bucket_counts)),
+        }
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._buckets: dict[str, tuple] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            self._buckets.setdefault(name, buckets)
+            key = _label_key(labels)
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(self._buckets[name])
+            hist.observe(value)
+
+    def quantile(self, name: str, q: float, **labels) -> Optional[float]:
+        """Recent quantile for one labelled histogram (None if never observed)."""
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_label_key(labels))
+            return hist.quantile(q) if hist else None
+
+    def sample_count(self, name: str, **labels) -> int:
+        """Observations of one labelled histogram (0 if never observed)."""
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_label_key(labels))
+            return hist.count if hist else 0
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._buckets.clear()
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable snapshot of all counters and histograms."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(k), **h.to_dict()} for k, h in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def fmt(labels: dict, extra: Optional[dict] = None) -> str:
+            merged = {**labels, **(extra or {})}
+            if not merged:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in merged.items()) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{fmt(dict(key))} {value}")
+            for name, series in self._histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    labels = dict(key)
+                    cumulative = 0
+                    for bound, count in zip([*map(str, hist.buckets), "+Inf"], hist.bucket_counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(labels, {'le': bound})} {cumulative}")
+                    lines.append(f"{name}_sum{fmt(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def configure_logging(level: str = LOG_LEVEL, metrics_level: str = METRICS_LOG_LEVEL):
+    """Configure leveled logging for the nodes and the structured metrics logger."""
+    logging.basicConfig(level=level, format="%(message)s")
+    metrics_logger.setLevel(metrics_level)
+
+
+def metrics_snapshot() -> dict:
+    """Return the in-process metrics as a JSON-serialisable dict."""
+    return REGISTRY.snapshot()
+
+
+def metrics_prometheus() -> str:
+    """Return the in-process metrics as Prometheus text."""
+    return REGISTRY.to_prometheus()
+
+
+# =============================================================================
+# Recording API (called from inside nodes)
+# =============================================================================
+
+def record(key: str, value: float = 1):
+    """
+    Add value to a counter on the current node record.
+
+    Known keys: embedding_calls, candidates, coalesced_calls, llm_input_tokens,
+    llm_output_tokens, shards_searched, candidates_fetched, adaptive_k,
+    hedged_calls, hedge_wins, llm_timeouts, degraded. No-op when called
+    outside an instrumented node.
+    """
+    node = _node_record.get()
+    if node is not None:
+        node[key] = node.get(key, 0) + value
+
+
+def current_request() -> Optional[dict]:
+    """Record of the request running in this context (None outside request_context)."""
+    return _request_record.get()
+
+
+def record_llm_usage(response):
+    """Record input/output tokens from a LangChain response's usage metadata."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    record("llm_calls")
+    record("llm_input_tokens", usage.get("input_tokens", 0))
+    record("llm_output_tokens", usage.get("output_tokens", 0))
+
+
+def llm_cost_usd(input_tokens: float, output_tokens: float) -> float:
+    """Estimated LLM cost from configured per-million-token prices."""
+    return (input_tokens * LLM_INPUT_COST_PER_1M + output_tokens * LLM_OUTPUT_COST_PER_1M) / 1_000_000
+
+
+def _emit(event: dict):
+    if metrics_logger.isEnabledFor(logging.INFO):
+        metrics_logger.info(json.dumps(event, default=str))
+
+
+# =============================================================================
+# Node and Request Wrappers
+# =============================================================================
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """
+    Wrap a graph node so each call is timed and its counters aggregated
+    (and profiled as a section while a profiler is active; see profiling.py).
+    """
+
+    @wraps(fn)
+    def wrapper(state):
+        node = {}
+        token = _node_record.set(node)
+        profiler = profiling.ACTIVE
+        start = time.perf_counter()
+        try:
+            if profiler is None:
+                result = fn(state)
+            else:
+                with profiler.section(name):
+                    result = fn(state)
+        finally:
+            elapsed = time.perf_counter() - start
+            _node_record.reset(token)
+
+        fallback = bool(result.get("error")) and result.get("error") != state.get("error")
+        node["latency_s"] = round(elapsed, 6)
+        node["fallback"] = fallback
+        if fallback:
+            node["error"] = result["error"]
+        if node.get("llm_calls"):
+            node["cost_usd"] = llm_cost_usd(node.get("llm_input_tokens", 0), node.get("llm_output_tokens", 0))
+
+        REGISTRY.observe("node_latency_seconds", elapsed, node=name)
+        if not node.get("degraded"):
+            # Full runs only: what a node needs when it isn't cutting corners (graph/deadline.py)
+            REGISTRY.observe("stage_latency_seconds", elapsed, node=name)
+        if "llm_calls" in node:
+            REGISTRY.observe("llm_input_tokens", node["llm_input_tokens"], TOKEN_BUCKETS, node=name)
+            REGISTRY.observe("llm_output_tokens", node["llm_output_tokens"], TOKEN_BUCKETS, node=name)
+            REGISTRY.inc("llm_cost_usd_total", node["cost_usd"], node=name)
+        if "candidates" in node:
+            REGISTRY.observe("candidates", node["candidates"], COUNT_BUCKETS, node=name)
+        if "adaptive_k" in node:
+            REGISTRY.observe("adaptive_k", node["adaptive_k"], COUNT_BUCKETS, node=name)
+            REGISTRY.inc("candidates_trimmed_total", node["candidates_fetched"] - node["adaptive_k"], node=name)
+        for counter in (
+            "embedding_calls", "coalesced_calls", "hedged_calls", "hedge_wins", "llm_timeouts", "degraded",
+        ):
+            if node.get(counter):
+                REGISTRY.inc(f"{counter}_total", node[counter], node=name)
+        if fallback:
+            REGISTRY.inc("fallbacks_total", node=name)
+
+        request = _request_record.get()
+        if request is not None:
+            request["nodes"][name] = node
+            _emit({"event": "node", "request_id": request["request_id"], "node": name, **node})
+
+        return result
+
+    return wrapper
+
+
+@contextmanager
+def request_context(query: str):
+    """
+    Collect node records for one pipeline run and emit a request summary.
+
+    Yields the request record; callers may set "error" (and "result_cache"
+    for cache hits) on it.
+    """
+    request = {"request_id": uuid.uuid4().hex[:12], "query": query, "nodes": {}, "error": None}
+    token = _request_record.set(request)
+    start = time.perf_counter()
+    try:
+        yield request
+    finally:
+        _request_record.reset(token)
+        elapsed = time.perf_counter() - start
+        request["latency_s"] = round(elapsed, 6)
+        nodes = request["nodes"].values()
+        summary = {
+            "event": "request",
+            "request_id": request["request_id"],
+            "latency_s": round(elapsed, 6),
+            "llm_input_tokens": sum(n.get("llm_input_tokens", 0) for n in nodes),
+            "llm_output_tokens": sum(n.get("llm_output_tokens", 0) for n in nodes),
+            "cost_usd": sum(n.get("cost_usd", 0.0) for n in nodes),
+            "embedding_calls": sum(n.get("embedding_calls", 0) for n in nodes),
+            "coalesced_calls": sum(n.get("coalesced_calls", 0) for n in nodes),
+            "hedged_calls": sum(n.get("hedged_calls", 0) for n in nodes),
+            "llm_timeouts": sum(n.get("llm_timeouts", 0) for n in nodes),
+            "candidates": sum(n.get("candidates", 0) for n in nodes),
+            # Candidates kept by the adaptive cut (None with a fixed TOP_K_RETRIEVAL)
+            "adaptive_k": next((n["adaptive_k"] for n in nodes if "adaptive_k" in n), None),
+            "fallback_nodes": [name for name, n in request["nodes"].items() if n.get("fallback")],
+            "degraded_nodes": [name for name, n in request["nodes"].items() if n.get("degraded")],
+            # Result cache tier that served the request (None when the graph ran)
+            "result_cache": request.get("result_cache"),
+            "error": request["error"],
+        }
+        REGISTRY.observe("request_latency_seconds", elapsed)
+        REGISTRY.inc("requests_total")
+        if request["error"]:
+            REGISTRY.inc("request_errors_total")
+        _emit(summary)
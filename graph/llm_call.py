@@ -0,0 +1,155 @@
+"""
+Deadline-bounded, optionally hedged LLM calls for the graph nodes.
+
+invoke_llm runs llm.invoke on a shared worker pool and waits at most the
+node's LLM_TIMEOUT_S; past it LLMTimeout is raised and the node uses its
+fallback. With LLM_HEDGING on, a call that has not answered after the
+node's observed LLM_HEDGE_QUANTILE latency gets one duplicate, and the
+first valid response wins. Duplicates are limited per request
+(LLM_HEDGE_MAX_PER_REQUEST).
+
+The LLM clients are synchronous, so a losing or timed-out call cannot be
+aborted mid-request. Its future is cancelled if it has not started yet;
+otherwise it finishes on the pool and its result is dropped. Its token
+cost is added to llm_hedge_wasted_cost_usd_total.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Callable, Optional
+
+import config
+from config import (
+    LLM_CALL_WORKERS,
+    LLM_HEDGE_MAX_PER_REQUEST,
+    LLM_HEDGE_MIN_DELAY_S,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_QUANTILE,
+    LLM_TIMEOUT_S,
+)
+from graph.instrumentation import REGISTRY, current_request, llm_cost_usd, record
+
+
+class LLMTimeout(TimeoutError):
+    """Raised when no valid LLM response arrived within the node's deadline."""
+
+
+@lru_cache(maxsize=1)
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=LLM_CALL_WORKERS, thread_name_prefix="llm")
+
+
+def hedge_delay(node: str) -> Optional[float]:
+    """Seconds to wait before hedging a call (None until enough calls were observed)."""
+    if REGISTRY.sample_count("llm_call_seconds", node=node) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_S, REGISTRY.quantile("llm_call_seconds", LLM_HEDGE_QUANTILE, node=node))
+
+
+def _take_hedge_budget() -> bool:
+    """Reserve one duplicate call from the current request's budget."""
+    request = current_request()
+    if request is None:
+        return True
+    if request.get("hedge_budget_used", 0) >= LLM_HEDGE_MAX_PER_REQUEST:
+        return False
+    request["hedge_budget_used"] = request.get("hedge_budget_used", 0) + 1
+    return True
+
+
+def _timed_invoke(node: str, llm, prompt: str):
+    start = time.perf_counter()
+    response = llm.invoke(prompt)
+    # Every completed call (winner or not) feeds the latency the hedge delay is taken from
+    REGISTRY.observe("llm_call_seconds", time.perf_counter() - start, node=node)
+    return response
+
+
+def _abandon(node: str, future: Future):
+    """Drop a call whose result is no longer needed, counting its cost if it completes."""
+    if future.cancel():
+        return
+
+    def account(f: Future):
+        if f.cancelled() or f.exception() is not None:
+            return
+        usage = getattr(f.result(), "usage_metadata", None) or {}
+        cost = llm_cost_usd(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        REGISTRY.inc("llm_hedge_wasted_cost_usd_total", cost, node=node)
+
+    future.add_done_callback(account)
+
+
+def invoke_llm(
+    node: str,
+    llm,
+    prompt: str,
+    validate: Optional[Callable] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    llm.invoke(prompt) with the node's deadline and optional hedging.
+
+    Args:
+        node: Node name, for the timeout, latency history and metrics
+        validate: Optional check on a response; an invalid response only wins
+            if no other call is still running
+        timeout: Overrides LLM_TIMEOUT_S[node] (None there means no deadline)
+
+    Raises:
+        LLMTimeout: no response within the deadline
+        Exception: whatever the last call raised, if every call failed
+    """
+    timeout = timeout if timeout is not None else LLM_TIMEOUT_S.get(node)
+    start = time.monotonic()
+    deadline = start + timeout if timeout else None
+    delay = hedge_delay(node) if config.LLM_HEDGING else None
+
+    pending = {_pool().submit(_timed_invoke, node, llm, prompt)}
+    hedge = None
+    fallback_response, last_error = None, None
+
+    while pending:
+        now = time.monotonic()
+        waits = []
+        if deadline is not None:
+            waits.append(deadline - now)
+        if delay is not None and hedge is None:
+            waits.append(start + delay - now)
+        done, pending = wait(pending, timeout=max(0.0, min(waits)) if waits else None, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if validate is None or validate(response):
+                for loser in pending:
+                    _abandon(node, loser)
+                if future is hedge:
+                    record("hedge_wins")
+                return response
+            fallback_response = response
+
+        if done:
+            continue
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            for loser in pending:
+                _abandon(node, loser)
+            record("llm_timeouts")
+            raise LLMTimeout(f"{node} LLM call exceeded {timeout:g}s")
+        if delay is not None and hedge is None and now >= start + delay:
+            if _take_hedge_budget():
+                hedge = _pool().submit(_timed_invoke, node, llm, prompt)
+                pending.add(hedge)
+                record("hedged_calls")
+            else:
+                # Budget spent: stop waking up for the hedge timer
+                delay = None
+
+    if fallback_response is not None:
+        return fallback_response
+    raise last_error
@@ -0,0 +1,189 @@
+"""
+Read-only vector matrix exported from the Chroma store and memory-mapped.
+
+Every process that opens chroma_db loads its own copy of the HNSW index.
+With VECTOR_BACKEND="mmap" the vectors are instead exported once into
+VECTOR_EXPORT_PATH and mapped read-only, so any number of worker processes
+share a single copy through the OS page cache. Search is exact: one
+matrix-vector product per query vector, a few milliseconds for 10^5
+vendors.
+
+The export is tagged with the index generation it was taken from and is
+written again when the generation changes. Already-open stores keep
+serving the matrix they mapped, so restart the workers after a reindex.
+
+File layout (native byte order):
+    MAGIC | uint64 header length | JSON header (generation, space, count,
+    dims, ids), padded to 64 bytes | float32 vectors (count x dims) |
+    float32 squared norms (count)
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from config import VECTOR_EXPORT_PATH
+from graph.state import ExtractedInfo
+from preprocessing.index_generation import current_generation
+from preprocessing.index_profiles import index_space
+
+MAGIC = b"VVEC\x00\x00\x00\x01"
+ALIGN = 64
+
+
+def _padded(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def export_vectors(vector_store, path: str = VECTOR_EXPORT_PATH, generation: Optional[str] = None) -> int:
+    """
+    Write the store's vectors and doc_ids to path (moved into place atomically).
+
+    Returns:
+        Number of vectors written.
+    """
+    generation = generation or current_generation()
+    data = vector_store.get(include=["embeddings", "metadatas"])
+    ids = [str((metadata or {}).get("doc_id", chroma_id)) for chroma_id, metadata in zip(data["ids"], data["metadatas"])]
+    vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(ids), -1)
+    del data
+
+    header = json.dumps({
+        "generation": generation,
+        "space": index_space(vector_store),
+        "count": len(ids),
+        "dims": int(vectors.shape[1]),
+        "ids": ids,
+    }).encode("utf-8")
+    prefix_len = len(MAGIC) + 8
+    padding = _padded(prefix_len + len(header)) - prefix_len - len(header)
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("=Q", len(header)))
+            out.write(header + b" " * padding)
+            out.write(vectors.tobytes())
+            out.write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(ids)
+
+
+def read_header(path: str = VECTOR_EXPORT_PATH) -> Optional[dict]:
+    """Header of an export (None if missing or not an export)."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_len,) = struct.unpack("=Q", f.read(8))
+            return json.loads(f.read(header_len))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def export_is_current(path: str = VECTOR_EXPORT_PATH) -> bool:
+    """Whether an export exists for the current index generation."""
+    header = read_header(path)
+    return header is not None and header["generation"] == current_generation()
+
+
+def ensure_export(path: str = VECTOR_EXPORT_PATH) -> dict:
+    """Export the Chroma store unless an export of the current generation exists. Returns its header."""
+    if not export_is_current(path):
+        from graph.nodes.retrieve import open_chroma_store
+
+        # Opened only for the export; dropped afterwards so this process doesn't keep a copy
+        export_vectors(open_chroma_store(), path)
+    return read_header(path)
+
+
+class _Doc:
+    """Minimal stand-in for a LangChain Document (the retrieve node only reads doc_id)."""
+
+    __slots__ = ("metadata", "page_content")
+
+    def __init__(self, doc_id: str):
+        self.metadata = {"doc_id": doc_id}
+        self.page_content = ""
+
+
+class MappedVectorStore:
+    """Exact nearest-neighbour search over a memory-mapped vector export."""
+
+    def __init__(self, path: str, embeddings):
+        self.path = path
+        self.embeddings = embeddings
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a vector export: {path}")
+
+        (header_len,) = struct.unpack_from("=Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + header_len])
+        self.generation: str = header["generation"]
+        self.space: str = header["space"]
+        self.ids: list[str] = header["ids"]
+
+        count, dims = header["count"], header["dims"]
+        offset = _padded(start + header_len)
+        self.vectors = np.frombuffer(self._mm, dtype=np.float32, count=count * dims, offset=offset).reshape(count, dims)
+        self.sq_norms = np.frombuffer(self._mm, dtype=np.float32, count=count, offset=offset + count * dims * 4)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def route(self, extracted_info: Optional[ExtractedInfo]) -> "MappedVectorStore":
+        """Every vector is searched (the export covers all shards)."""
+        return self
+
+    def distances(self, embedding: list[float]) -> np.ndarray:
+        """Distance from every vector to embedding, as Chroma reports it for the index's space."""
+        query = np.asarray(embedding, dtype=np.float32)
+        dots = self.vectors @ query
+        if self.space == "l2":
+            # Squared L2, like hnswlib
+            return np.maximum(self.sq_norms - 2 * dots + float(query @ query), 0.0)
+        if self.space == "cosine":
+            norms = np.sqrt(self.sq_norms) * float(np.sqrt(query @ query))
+            return 1.0 - dots / np.maximum(norms, 1e-12)
+        return 1.0 - dots
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: list[float], k: int = 4, **kwargs) -> list[tuple]:
+        """Top k (doc, distance) pairs, nearest first."""
+        if not self.ids:
+            return []
+        distances = self.distances(embedding)
+        k = min(k, len(distances))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(_Doc(self.ids[i]), float(distances[i])) for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list[tuple]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k=k)
+
+    def get(self, include: Optional[list[str]] = None, **kwargs) -> dict:
+        """Ids of every vector (other fields are not exported)."""
+        return {"ids": list(self.ids)}
+
+    def close(self):
+        del self.vectors, self.sq_norms
+        self._mm.close()
+
+
+def open_mapped_store(embeddings, path: str = VECTOR_EXPORT_PATH) -> MappedVectorStore:
+    """Map the vector export, writing it first if it is missing or from an older index generation."""
+    ensure_export(path)
+    return MappedVectorStore(path, embeddings)
@@ -5,25 +5,25 @@ Uses Pydantic for robust JSON parsing.
 
 import re
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI
+import logging
+from typing import Optional
+
 from pydantic import ValidationError
 
-from config import (
-    GOOGLE_API_KEY,
-    LLM_MODEL,
-    LLM_TEMPERATURE,
-    EXTRACTION_PROMPT,
-)
+import providers
+from config import EXTRACTION_PROMPT, NODE_COALESCING
 from graph.state import GraphState, ExtractedInfo, ExtractedInfoModel
+from graph.instrumentation import record, record_llm_usage
+from graph.llm_call import LLMTimeout, invoke_llm
+from graph.deadline import deadline_passed, degrade, llm_timeout, should_degrade
+from graph.singleflight import EXTRACT_FLIGHT, FlightTimeout, prompt_key
+
+logger = logging.getLogger(__name__)
 
 
 def get_llm():
     """Initialize Gemini LLM."""
-    return ChatGoogleGenerativeAI(
-        model=LLM_MODEL,
-        google_api_key=GOOGLE_API_KEY,
-        temperature=LLM_TEMPERATURE,
-    )
+    return providers.get_llm()
 
 
 def extract_json_from_text(text: str) -> str:
@@ -51,6 +51,32 @@ def extract_json_from_text(text: str) -> str:
     return text
 
 
+def is_json_response(response) -> bool:
+    """Whether an LLM response carries a parseable JSON object (hedged-call validator)."""
+    try:
+        json.loads(extract_json_from_text(response.content))
+        return True
+    except (json.JSONDecodeError, AttributeError, TypeError):
+        return False
+
+
+def fallback_extraction(state: GraphState, error: Optional[str]) -> GraphState:
+    """State with the original query used as-is for retrieval."""
+    logger.warning("[Extract Node] Using fallback extraction")
+    return {
+        **state,
+        "extracted_info": {
+            "job_type": "unknown",
+            "services_needed": [],
+            "location": None,
+            "urgency": "normal",
+            "additional_context": None,
+            "optimized_query": state["original_query"],  # Use original query for retrieval
+        },
+        "error": error,
+    }
+
+
 def extract_node(state: GraphState) -> GraphState:
     """
     Extract structured information from user's natural language query.
@@ -58,16 +84,40 @@ def extract_node(state: GraphState) -> GraphState:
     Input: original_query
     Output: extracted_info
     """
-    print("\n[Extract Node] Analyzing user query...")
+    logger.info("[Extract Node] Analyzing user query...")
 
     original_query = state["original_query"]
 
+    # Not enough time left for the LLM call: search with the raw query
+    if should_degrade(state, "extract"):
+        logger.warning("[Extract Node] Deadline too close, skipping extraction")
+        return {**fallback_extraction(state, None), "degradations": degrade(state, "extract:raw_query")}
+
     # Format prompt with user query
     prompt = EXTRACTION_PROMPT.format(query=original_query)
 
-    # Call LLM
+    # Call LLM (identical in-flight prompts share one call; deadline and hedging in invoke_llm)
     llm = get_llm()
-    response = llm.invoke(prompt)
+    try:
+        if NODE_COALESCING:
+            # A follower waits for the leader's call no longer than its own timeout
+            timeout = llm_timeout(state, "extract")
+            response, shared = EXTRACT_FLIGHT.do(
+                prompt_key(prompt), invoke_llm, "extract", llm, prompt, is_json_response, timeout, wait_timeout=timeout,
+            )
+        else:
+            response, shared = invoke_llm("extract", llm, prompt, is_json_response, llm_timeout(state, "extract")), False
+    except (LLMTimeout, FlightTimeout) as e:
+        logger.error("[Extract Node] %s", e)
+        fallback = fallback_extraction(state, "Extraction timed out, using original query")
+        if deadline_passed(state):
+            fallback["degradations"] = degrade(state, "extract:timeout")
+        return fallback
+
+    if shared:
+        record("coalesced_calls")
+    else:
+        record_llm_usage(response)
 
     # Parse JSON response with robust extraction
     try:
@@ -92,11 +142,11 @@ def extract_node(state: GraphState) -> GraphState:
             "optimized_query": optimized_query,
         }
 
-        print(f"[Extract Node] Job type: {extracted_info['job_type']}")
-        print(f"[Extract Node] Services: {extracted_info['services_needed']}")
-        if extracted_info['location']:
-            print(f"[Extract Node] Location: {extracted_info['location']}")
-        print(f"[Extract Node] Optimized query: {extracted_info['optimized_query']}")
+        logger.info("[Extract Node] Job type: %s", extracted_info["job_type"])
+        logger.debug("[Extract Node] Services: %s", extracted_info["services_needed"])
+        if extracted_info["location"]:
+            logger.debug("[Extract Node] Location: %s", extracted_info["location"])
+        logger.info("[Extract Node] Optimized query: %s", extracted_info["optimized_query"])
 
         return {
             **state,
@@ -105,27 +155,15 @@ def extract_node(state: GraphState) -> GraphState:
         }
 
     except json.JSONDecodeError as e:
-        print(f"[Extract Node] ERROR: JSON parse failed: {e}")
-        print(f"[Extract Node] Raw response: {response.content[:300]}...")
+        logger.error("[Extract Node] JSON parse failed: %s", e)
+        logger.debug("[Extract Node] Raw response: %s...", response.content[:300])
 
     except ValidationError as e:
-        print(f"[Extract Node] ERROR: Pydantic validation failed: {e}")
-        print(f"[Extract Node] Raw response: {response.content[:300]}...")
+        logger.error("[Extract Node] Pydantic validation failed: %s", e)
+        logger.debug("[Extract Node] Raw response: %s...", response.content[:300])
 
     except Exception as e:
-        print(f"[Extract Node] ERROR: Unexpected error: {e}")
+        logger.error("[Extract Node] Unexpected error: %s", e)
 
     # Fallback - use original query as-is
-    print("[Extract Node] Using fallback extraction")
-    return {
-        **state,
-        "extracted_info": {
-            "job_type": "unknown",
-            "services_needed": [],
-            "location": None,
-            "urgency": "normal",
-            "additional_context": None,
-            "optimized_query": original_query,  # Use original query for retrieval
-        },
-        "error": "Extraction failed, using original query",
-    }
+    return fallback_extraction(state, "Extraction failed, using original query")
@@ -1,39 +1,79 @@
 """
 Rerank Node - LLM-based reranking with Chain-of-Thought reasoning.
 Uses Pydantic for robust JSON parsing and stable candidate_id for lookups.
+
+With RERANK_MODE="two_phase" the call returns only the ranking; reasoning
+is written afterwards by graph/explanations.py.
 """
 
 import re
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI
+import logging
+from typing import Optional
+
 from pydantic import ValidationError
 
+import config
+import providers
 from config import (
-    GOOGLE_API_KEY,
-    LLM_MODEL,
-    LLM_TEMPERATURE,
+    RANKING_PROMPT,
     RERANKING_PROMPT,
+    RERANK_CANDIDATE_FORMAT,
     TOP_K_RERANK,
+    NODE_COALESCING,
 )
-from graph.state import GraphState, RankedVendor, RerankOutputModel
+from graph.state import GraphState, RankedVendor, RankingOutputModel, RerankOutputModel
+from graph.catalog import get_catalog
+from graph.instrumentation import record, record_llm_usage
+from graph.llm_call import LLMTimeout, invoke_llm
+from graph.deadline import deadline_passed, degrade, llm_timeout, should_degrade
+from graph.singleflight import RERANK_FLIGHT, FlightTimeout, prompt_key
+
+logger = logging.getLogger(__name__)
 
 
 def get_llm():
     """Initialize Gemini LLM for reranking."""
-    return ChatGoogleGenerativeAI(
-        model=LLM_MODEL,
-        google_api_key=GOOGLE_API_KEY,
-        temperature=LLM_TEMPERATURE,
-    )
+    return providers.get_llm()
+
+
+def format_candidates_for_prompt(
+    candidates: list,
+    catalog=None,
+    mode: str = RERANK_CANDIDATE_FORMAT,
+    with_score: bool = True,
+) -> str:
+    """
+    Format candidates into a readable string for the LLM with stable IDs.
 
+    With a catalog, candidates are ID references and details are looked up;
+    without one, each candidate dict must carry its own details.
 
-def format_candidates_for_prompt(candidates: list) -> str:
-    """Format candidates into a readable string for the LLM with stable IDs."""
+    mode "full" lists the raw vendor fields. mode "summary" sends the
+    precomputed summary plus location instead, falling back to the full
+    fields for vendors that have no summary yet. with_score=False leaves out
+    the similarity score line.
+    """
+    if mode not in ("full", "summary"):
+        raise ValueError(f"Unknown candidate format {mode!r}; expected 'full' or 'summary'")
     formatted = []
 
-    for c in candidates:
+    for ref in candidates:
+        c = catalog.record(ref["candidate_id"]) if catalog is not None else ref
+        if c is None:
+            continue
+
         # Use candidate_id as the stable identifier
-        parts = [f"### Candidate ID: {c['candidate_id']} - {c['company_name']}"]
+        parts = [f"### Candidate ID: {ref['candidate_id']} - {c['company_name']}"]
+
+        if mode == "summary" and c.get("summary"):
+            parts.append(f"- Summary: {c['summary']}")
+            if c.get("city"):
+                parts.append(f"- Location: {c['city']}")
+            if with_score:
+                parts.append(f"- Similarity score: {ref.get('similarity_score', 'N/A')}")
+            formatted.append("\n".join(parts))
+            continue
 
         if c.get("trading_name"):
             parts.append(f"- Also known as: {c['trading_name']}")
@@ -60,7 +100,8 @@ def format_candidates_for_prompt(candidates: list) -> str:
         if c.get("employees"):
             parts.append(f"- Employees: {c['employees']}")
 
-        parts.append(f"- Similarity score: {c.get('similarity_score', 'N/A')}")
+        if with_score:
+            parts.append(f"- Similarity score: {ref.get('similarity_score', 'N/A')}")
 
         formatted.append("\n".join(parts))
 
@@ -98,14 +139,44 @@ def extract_json_from_text(text: str) -> str:
     return text
 
 
+def is_json_response(response) -> bool:
+    """Whether an LLM response carries a parseable JSON object (hedged-call validator)."""
+    try:
+        json.loads(extract_json_from_text(response.content))
+        return True
+    except (json.JSONDecodeError, AttributeError, TypeError):
+        return False
+
+
+def similarity_fallback(state: GraphState, error: Optional[str], reason: str = "LLM reranking failed") -> GraphState:
+    """State with candidates ranked by similarity score (highest first)."""
+    logger.warning("[Rerank Node] Using fallback: sorting by similarity score")
+    sorted_candidates = sorted(state.get("candidates") or [], key=lambda x: x["similarity_score"], reverse=True)
+
+    ranked_vendors = []
+    for i, c in enumerate(sorted_candidates[:TOP_K_RERANK]):
+        ranked_vendors.append({
+            "rank": i + 1,
+            "candidate_id": c["candidate_id"],
+            "relevance_score": c["similarity_score"],  # Use similarity directly
+            "reasoning": f"Ranked by semantic similarity ({reason})",
+        })
+
+    return {
+        **state,
+        "ranked_vendors": ranked_vendors,
+        "error": error,
+    }
+
+
 def rerank_node(state: GraphState) -> GraphState:
     """
     Rerank candidates using LLM with Chain-of-Thought reasoning.
 
     Input: original_query, candidates
-    Output: ranked_vendors (with reasoning)
+    Output: ranked_vendors (with reasoning; None in two-phase mode)
     """
-    print("\n[Rerank Node] Analyzing candidates with CoT reasoning...")
+    logger.info("[Rerank Node] Analyzing candidates with CoT reasoning...")
 
     original_query = state["original_query"]
     candidates = state.get("candidates", [])
@@ -117,11 +188,20 @@ def rerank_node(state: GraphState) -> GraphState:
             "error": "No candidates to rerank",
         }
 
-    # Format candidates for prompt with stable IDs
-    candidates_text = format_candidates_for_prompt(candidates)
+    # Not enough time left for the LLM call: keep similarity order
+    if should_degrade(state, "rerank"):
+        logger.warning("[Rerank Node] Deadline too close, skipping LLM reranking")
+        fallback = similarity_fallback(state, None, "request deadline")
+        return {**fallback, "degradations": degrade(state, "rerank:similarity")}
+
+    # Format candidates for prompt with stable IDs (details from the catalog)
+    candidates_text = format_candidates_for_prompt(candidates, get_catalog())
+
+    # Two-phase: rank only, reasoning is written later (graph/explanations.py)
+    two_phase = config.RERANK_MODE == "two_phase"
 
     # Build prompt with ORIGINAL query (not extracted)
-    prompt = RERANKING_PROMPT.format(
+    prompt = (RANKING_PROMPT if two_phase else RERANKING_PROMPT).format(
         original_query=original_query,
         candidates=candidates_text,
         top_k=TOP_K_RERANK
@@ -129,12 +209,31 @@ def rerank_node(state: GraphState) -> GraphState:
 
     # Call LLM
     llm = get_llm()
-    print(f"[Rerank Node] Sending {len(candidates)} candidates to LLM for analysis...")
+    logger.info("[Rerank Node] Sending %d candidates to LLM for analysis...", len(candidates))
 
-    response = llm.invoke(prompt)
-
-    # Create lookup by candidate_id (stable, string-based)
-    candidate_lookup = {str(c["candidate_id"]): c for c in candidates}
+    try:
+        if NODE_COALESCING:
+            # A follower waits for the leader's call no longer than its own timeout
+            timeout = llm_timeout(state, "rerank")
+            response, shared = RERANK_FLIGHT.do(
+                prompt_key(prompt), invoke_llm, "rerank", llm, prompt, is_json_response, timeout, wait_timeout=timeout,
+            )
+        else:
+            response, shared = invoke_llm("rerank", llm, prompt, is_json_response, llm_timeout(state, "rerank")), False
+    except (LLMTimeout, FlightTimeout) as e:
+        logger.error("[Rerank Node] %s", e)
+        fallback = similarity_fallback(state, "Reranking timed out, using similarity fallback", "LLM reranking timed out")
+        if deadline_passed(state):
+            fallback["degradations"] = degrade(state, "rerank:timeout")
+        return fallback
+
+    if shared:
+        record("coalesced_calls")
+    else:
+        record_llm_usage(response)
+
+    # Retrieved candidate_ids (stable, string-based)
+    candidate_ids = {str(c["candidate_id"]) for c in candidates}
 
     # Parse JSON response with robust extraction
     try:
@@ -142,43 +241,34 @@ def rerank_node(state: GraphState) -> GraphState:
         raw_data = json.loads(json_str)
 
         # Validate with Pydantic
-        validated = RerankOutputModel(**raw_data)
-
-        print(f"[Rerank Node] User need analysis: {validated.user_need_analysis}")
-        print(f"[Rerank Node] Required services: {validated.required_service_types}")
+        if two_phase:
+            validated = RankingOutputModel(**raw_data)
+        else:
+            validated = RerankOutputModel(**raw_data)
+            logger.debug("[Rerank Node] User need analysis: %s", validated.user_need_analysis)
+            logger.debug("[Rerank Node] Required services: %s", validated.required_service_types)
 
         # Build ranked vendors list using stable candidate_id
         ranked_vendors: list[RankedVendor] = []
 
         for r in validated.rankings[:TOP_K_RERANK]:
-            candidate = candidate_lookup.get(r.candidate_id)
-
-            if candidate is None:
-                print(f"[Rerank Node] WARNING: candidate_id {r.candidate_id} not found, skipping")
+            if r.candidate_id not in candidate_ids:
+                logger.warning("[Rerank Node] candidate_id %s not found, skipping", r.candidate_id)
                 continue
 
             ranked_vendor: RankedVendor = {
                 "rank": r.rank,
                 "candidate_id": r.candidate_id,
-                "company_name": candidate["company_name"],
-                "trading_name": candidate.get("trading_name"),
-                "services": candidate.get("services"),
-                "products": candidate.get("products"),
-                "industry": candidate.get("industry"),
-                "about": candidate.get("about"),
-                "city": candidate.get("city"),
-                "address": candidate.get("address"),
-                "phone": candidate.get("phone"),
-                "email": candidate.get("email"),
-                "website": candidate.get("website"),
-                "employees": candidate.get("employees"),
-                "certifications": candidate.get("certifications"),
                 "relevance_score": r.relevance_score,
-                "reasoning": r.reasoning,
+                "reasoning": getattr(r, "reasoning", None),
             }
             ranked_vendors.append(ranked_vendor)
 
-        print(f"[Rerank Node] Ranked {len(ranked_vendors)} vendors")
+        logger.info("[Rerank Node] Ranked %d vendors", len(ranked_vendors))
+
+        if two_phase and config.EXPLAIN_MODE == "background" and ranked_vendors:
+            from graph.explanations import get_explanations
+            get_explanations().schedule(original_query, [v["candidate_id"] for v in ranked_vendors])
 
         return {
             **state,
@@ -186,44 +276,15 @@ def rerank_node(state: GraphState) -> GraphState:
         }
 
     except json.JSONDecodeError as e:
-        print(f"[Rerank Node] ERROR: JSON parse failed: {e}")
-        print(f"[Rerank Node] Raw response: {response.content[:500]}...")
+        logger.error("[Rerank Node] JSON parse failed: %s", e)
+        logger.debug("[Rerank Node] Raw response: %s...", response.content[:500])
 
     except ValidationError as e:
-        print(f"[Rerank Node] ERROR: Pydantic validation failed: {e}")
-        print(f"[Rerank Node] Raw response: {response.content[:500]}...")
+        logger.error("[Rerank Node] Pydantic validation failed: %s", e)
+        logger.debug("[Rerank Node] Raw response: %s...", response.content[:500])
 
     except Exception as e:
-        print(f"[Rerank Node] ERROR: Unexpected error: {e}")
+        logger.error("[Rerank Node] Unexpected error: %s", e)
 
     # Fallback - return candidates sorted by similarity (highest first)
-    print("[Rerank Node] Using fallback: sorting by similarity score")
-    sorted_candidates = sorted(candidates, key=lambda x: x["similarity_score"], reverse=True)
-
-    ranked_vendors = []
-    for i, c in enumerate(sorted_candidates[:TOP_K_RERANK]):
-        ranked_vendors.append({
-            "rank": i + 1,
-            "candidate_id": c["candidate_id"],
-            "company_name": c["company_name"],
-            "trading_name": c.get("trading_name"),
-            "services": c.get("services"),
-            "products": c.get("products"),
-            "industry": c.get("industry"),
-            "about": c.get("about"),
-            "city": c.get("city"),
-            "address": c.get("address"),
-            "phone": c.get("phone"),
-            "email": c.get("email"),
-            "website": c.get("website"),
-            "employees": c.get("employees"),
-            "certifications": c.get("certifications"),
-            "relevance_score": c["similarity_score"],  # Use similarity directly
-            "reasoning": "Ranked by semantic similarity (LLM reranking failed)",
-        })
-
-    return {
-        **state,
-        "ranked_vendors": ranked_vendors,
-        "error": "Reranking parse failed, using similarity fallback",
-    }
+    return similarity_fallback(state, "Reranking parse failed, using similarity fallback")
@@ -1,61 +1,288 @@
 """
 Retrieve Node - Fetches candidate vendors from vector store.
+Supports single-query search and multi-query search with reciprocal rank fusion,
+and an adaptive candidate count that trims the tail of the similarity scores.
 """
 
-import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+import config
+import providers
 from config import (
-    GOOGLE_API_KEY,
-    EMBEDDING_MODEL,
     CHROMA_PERSIST_DIR,
-    COLLECTION_NAME,
     TOP_K_RETRIEVAL,
+    MULTI_QUERY_RETRIEVAL,
+    MAX_SUB_QUERIES,
+    RRF_K,
+    ADAPTIVE_K,
+    ADAPTIVE_K_METHOD,
+    ADAPTIVE_K_FETCH,
+    ADAPTIVE_K_MIN,
+    ADAPTIVE_K_MAX,
+    ADAPTIVE_K_MIN_GAP,
+    ADAPTIVE_K_MIN_DEPTH,
+    NODE_COALESCING,
+    SHARD_KEY,
+    DEGRADE_TOP_K_RETRIEVAL,
 )
-from graph.state import GraphState, VendorCandidate
+from graph.state import GraphState, ExtractedInfo, VendorCandidate
+from graph.catalog import get_catalog, refresh_catalog
+from graph.instrumentation import record
+from graph.singleflight import EMBED_FLIGHT
+from graph.deadline import degrade, should_degrade
+from preprocessing.chroma_client import describe_store, open_store, store_exists
 
+logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=1)
 def get_vector_store():
-    """Load the ChromaDB vector store."""
+    """
+    Load the vector store.
+    Cached so every request (and every sub-query search) shares one client.
+    With VECTOR_BACKEND "mmap", the memory-mapped export of the store
+    (graph/mapped_index.py); otherwise ChromaDB (see open_chroma_store).
+    """
+    if config.VECTOR_BACKEND == "mmap":
+        from graph.mapped_index import open_mapped_store
+
+        return open_mapped_store(providers.get_embeddings(task_type="RETRIEVAL_QUERY"))
+    return open_chroma_store()
+
+
+def open_chroma_store():
+    """
+    Open the ChromaDB vector store (embedded, or on the Chroma server with
+    CHROMA_MODE="http"; see preprocessing.chroma_client).
+    With SHARD_KEY set, returns a ShardedVectorStore over every built shard.
+    """
+    if SHARD_KEY:
+        from graph.shard_router import open_sharded_store
+
+        return open_sharded_store(providers.get_embeddings(task_type="RETRIEVAL_QUERY"))
+
     # Check if vector store exists
-    if not os.path.exists(CHROMA_PERSIST_DIR):
+    if not store_exists(CHROMA_PERSIST_DIR):
         raise FileNotFoundError(
-            f"Vector store not found at '{CHROMA_PERSIST_DIR}'. "
+            f"Vector store not found at {describe_store(CHROMA_PERSIST_DIR)}. "
             "Please run 'python run_preprocessing.py' first to create the index."
         )
 
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=GOOGLE_API_KEY,
-        task_type="RETRIEVAL_QUERY"
-    )
+    return open_store(providers.get_embeddings(task_type="RETRIEVAL_QUERY"), CHROMA_PERSIST_DIR)
 
-    return Chroma(
-        collection_name=COLLECTION_NAME,
-        persist_directory=CHROMA_PERSIST_DIR,
-        embedding_function=embeddings
-    )
 
+@lru_cache(maxsize=1)
+def get_index_space() -> str:
+    """Distance space the index was built with (persisted with the collection)."""
+    from preprocessing.index_profiles import index_space
+
+    return index_space(get_vector_store())
 
-def distance_to_similarity(distance: float) -> float:
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
     """
     Convert ChromaDB distance to similarity score.
-    ChromaDB returns L2 distance by default (lower = more similar).
-    We convert to similarity where higher = more similar (0.0 to 1.0 range).
+    Lower distance = more similar; similarity is higher = more similar (0.0 to 1.0 range).
+    """
+    if space == "l2":
+        # Squared L2: 1 / (1 + distance) maps [0, inf) -> (0, 1]
+        return 1.0 / (1.0 + distance)
+    # cosine and ip distances are 1 - similarity
+    return min(1.0, max(0.0, 1.0 - distance))
+
+
+def build_sub_queries(extracted_info: ExtractedInfo, max_sub_queries: int = MAX_SUB_QUERIES) -> list[str]:
+    """
+    Build the list of search queries for multi-query retrieval.
+
+    The optimized query always comes first; each distinct service phrase follows,
+    suffixed with the extracted location so local vendors are still favoured.
+    """
+    optimized_query = extracted_info["optimized_query"]
+    location = extracted_info.get("location")
+
+    queries = [optimized_query]
+    seen = {optimized_query.strip().lower()}
+
+    for service in extracted_info.get("services_needed") or []:
+        if len(queries) > max_sub_queries:
+            break
+        phrase = service.strip()
+        if location and location.lower() not in phrase.lower():
+            phrase = f"{phrase} {location}"
+        if phrase.lower() in seen:
+            continue
+        seen.add(phrase.lower())
+        queries.append(phrase)
+
+    return queries
+
+
+def doc_key(doc) -> str:
+    """Identity of a retrieved document across result lists."""
+    return str(doc.metadata.get("doc_id", doc.page_content))
+
+
+def reciprocal_rank_fusion(result_lists: list[list], k: int, rrf_k: int = RRF_K) -> list[tuple]:
+    """
+    Fuse several ranked (doc, distance) lists with reciprocal rank fusion.
+
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    The best (smallest) distance seen for a document is kept for its similarity.
+
+    Returns:
+        Top k (doc, distance) pairs ordered by fused score.
+    """
+    fused: dict[str, dict] = {}
+
+    for results in result_lists:
+        for rank, (doc, distance) in enumerate(results, start=1):
+            key = doc_key(doc)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {"doc": doc, "distance": distance, "score": 0.0}
+            entry["score"] += 1.0 / (rrf_k + rank)
+            entry["distance"] = min(entry["distance"], distance)
+
+    ordered = sorted(fused.values(), key=lambda e: (-e["score"], e["distance"]))
+    return [(e["doc"], e["distance"]) for e in ordered[:k]]
+
+
+def adaptive_cutoff(
+    scores: list[float],
+    method: str = ADAPTIVE_K_METHOD,
+    k_min: int = ADAPTIVE_K_MIN,
+    k_max: int = ADAPTIVE_K_MAX,
+    min_gap: float = ADAPTIVE_K_MIN_GAP,
+    min_depth: float = ADAPTIVE_K_MIN_DEPTH,
+) -> int:
+    """
+    Number of leading candidates worth reranking, judged from their similarity scores.
+
+    scores are the over-fetched similarities, highest first. The result is
+    between k_min and k_max (both capped at len(scores)):
+      - "gap":   cut at the largest drop between neighbouring scores, if it
+                 is at least min_gap of the range of all fetched scores
+      - "elbow": cut before the knee, the score furthest below the straight
+                 line from the first score to the last (the start of the tail),
+                 if it lies at least min_depth below it (both axes scaled to [0, 1])
+
+    Scores without a clear drop or knee (all roughly equally relevant) keep k_max.
+    """
+    if method not in ("gap", "elbow"):
+        raise ValueError(f"Unknown ADAPTIVE_K_METHOD {method!r}; expected 'gap' or 'elbow'")
+    n = len(scores)
+    k_max = min(k_max, n)
+    k_min = min(max(k_min, 1), k_max)
+    spread = scores[0] - scores[-1] if n else 0.0
+    if k_min == k_max or spread <= 0:
+        return k_max
+
+    if method == "gap":
+        # Keeping k candidates cuts between scores[k - 1] and scores[k]
+        drop, k = max((scores[k - 1] - scores[k], k) for k in range(k_min, min(k_max + 1, n)))
+        return k if drop >= min_gap * spread else k_max
+
+    # Distance below the chord, with positions and scores normalised to [0, 1]
+    depth, index = max(
+        ((1 - i / (n - 1)) - (s - scores[-1]) / spread, i) for i, s in enumerate(scores)
+    )
+    if depth < min_depth:
+        return k_max
+    return min(max(index, k_min), k_max)
+
+
+def embed_queries(vector_store, queries: list[str]) -> list[list[float]]:
+    """
+    Embed all search queries in a single embedding call.
+    Identical in-flight query batches share one call.
+    """
+    embeddings = vector_store.embeddings
+    if len(queries) == 1:
+        def embed():
+            return [embeddings.embed_query(queries[0])]
+    else:
+        def embed():
+            return embeddings.embed_documents(queries)
+
+    if NODE_COALESCING:
+        vectors, shared = EMBED_FLIGHT.do(tuple(queries), embed)
+    else:
+        vectors, shared = embed(), False
+
+    record("coalesced_calls" if shared else "embedding_calls")
+    return vectors
+
+
+def multi_query_search(vector_store, vectors: list[list[float]], k: int) -> list[list[tuple]]:
+    """
+    Search with several query vectors; (doc, distance) results per vector,
+    to be fused with reciprocal_rank_fusion. The vector searches run
+    concurrently against the shared store.
+    """
+    def search(vector):
+        return vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+
+    with ThreadPoolExecutor(max_workers=len(vectors)) as pool:
+        return list(pool.map(search, vectors))
+
+
+def adaptive_cut_lists(result_lists: list[list[tuple]], space: str = "l2", **options) -> list[list[tuple]]:
+    """
+    Apply adaptive_cutoff to each (doc, distance) list on its own similarity
+    scores. Multi-query lists are cut before fusion: RRF reorders candidates
+    away from similarity order, so a cut sized on similarities cannot be
+    applied to the fused list.
     """
-    # Using 1 / (1 + distance) to map [0, inf) -> (0, 1]
-    return 1.0 / (1.0 + distance)
+    return [
+        results[:adaptive_cutoff([distance_to_similarity(d, space) for _, d in results], **options)]
+        for results in result_lists
+    ]
+
+
+def to_candidate(doc, distance: float, idx: int, space: str = "l2") -> VendorCandidate:
+    """Convert a retrieved document into a VendorCandidate reference with a stable ID."""
+    # Prefer persisted doc_id; fallback to positional index
+    candidate_id = str(doc.metadata.get("doc_id", idx))
+
+    # Convert distance to similarity (higher = better) for the index's distance space
+    similarity = distance_to_similarity(distance, space)
+
+    return {
+        "candidate_id": candidate_id,  # Details are looked up in the vendor catalog
+        "similarity_score": round(similarity, 4),
+    }
+
+
+def keep_cataloged(candidates: list[VendorCandidate]) -> list[VendorCandidate]:
+    """
+    Drop candidates the vendor catalog can't resolve.
+    The catalog is reopened once first in case the index was rebuilt since it was loaded.
+    """
+    catalog = get_catalog()
+    if all(c["candidate_id"] in catalog for c in candidates):
+        return candidates
+
+    catalog = refresh_catalog()
+    known = [c for c in candidates if c["candidate_id"] in catalog]
+    if len(known) < len(candidates):
+        logger.warning(
+            "[Retrieve Node] %d candidates missing from the vendor catalog; re-run preprocessing",
+            len(candidates) - len(known),
+        )
+    return known
 
 
 def retrieve_node(state: GraphState) -> GraphState:
     """
     Retrieve candidate vendors from vector store using optimized query.
 
-    Input: extracted_info (uses optimized_query)
+    Input: extracted_info (uses optimized_query, and services_needed in multi-query mode)
     Output: candidates
     """
-    print("\n[Retrieve Node] Searching for candidates...")
+    logger.info("[Retrieve Node] Searching for candidates...")
 
     extracted_info = state.get("extracted_info")
     if not extracted_info:
@@ -67,64 +294,90 @@ def retrieve_node(state: GraphState) -> GraphState:
 
     # Use optimized query from extraction
     query = extracted_info.get("optimized_query", state["original_query"])
-    print(f"[Retrieve Node] Query: {query}")
+    logger.info("[Retrieve Node] Query: %s", query)
+
+    # Adaptive mode over-fetches and trims after scoring
+    fetch_k = max(ADAPTIVE_K_FETCH, ADAPTIVE_K_MAX) if ADAPTIVE_K else TOP_K_RETRIEVAL
+    degradations = state.get("degradations")
+
+    # Short on time: fewer candidates keep the rerank prompt (and call) small
+    degraded = fetch_k > DEGRADE_TOP_K_RETRIEVAL and should_degrade(state, "retrieve")
+    if degraded:
+        fetch_k = DEGRADE_TOP_K_RETRIEVAL
+        degradations = degrade(state, f"retrieve:k={fetch_k}")
+        logger.warning("[Retrieve Node] Deadline close, retrieving %d candidates", fetch_k)
 
     # Search vector store with error handling
     try:
         vector_store = get_vector_store()
-        results = vector_store.similarity_search_with_score(query, k=TOP_K_RETRIEVAL)
+        space = get_index_space()
+        if SHARD_KEY:
+            # Prune shards by extracted location / job_type
+            vector_store = vector_store.route(extracted_info)
+        if MULTI_QUERY_RETRIEVAL and not degraded:
+            queries = build_sub_queries({**extracted_info, "optimized_query": query})
+            logger.info("[Retrieve Node] Multi-query search with %d queries", len(queries))
+            vectors = embed_queries(vector_store, queries)
+            result_lists = multi_query_search(vector_store, vectors, k=fetch_k)
+        else:
+            vector = embed_queries(vector_store, [query])[0]
+            result_lists = [vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=fetch_k)]
     except FileNotFoundError as e:
-        print(f"[Retrieve Node] ERROR: {e}")
+        logger.error("[Retrieve Node] %s", e)
         return {
             **state,
             "candidates": [],
             "error": str(e),
         }
     except Exception as e:
-        print(f"[Retrieve Node] ERROR: Vector store query failed: {e}")
+        logger.error("[Retrieve Node] Vector store query failed: %s", e)
         return {
             **state,
             "candidates": [],
             "error": f"Vector store query failed: {str(e)}",
         }
 
-    # Convert to VendorCandidate format with stable IDs
-    candidates: list[VendorCandidate] = []
-    for idx, (doc, distance) in enumerate(results):
-        meta = doc.metadata
-
-        # Prefer persisted doc_id; fallback to positional index
-        candidate_id = str(meta.get("doc_id", idx))
-
-        # Convert distance to similarity (higher = better)
-        similarity = distance_to_similarity(distance)
-
-        candidate: VendorCandidate = {
-            "candidate_id": candidate_id,  # Stable ID for lookup
-            "company_name": meta.get("company_name", "Unknown"),
-            "trading_name": meta.get("trading_name"),
-            "services": meta.get("services"),
-            "products": meta.get("products"),
-            "industry": meta.get("industry"),
-            "about": meta.get("about"),
-            "city": meta.get("city"),
-            "address": meta.get("address"),
-            "phone": meta.get("phone"),
-            "email": meta.get("email"),
-            "website": meta.get("website"),
-            "employees": meta.get("employees"),
-            "certifications": meta.get("certifications"),
-            "similarity_score": round(similarity, 4),  # Now correctly: higher = better
+    adaptive = ADAPTIVE_K and not degraded and any(result_lists)
+    top_k = fetch_k
+    if adaptive:
+        # Each list is cut on its own similarity scores, before any fusion
+        fetched = len({doc_key(doc) for results in result_lists for doc, _ in results})
+        result_lists = adaptive_cut_lists(result_lists, space)
+        top_k = ADAPTIVE_K_MAX
+    results = reciprocal_rank_fusion(result_lists, k=top_k) if len(result_lists) > 1 else result_lists[0][:top_k]
+
+    # Convert to VendorCandidate references with stable IDs
+    candidates: list[VendorCandidate] = [
+        to_candidate(doc, distance, idx, space) for idx, (doc, distance) in enumerate(results)
+    ]
+
+    if adaptive:
+        record("candidates_fetched", fetched)
+        record("adaptive_k", len(candidates))
+        logger.info("[Retrieve Node] Adaptive k: keeping %d of %d candidates", len(candidates), fetched)
+
+    try:
+        candidates = keep_cataloged(candidates)
+    except Exception as e:
+        logger.error("[Retrieve Node] Vendor catalog unavailable: %s", e)
+        return {
+            **state,
+            "candidates": [],
+            "error": f"Vendor catalog unavailable: {str(e)}",
         }
-        candidates.append(candidate)
 
-    print(f"[Retrieve Node] Found {len(candidates)} candidates")
+    record("candidates", len(candidates))
+    logger.info("[Retrieve Node] Found %d candidates", len(candidates))
 
     # Preview top 3 (sorted by similarity, highest first)
-    for i, c in enumerate(candidates[:3]):
-        print(f"  [{i+1}] {c['company_name']} (similarity: {c['similarity_score']:.4f})")
+    if logger.isEnabledFor(logging.DEBUG):
+        catalog = get_catalog()
+        for i, c in enumerate(candidates[:3]):
+            name = catalog.record(c["candidate_id"]).company_name
+            logger.debug("  [%d] %s (similarity: %.4f)", i + 1, name, c["similarity_score"])
 
     return {
         **state,
         "candidates": candidates,
+        "degradations": degradations,
     }
@@ -0,0 +1,165 @@
+"""
+Append-only query log.
+
+Every served request (pipeline run or cache hit) becomes one JSONL line in
+QUERY_LOG_PATH: the query, extracted info, candidate ids, ranking, per-node
+timings and the cache that served it, if any. Entries go through a bounded
+queue to a background writer thread, so requests never wait on the disk;
+when the queue is full an entry is dropped and counted
+(query_log_dropped_total).
+
+The log is read back by benchmarks.replay (compare a log against the
+current build) and by the service's startup pre-warm (top_queries).
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+
+import config
+from config import QUERY_LOG_PATH, QUERY_LOG_QUEUE_SIZE
+from graph.instrumentation import REGISTRY
+
+WRITE_BATCH = 256
+
+# Set while pre-warming or auditing, so internal runs don't count as traffic
+_suppressed: ContextVar[bool] = ContextVar("query_log_suppressed", default=False)
+
+
+@contextmanager
+def suppressed():
+    """Don't log requests run inside this block (in the current thread/context)."""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+class QueryLog:
+    """JSONL appender fed through a queue by a daemon writer thread."""
+
+    def __init__(self, path: str = QUERY_LOG_PATH, queue_size: int = QUERY_LOG_QUEUE_SIZE):
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def write(self, entry: dict):
+        """Queue an entry; never blocks."""
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            REGISTRY.inc("query_log_dropped_total")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued entries are on disk; False if timeout passed first."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < WRITE_BATCH:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    f.write("".join(json.dumps(entry, default=str) + "\n" for entry in batch))
+                    f.flush()
+                except OSError:
+                    self.dropped += len(batch)
+                    REGISTRY.inc("query_log_dropped_total", len(batch))
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+
+
+@lru_cache(maxsize=1)
+def get_query_log() -> QueryLog:
+    """Process-wide query log."""
+    return QueryLog()
+
+
+def build_entry(query: str, state: dict, request: dict) -> dict:
+    """Log entry for a finished request (state may be materialized or not)."""
+    return {
+        "ts": round(time.time(), 3),
+        "request_id": request["request_id"],
+        "query": query,
+        "extracted_info": state.get("extracted_info"),
+        "candidate_ids": [c["candidate_id"] for c in state.get("candidates") or []],
+        "ranking": [
+            {"candidate_id": v["candidate_id"], "rank": v.get("rank"), "relevance_score": v.get("relevance_score")}
+            for v in state.get("ranked_vendors") or []
+        ],
+        "timings": {
+            "total_s": request.get("latency_s"),
+            **{name: node.get("latency_s") for name, node in request["nodes"].items()},
+        },
+        "cache": state.get("result_cache"),
+        "degradations": state.get("degradations") or [],
+        "error": state.get("error"),
+    }
+
+
+def log_request(query: str, state: dict, request: dict):
+    """Queue a log entry for a served request (no-op unless QUERY_LOG is on)."""
+    if config.QUERY_LOG and not _suppressed.get():
+        get_query_log().write(build_entry(query, state, request))
+
+
+def read_log(path: str = QUERY_LOG_PATH) -> Iterator[dict]:
+    """Entries of a query log, skipping a line cut short by a crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def top_queries(n: int, path: str = QUERY_LOG_PATH) -> list[str]:
+    """
+    The n most frequent successfully served queries (counted by normalized
+    text), each as its most recently logged wording.
+    """
+    from graph.workflow import normalize_query
+
+    if n <= 0 or not os.path.exists(path):
+        return []
+    counts: Counter = Counter()
+    latest: dict[str, str] = {}
+    for entry in read_log(path):
+        if entry.get("error") or not entry.get("query"):
+            continue
+        key = normalize_query(entry["query"])
+        counts[key] += 1
+        latest[key] = entry["query"]
+    return [latest[key] for key, _ in counts.most_common(n)]
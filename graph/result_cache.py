@@ -0,0 +1,174 @@
+"""
+End-to-end result cache in front of run_recommendation.
+
+Entries are keyed by the normalized query, a fingerprint of the
+configuration that shapes results (models, prompts, k values, retrieval
+modes) and the index generation (preprocessing.index_generation). A reindex
+bumps the generation, so results computed against an older index are
+never served.
+
+Entries hold extracted_info, candidates and ranked_vendors as candidate_id
+references; vendor details are filled in from the catalog on a hit, as
+for a fresh run. Runs that ended with an error are not cached.
+
+Two tiers:
+  - memory: LRU of RESULT_CACHE_SIZE entries
+  - disk (optional, RESULT_CACHE_DB): SQLite file shared by worker
+    processes and kept across restarts; disk hits are copied into memory
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import config
+from config import RESULT_CACHE_DB, RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S
+from graph.instrumentation import REGISTRY
+from preprocessing.index_generation import current_generation
+
+# Settings that change what a query returns
+FINGERPRINT_SETTINGS = (
+    "LLM_MODEL", "LLM_TEMPERATURE", "EMBEDDING_MODEL", "COLLECTION_NAME", "CHROMA_PERSIST_DIR",
+    "TOP_K_RETRIEVAL", "TOP_K_RERANK", "MULTI_QUERY_RETRIEVAL", "MAX_SUB_QUERIES", "RRF_K",
+    "ADAPTIVE_K", "ADAPTIVE_K_METHOD", "ADAPTIVE_K_FETCH", "ADAPTIVE_K_MIN", "ADAPTIVE_K_MAX",
+    "ADAPTIVE_K_MIN_GAP", "ADAPTIVE_K_MIN_DEPTH", "RERANK_CANDIDATE_FORMAT",
+    "VECTOR_BACKEND", "INDEX_PROFILE", "SHARD_KEY",
+    "EXTRACTION_PROMPT", "RERANKING_PROMPT", "RERANK_MODE", "RANKING_PROMPT",
+)
+
+# Parts of the final state that are cached (details come from the catalog)
+CACHED_FIELDS = ("extracted_info", "candidates", "ranked_vendors")
+
+
+@lru_cache(maxsize=1)
+def config_fingerprint() -> str:
+    settings = {name: getattr(config, name, None) for name in FINGERPRINT_SETTINGS}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(normalized_query: str, generation: str) -> str:
+    raw = json.dumps([normalized_query, config_fingerprint(), generation])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """In-memory LRU of pipeline results with an optional SQLite tier."""
+
+    def __init__(self, size: int = RESULT_CACHE_SIZE, ttl_s: float = RESULT_CACHE_TTL_S, db_path: Optional[str] = None):
+        self.size = size
+        self.ttl_s = ttl_s
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # key -> (created, JSON text); decoded per hit so callers can't mutate cached results
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._generation: Optional[str] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_generation: Optional[str] = None
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, generation TEXT, created REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    def _check_generation(self, generation: str):
+        # Entries of older generations can never be hit again; free them
+        if generation != self._generation:
+            self._memory.clear()
+            self._generation = generation
+
+    def get(self, key: str, generation: str) -> tuple[Optional[dict], Optional[str]]:
+        """(cached fields, tier) for key, or (None, None) on a miss."""
+        now = time.time()
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_s:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                REGISTRY.inc("result_cache_hits_total", tier="memory")
+                return json.loads(entry[1]), "memory"
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT created, value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[0] <= self.ttl_s:
+                    self._remember(key, row[0], row[1])
+                    self.hits["disk"] += 1
+                    REGISTRY.inc("result_cache_hits_total", tier="disk")
+                    return json.loads(row[1]), "disk"
+
+            self.misses += 1
+            REGISTRY.inc("result_cache_misses_total")
+            return None, None
+
+    def put(self, key: str, generation: str, value: dict):
+        """Store value for key, unless the index changed since generation was read."""
+        # Keys include the generation, so this is housekeeping rather than correctness
+        if generation != current_generation():
+            return
+        now = time.time()
+        text = json.dumps(value)
+        with self._lock:
+            self._check_generation(generation)
+            self._remember(key, now, text)
+            if self._db is not None:
+                if generation != self._db_generation:
+                    self._db.execute(
+                        "DELETE FROM results WHERE generation != ? OR created < ?", (generation, now - self.ttl_s),
+                    )
+                    self._db_generation = generation
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, generation, now, text),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, text: str):
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.misses + sum(self.hits.values())
+            return {
+                "entries": len(self._memory),
+                "generation": self._generation,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round(sum(self.hits.values()) / lookups, 4) if lookups else None,
+                "disk": self.db_path,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache."""
+    return ResultCache(db_path=RESULT_CACHE_DB)
+
+
+def result_cache_stats() -> Optional[dict]:
+    """Stats of the process-wide cache (None when RESULT_CACHE is off)."""
+    return get_result_cache().stats() if config.RESULT_CACHE else None
+
+
+def cacheable(state: dict) -> dict:
+    """The parts of a final graph state that are stored."""
+    return {field: state.get(field) for field in CACHED_FIELDS}
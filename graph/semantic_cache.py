@@ -0,0 +1,261 @@
+"""
+Semantic cache for near-duplicate queries.
+
+The raw query is embedded and compared (cosine) with the queries of
+recently served results, held in a small in-process matrix. A cached result
+is reused, skipping extract, retrieve and rerank, when:
+  - similarity >= SEMANTIC_CACHE_THRESHOLD,
+  - both queries name the same places (SHARD_REGIONS gazetteer), and
+  - the location extracted for the cached query occurs in the new query.
+
+The location checks keep "electrician in Leeds" from being answered with
+results for "electrician in York", which embeddings place very close.
+
+Like the result cache, entries are dropped when the index generation
+changes. A sampled fraction of hits (SEMANTIC_CACHE_AUDIT_RATE) is re-run
+through the full pipeline in the background, and the overlap between the
+served and fresh rankings is recorded as the agreement metric.
+"""
+
+import copy
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+
+import config
+import providers
+from config import (
+    SEMANTIC_CACHE_AUDIT_RATE,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_S,
+)
+from graph.instrumentation import REGISTRY
+from preprocessing.sharding import place_names
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_TASK_TYPE = "SEMANTIC_SIMILARITY"
+AGREEMENT_BUCKETS = (0.0, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+
+@dataclass
+class Probe:
+    """A looked-up query: its embedding and, on a hit, the cached result."""
+
+    query: str
+    generation: str
+    vector: np.ndarray
+    value: Optional[dict] = None
+    matched_query: Optional[str] = None
+    similarity: Optional[float] = None
+
+
+@dataclass
+class _Entry:
+    query: str
+    places: frozenset
+    location: Optional[str]
+    value: dict
+    created: float
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def location_matches(query: str, entry: _Entry) -> bool:
+    """Whether query names the same location as a cached entry."""
+    if place_names(query) != entry.places:
+        return False
+    return entry.location is None or re.search(rf"\b{re.escape(entry.location)}\b", _normalize(query)) is not None
+
+
+def ranking_agreement(served: list[dict], fresh: list[dict]) -> float:
+    """Share of candidate ids the two rankings have in common (1.0 = same set)."""
+    served_ids = {v["candidate_id"] for v in served or []}
+    fresh_ids = {v["candidate_id"] for v in fresh or []}
+    if not served_ids and not fresh_ids:
+        return 1.0
+    return len(served_ids & fresh_ids) / max(len(served_ids), len(fresh_ids))
+
+
+class SemanticCache:
+    """Brute-force cosine index over the embeddings of served queries."""
+
+    def __init__(
+        self,
+        size: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_s: float = SEMANTIC_CACHE_TTL_S,
+        audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE,
+        embeddings=None,
+    ):
+        self.size = size
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.audit_rate = audit_rate
+        self._embeddings = embeddings
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (size, dims), unit rows; allocated on first add
+        self._entries: list[Optional[_Entry]] = [None] * size
+        self._last_used = np.zeros(size)
+        self._slots: dict[str, int] = {}  # normalized query -> row
+        self._generation: Optional[str] = None
+        self._audit_running = False
+        self.hits = 0
+        self.misses = 0
+        self.audits = 0
+        self.agreement_sum = 0.0
+        self.top1_agreements = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        embeddings = self._embeddings or providers.get_embeddings(task_type=EMBEDDING_TASK_TYPE)
+        vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _check_generation(self, generation: str):
+        if generation != self._generation:
+            self._entries = [None] * self.size
+            self._last_used[:] = 0
+            self._slots.clear()
+            self._generation = generation
+
+    def lookup(self, query: str, generation: str) -> Probe:
+        """Embed query and find a cached near-duplicate; probe.value is None on a miss."""
+        probe = Probe(query=query, generation=generation, vector=self.embed(query))
+        now = time.time()
+        with self._lock:
+            self._check_generation(generation)
+            if self._vectors is not None and self._slots and len(probe.vector) == self._vectors.shape[1]:
+                similarities = self._vectors @ probe.vector
+                for row in np.argsort(-similarities):
+                    if similarities[row] < self.threshold:
+                        break
+                    entry = self._entries[row]
+                    if entry is None or now - entry.created > self.ttl_s or not location_matches(query, entry):
+                        continue
+                    self._last_used[row] = now
+                    probe.value = copy.deepcopy(entry.value)
+                    probe.matched_query = entry.query
+                    probe.similarity = round(float(similarities[row]), 4)
+                    break
+
+            if probe.value is None:
+                self.misses += 1
+                REGISTRY.inc("semantic_cache_misses_total")
+                return probe
+            self.hits += 1
+        REGISTRY.inc("semantic_cache_hits_total")
+        REGISTRY.observe("semantic_cache_similarity", probe.similarity, AGREEMENT_BUCKETS + (0.95, 0.99))
+        return probe
+
+    def add(self, probe: Probe, state: dict):
+        """Store the result of a pipeline run for the probed query."""
+        from graph.result_cache import cacheable
+        from preprocessing.index_generation import current_generation
+
+        if probe.generation != current_generation():
+            return
+        location = (state.get("extracted_info") or {}).get("location")
+        entry = _Entry(
+            query=probe.query,
+            places=place_names(probe.query),
+            location=_normalize(location) if location else None,
+            value=cacheable(state),
+            created=time.time(),
+        )
+        key = _normalize(probe.query)
+        with self._lock:
+            self._check_generation(probe.generation)
+            if self._vectors is None or self._vectors.shape[1] != len(probe.vector):
+                self._vectors = np.zeros((self.size, len(probe.vector)), dtype=np.float32)
+                self._entries = [None] * self.size
+                self._slots.clear()
+            row = self._slots.get(key)
+            if row is None:
+                # Free row if any, else the least recently used one
+                row = int(np.argmin(self._last_used))
+                evicted = self._entries[row]
+                if evicted is not None:
+                    self._slots.pop(_normalize(evicted.query), None)
+            self._vectors[row] = probe.vector
+            self._entries[row] = entry
+            self._last_used[row] = entry.created
+            self._slots[key] = row
+
+    def maybe_audit(self, probe: Probe, served: dict, run_fresh: Callable[[str], dict]):
+        """
+        For a sampled hit, run the full pipeline in a background thread and
+        record how well the served ranking agrees with the fresh one. At most
+        one audit runs at a time; samples arriving meanwhile are skipped.
+        """
+        if random.random() >= self.audit_rate:
+            return
+        with self._lock:
+            if self._audit_running:
+                return
+            self._audit_running = True
+
+        def audit():
+            try:
+                fresh = run_fresh(probe.query)
+                if fresh.get("error"):
+                    return
+                agreement = ranking_agreement(served.get("ranked_vendors"), fresh.get("ranked_vendors"))
+                top1 = _top_id(served) == _top_id(fresh)
+                with self._lock:
+                    self.audits += 1
+                    self.agreement_sum += agreement
+                    self.top1_agreements += top1
+                REGISTRY.observe("semantic_cache_agreement", agreement, AGREEMENT_BUCKETS)
+                REGISTRY.inc("semantic_cache_audits_total", top1_match=str(top1).lower())
+                logger.info(
+                    "[Semantic cache] audit %r ~ %r (similarity %s): agreement %.2f, top-1 match %s",
+                    probe.query, probe.matched_query, probe.similarity, agreement, top1,
+                )
+            except Exception as e:
+                logger.warning("[Semantic cache] audit failed for %r: %s", probe.query, e)
+            finally:
+                with self._lock:
+                    self._audit_running = False
+
+        threading.Thread(target=audit, name="semantic-cache-audit", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "audits": self.audits,
+                "mean_agreement": round(self.agreement_sum / self.audits, 4) if self.audits else None,
+                "top1_agreement": round(self.top1_agreements / self.audits, 4) if self.audits else None,
+            }
+
+
+def _top_id(state: dict) -> Optional[str]:
+    ranked = state.get("ranked_vendors") or []
+    return ranked[0]["candidate_id"] if ranked else None
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide semantic cache."""
+    return SemanticCache()
+
+
+def semantic_cache_stats() -> Optional[dict]:
+    """Stats of the process-wide cache (None when SEMANTIC_CACHE is off)."""
+    return get_semantic_cache().stats() if config.SEMANTIC_CACHE else None
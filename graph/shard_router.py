@@ -0,0 +1,152 @@
+"""
+Fan-out search over a sharded vector index.
+
+ShardedVectorStore looks like the single Chroma store to the retrieve node.
+Each search runs on the relevant shards concurrently, and each shard returns
+its own top k. The sorted per-shard lists are merged with a k-way heap
+merge into the global top k.
+
+Routing uses the extracted query:
+  - SHARD_KEY = "region":   shards for the extracted location (+ SHARD_OTHER)
+  - SHARD_KEY = "industry": shard for the job_type bucket (+ SHARD_OTHER)
+  - SHARD_KEY = "hash", or nothing recognised: every shard
+
+If the routed shards return fewer than k results, the remaining shards
+are searched too, so pruning never returns fewer candidates than an
+unsharded search would.
+"""
+
+import heapq
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from config import SHARD_KEY, SHARD_OTHER, SHARD_PERSIST_DIR, SHARD_SEARCH_WORKERS
+from graph.instrumentation import record
+from graph.state import ExtractedInfo
+from preprocessing.chroma_client import is_remote, open_store, server_url
+from preprocessing.index_profiles import index_space
+from preprocessing.sharding import (
+    check_shard_key,
+    existing_shards,
+    industry_bucket_of,
+    region_of,
+    shard_dir,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def merge_top_k(result_lists: Iterable[list[tuple]], k: int) -> list[tuple]:
+    """
+    Merge (doc, distance) lists, each sorted by ascending distance, into the
+    overall k nearest, dropping repeated doc_ids.
+    """
+    merged = []
+    seen: set[str] = set()
+    for doc, distance in heapq.merge(*result_lists, key=lambda pair: pair[1]):
+        key = str(doc.metadata.get("doc_id", doc.page_content))
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append((doc, distance))
+        if len(merged) == k:
+            break
+    return merged
+
+
+def route_shards(extracted_info: Optional[ExtractedInfo], shards: list[str], key: Optional[str] = SHARD_KEY) -> list[str]:
+    """Shards worth searching for a query, in stable order (all shards if nothing can be pruned)."""
+    if not extracted_info or key == "hash":
+        return list(shards)
+    if key == "region":
+        target = region_of(extracted_info.get("location"))
+    else:
+        target = industry_bucket_of(extracted_info.get("job_type"))
+    if target is None:
+        return list(shards)
+    return [shard for shard in shards if shard in (target, SHARD_OTHER)] or list(shards)
+
+
+class ShardedVectorStore:
+    """Concurrent search across per-shard Chroma stores, merged into one top-k list."""
+
+    def __init__(
+        self,
+        stores: dict,
+        embeddings,
+        pool: ThreadPoolExecutor,
+        key: str,
+        space: str = "l2",
+        selected: Optional[list[str]] = None,
+    ):
+        self.stores = stores
+        self.embeddings = embeddings
+        self.key = key
+        self.space = space  # Shared by every shard, so distances are comparable when merged
+        self.selected = selected if selected is not None else list(stores)
+        self._pool = pool
+
+    def route(self, extracted_info: Optional[ExtractedInfo]) -> "ShardedVectorStore":
+        """A view of this store limited to the shards relevant to the query."""
+        selected = route_shards(extracted_info, list(self.stores), self.key)
+        if len(selected) < len(self.stores):
+            logger.info("[Retrieve Node] Routed to %d/%d shards: %s", len(selected), len(self.stores), ", ".join(selected))
+        return ShardedVectorStore(self.stores, self.embeddings, self._pool, self.key, self.space, selected)
+
+    def _search(self, shards: list[str], embedding: list[float], k: int) -> list[tuple]:
+        def search(shard):
+            return self.stores[shard].similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+
+        record("shards_searched", len(shards))
+        if len(shards) == 1:
+            return search(shards[0])
+        return merge_top_k(self._pool.map(search, shards), k)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: list[float], k: int = 4, **kwargs) -> list[tuple]:
+        """Top k (doc, distance) pairs across the selected shards (widened if they run short)."""
+        results = self._search(self.selected, embedding, k)
+        rest = [shard for shard in self.stores if shard not in self.selected]
+        if len(results) < k and rest:
+            results = merge_top_k([results, self._search(rest, embedding, k)], k)
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list[tuple]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k=k)
+
+    def get(self, include: Optional[list[str]] = None, **kwargs) -> dict:
+        """Ids (and requested fields) from every shard, concatenated."""
+        merged: dict = {"ids": []}
+        for store in self.stores.values():
+            data = store.get(include=include if include is not None else [], **kwargs)
+            merged["ids"].extend(data["ids"])
+            for field in include or []:
+                # Chroma returns embeddings as a numpy array, which has no truth value
+                value = data.get(field)
+                merged.setdefault(field, []).extend([] if value is None else list(value))
+        return merged
+
+
+def open_sharded_store(embeddings, key: Optional[str] = SHARD_KEY) -> ShardedVectorStore:
+    """Open every built shard for SHARD_KEY; raises FileNotFoundError if none exist."""
+    key = check_shard_key(key)
+    shards = existing_shards(key)
+    if not shards:
+        where = f"on {server_url()}" if is_remote() else f"under '{os.path.join(SHARD_PERSIST_DIR, key)}'"
+        raise FileNotFoundError(
+            f"No '{key}' shards found {where}. "
+            "Please run 'python run_preprocessing.py' with SHARD_KEY set to build them."
+        )
+    stores = {
+        shard: open_store(embeddings, shard_dir(shard, key))
+        for shard in shards
+    }
+    spaces = {shard: index_space(store) for shard, store in stores.items()}
+    if len(set(spaces.values())) > 1:
+        raise ValueError(
+            f"Shards use different distance spaces ({', '.join(f'{s}={v}' for s, v in spaces.items())}); "
+            "rebuild them with the same INDEX_PROFILE"
+        )
+    pool = ThreadPoolExecutor(max_workers=min(SHARD_SEARCH_WORKERS, len(shards)), thread_name_prefix="shard-search")
+    return ShardedVectorStore(stores, embeddings, pool, key, next(iter(spaces.values())))
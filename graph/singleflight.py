@@ -0,0 +1,136 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When several threads ask for the same key at once, only the first (the
+leader) runs the call; the others wait on the leader's future and receive
+its result or exception. Used around whole pipeline runs and around the
+extract LLM call, query embedding and rerank LLM call.
+
+A waiter with a deadline of its own passes wait_timeout: it stops waiting
+at that point (FlightTimeout) and takes its own degraded path, instead of
+being held to a leader that may have no deadline at all.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Hashable, Optional
+
+from graph.instrumentation import REGISTRY
+
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future: Future = Future()
+        self.waiters = 0
+
+
+class FlightTimeout(TimeoutError):
+    """Raised to a waiter whose wait_timeout ran out before the leader finished."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one upstream call."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.leader_calls = 0
+        self.saved_calls = 0
+
+    def do(
+        self, key: Hashable, fn: Callable, *args, wait_timeout: Optional[float] = None, **kwargs,
+    ) -> tuple[Any, bool]:
+        """
+        Run fn(*args, **kwargs) once per key among concurrent callers.
+        Waiters give up after wait_timeout seconds (None: wait for the leader).
+
+        Returns:
+            (result, shared) where shared is True for callers that reused
+            the leader's result instead of making their own call.
+
+        Raises:
+            Whatever the leader raised. If the leader is interrupted by a
+            non-Exception (e.g. KeyboardInterrupt), waiters get CancelledError.
+            FlightTimeout to a waiter whose wait_timeout ran out.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.saved_calls += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leader_calls += 1
+                leader = True
+
+        if not leader:
+            # wait() rather than result(timeout): the leader may itself raise a TimeoutError
+            if not wait([call.future], timeout=wait_timeout).done:
+                with self._lock:
+                    call.waiters -= 1
+                    self.saved_calls -= 1
+                REGISTRY.inc("singleflight_wait_timeouts_total", flight=self.name)
+                raise FlightTimeout(
+                    f"Gave up waiting for the in-flight {self.name} call after {wait_timeout:.2f}s"
+                )
+            REGISTRY.inc("singleflight_saved_total", flight=self.name)
+            return call.future.result(), True
+
+        REGISTRY.inc("singleflight_calls_total", flight=self.name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._finish(key)
+            call.future.set_exception(e)
+            raise
+        except BaseException:
+            self._finish(key)
+            call.future.cancel()
+            raise
+
+        # Remove before publishing so later arrivals start a fresh call
+        self._finish(key)
+        call.future.set_result(result)
+        return result, False
+
+    def _finish(self, key: Hashable):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def waiters(self) -> dict[Hashable, int]:
+        """Waiter count per in-flight key."""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "waiters": {str(key)[:80]: call.waiters for key, call in self._calls.items()},
+                "leader_calls": self.leader_calls,
+                "saved_calls": self.saved_calls,
+            }
+
+
+def prompt_key(prompt: str) -> str:
+    """Compact coalescing key for a long prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+# Shared flights, one per coalescing point
+REQUEST_FLIGHT = SingleFlight("request")
+EXTRACT_FLIGHT = SingleFlight("extract_llm")
+EMBED_FLIGHT = SingleFlight("query_embedding")
+RERANK_FLIGHT = SingleFlight("rerank_llm")
+
+FLIGHTS = (REQUEST_FLIGHT, EXTRACT_FLIGHT, EMBED_FLIGHT, RERANK_FLIGHT)
+
+
+def coalescing_stats() -> dict:
+    """Per-flight in-flight keys, waiter counts and upstream calls saved."""
+    return {flight.name: flight.stats() for flight in FLIGHTS}
@@ -20,12 +20,11 @@ class ExtractedInfoModel(BaseModel):
     optimized_query: str = Field(description="Keyword-rich query for semantic search")
 
 
-class RankedVendorModel(BaseModel):
-    """Pydantic model for a single ranked vendor."""
+class RankingModel(BaseModel):
+    """Pydantic model for a single ranked vendor without reasoning (two-phase rerank)."""
     rank: int = Field(description="Ranking position")
     candidate_id: str = Field(description="Stable ID from retrieval")
     relevance_score: float = Field(description="Score from 0.0 to 1.0")
-    reasoning: str = Field(description="Step-by-step reasoning for this ranking")
 
     @field_validator('candidate_id', mode='before')
     @classmethod
@@ -33,6 +32,11 @@ class RankedVendorModel(BaseModel):
         return str(v)
 
 
+class RankedVendorModel(RankingModel):
+    """Pydantic model for a single ranked vendor."""
+    reasoning: str = Field(description="Step-by-step reasoning for this ranking")
+
+
 class RerankOutputModel(BaseModel):
     """Pydantic model for reranking output parsing."""
     user_need_analysis: str = Field(description="Brief description of user's actual need")
@@ -40,6 +44,27 @@ class RerankOutputModel(BaseModel):
     rankings: list[RankedVendorModel] = Field(description="Ranked list of vendors")
 
 
+class RankingOutputModel(BaseModel):
+    """Pydantic model for ranking-only output parsing (two-phase rerank)."""
+    rankings: list[RankingModel] = Field(description="Ranked list of vendors")
+
+
+class ExplanationModel(BaseModel):
+    """Pydantic model for the reasoning of one ranked vendor."""
+    candidate_id: str = Field(description="Stable ID from retrieval")
+    reasoning: str = Field(description="Step-by-step reasoning for this vendor")
+
+    @field_validator('candidate_id', mode='before')
+    @classmethod
+    def coerce_to_string(cls, v):
+        return str(v)
+
+
+class ExplanationOutputModel(BaseModel):
+    """Pydantic model for explanation output parsing."""
+    explanations: list[ExplanationModel] = Field(description="Reasoning per vendor")
+
+
 # =============================================================================
 # TypedDict State Definitions
 # =============================================================================
@@ -54,9 +79,8 @@ class ExtractedInfo(TypedDict):
     optimized_query: str
 
 
-class VendorCandidate(TypedDict):
-    """A vendor candidate from retrieval."""
-    candidate_id: str  # Stable ID for lookup
+class VendorDetails(TypedDict):
+    """Display fields for a vendor, held in the vendor catalog (graph/catalog.py)."""
     company_name: str
     trading_name: Optional[str]
     services: Optional[str]
@@ -70,28 +94,25 @@ class VendorCandidate(TypedDict):
     website: Optional[str]
     employees: Optional[str]  # Stored as string to accommodate numeric inputs
     certifications: Optional[str]
+    summary: Optional[str]  # Precomputed ranking summary (preprocessing/summaries.py)
+
+
+class VendorCandidate(TypedDict):
+    """A vendor candidate from retrieval (details are looked up by ID)."""
+    candidate_id: str  # Stable ID for catalog lookup
     similarity_score: float  # Higher = better (converted from distance)
 
 
 class RankedVendor(TypedDict):
-    """A vendor after reranking with reasoning."""
+    """A vendor after reranking with reasoning (details are looked up by ID)."""
     rank: int
     candidate_id: str
-    company_name: str
-    trading_name: Optional[str]
-    services: Optional[str]
-    products: Optional[str]
-    industry: Optional[str]
-    about: Optional[str]
-    city: Optional[str]
-    address: Optional[str]
-    phone: Optional[str]
-    email: Optional[str]
-    website: Optional[str]
-    employees: Optional[str]
-    certifications: Optional[str]
     relevance_score: float
-    reasoning: str
+    reasoning: Optional[str]  # None until written (two-phase rerank, graph/explanations.py)
+
+
+class RecommendedVendor(RankedVendor, VendorDetails):
+    """A ranked vendor with its details, as returned to callers."""
 
 
 class GraphState(TypedDict):
@@ -101,12 +122,18 @@ class GraphState(TypedDict):
     Attributes:
         original_query: The user's original natural language query
         extracted_info: Structured extraction from the query
-        candidates: Raw candidates from vector retrieval
-        ranked_vendors: Final ranked list with reasoning
+        candidates: Candidate IDs and similarity scores from vector retrieval
+        ranked_vendors: Final ranked list with reasoning (IDs inside the graph;
+            expanded to RecommendedVendor when results are returned)
         error: Any error message if processing fails
+        deadline: time.monotonic() by which the request should finish (None = no deadline)
+        degradations: Cheap paths taken to meet the deadline (graph/deadline.py),
+            e.g. "extract:raw_query", "retrieve:k=10", "rerank:similarity"
     """
     original_query: str
     extracted_info: Optional[ExtractedInfo]
     candidates: Optional[list[VendorCandidate]]
     ranked_vendors: Optional[list[RankedVendor]]
     error: Optional[str]
+    deadline: Optional[float]
+    degradations: Optional[list[str]]
@@ -2,15 +2,27 @@
 LangGraph workflow definition for vendor recommendation.
 """
 
-from langgraph.graph import StateGraph, END
+import logging
+import time
+from functools import lru_cache
+from typing import Iterator, Optional
 
 from graph.state import GraphState
 from graph.nodes.extract import extract_node
 from graph.nodes.retrieve import retrieve_node
 from graph.nodes.rerank import rerank_node
+from graph.catalog import materialize_state
+from graph.instrumentation import instrument_node, request_context
+from graph.query_log import log_request, suppressed
+from graph.deadline import stage_estimate
+from graph.singleflight import REQUEST_FLIGHT, FlightTimeout
+import config
+from config import REQUEST_COALESCING, REQUEST_DEADLINE_S, RESULT_CACHE, SEMANTIC_CACHE
 
+logger = logging.getLogger(__name__)
 
-def create_graph() -> StateGraph:
+
+def create_graph():
     """
     Create the vendor recommendation graph.
 
@@ -42,13 +54,16 @@ def create_graph() -> StateGraph:
         |    END      |  Return ranked vendors with reasoning
         +-------------+
     """
+    # LangGraph is imported here so CLI startup and cached paths don't pay for it
+    from langgraph.graph import StateGraph, END
+
     # Create graph with state schema
     workflow = StateGraph(GraphState)
 
-    # Add nodes
-    workflow.add_node("extract", extract_node)
-    workflow.add_node("retrieve", retrieve_node)
-    workflow.add_node("rerank", rerank_node)
+    # Add nodes (instrumented for latency, token and fallback metrics)
+    workflow.add_node("extract", instrument_node("extract", extract_node))
+    workflow.add_node("retrieve", instrument_node("retrieve", retrieve_node))
+    workflow.add_node("rerank", instrument_node("rerank", rerank_node))
 
     # Define edges (linear flow)
     workflow.set_entry_point("extract")
@@ -62,31 +77,225 @@ def create_graph() -> StateGraph:
     return graph
 
 
-def run_recommendation(query: str) -> dict:
+@lru_cache(maxsize=1)
+def get_graph():
+    """Compiled graph, built once per process and shared by all requests."""
+    return create_graph()
+
+
+def request_deadline(deadline: Optional[float] = None) -> Optional[float]:
+    """deadline, or one REQUEST_DEADLINE_S from now (time.monotonic(); None = no deadline)."""
+    if deadline is None and REQUEST_DEADLINE_S:
+        deadline = time.monotonic() + REQUEST_DEADLINE_S
+    return deadline
+
+
+def build_initial_state(query: str, deadline: Optional[float] = None) -> GraphState:
+    """Initial graph state for a user query."""
+    return {
+        "original_query": query,
+        "extracted_info": None,
+        "candidates": None,
+        "ranked_vendors": None,
+        "error": None,
+        "deadline": deadline,
+        "degradations": None,
+    }
+
+
+def _materialize(state: dict) -> dict:
+    """Output state: vendor details expanded, plus any reasoning already written (two-phase rerank)."""
+    if config.RERANK_MODE == "two_phase":
+        from graph.explanations import with_explanations
+        state = with_explanations(state)
+    return materialize_state(state)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for coalescing/caching (case and whitespace)."""
+    return " ".join(query.lower().split())
+
+
+def run_recommendation(query: str, deadline: Optional[float] = None) -> dict:
     """
     Run the full recommendation pipeline.
 
+    Results of earlier runs against the same index are served from the
+    result cache (graph.result_cache) or, for near-duplicate queries, the
+    semantic cache (graph.semantic_cache); identical queries already in
+    flight share the leader's run.
+
     Args:
         query: User's natural language job request
+        deadline: time.monotonic() by which to answer; nodes take cheaper
+            paths when short of time (default: REQUEST_DEADLINE_S from now)
 
     Returns:
         Final state with ranked_vendors and reasoning
+        (plus "result_cache": "memory" | "disk" | "semantic" when served from a cache,
+        and "degradations" listing the cheap paths taken for the deadline)
     """
-    graph = create_graph()
+    deadline = request_deadline(deadline)
+    normalized = normalize_query(query)
+    cache_entry = probe = None
+    if RESULT_CACHE or SEMANTIC_CACHE:
+        from preprocessing.index_generation import current_generation
+
+        # Read before the run, so a reindex during it makes the result uncacheable
+        generation = current_generation()
+    if RESULT_CACHE:
+        from graph.result_cache import cache_key
+
+        cache_entry = (cache_key(normalized, generation), generation)
+        cached = _cached_result(query, *cache_entry)
+        if cached is not None:
+            return cached
+    if SEMANTIC_CACHE:
+        probe = _semantic_probe(query, generation)
+        if probe is not None and probe.value is not None:
+            return _semantic_result(query, probe)
+
+    if not REQUEST_COALESCING:
+        return _run_pipeline(query, cache_entry, probe, deadline)
+
+    state, shared = _coalesced_run(query, normalized, cache_entry, probe, deadline)
+    if shared and state.get("degradations") and _later(deadline, state.get("deadline")):
+        # The leader degraded for its own, earlier deadline; this request has time for a full run
+        state, shared = _coalesced_run(query, normalized, cache_entry, probe, deadline)
+    # Followers get their own top-level dict so callers can't mutate each other's state
+    return {**state, "original_query": query} if shared else state
+
+
+def _coalesced_run(query: str, normalized: str, cache_entry, probe, deadline: Optional[float]) -> tuple[dict, bool]:
+    """_run_pipeline shared with identical in-flight requests; (state, shared) as SingleFlight.do."""
+    try:
+        return REQUEST_FLIGHT.do(
+            normalized, _run_pipeline, query, cache_entry, probe, deadline, wait_timeout=_wait_budget(deadline),
+        )
+    except FlightTimeout:
+        # The leader outlasts this request's deadline: answer on the degraded path
+        return _run_pipeline(query, cache_entry, probe, deadline), False
+
+
+def _wait_budget(deadline: Optional[float]) -> Optional[float]:
+    """
+    How long a request may wait on an identical in-flight run: until its own
+    deadline, less the time its degraded path (about one retrieval) needs.
+    """
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic() - (stage_estimate("retrieve") or 0.0))
+
+
+def _later(deadline: Optional[float], other: Optional[float]) -> bool:
+    """Whether deadline leaves more time than other (None: no deadline)."""
+    return other is not None and (deadline is None or deadline > other)
+
+
+def _cached_result(query: str, key: str, generation: str) -> Optional[dict]:
+    """Final state from the result cache, or None on a miss."""
+    from graph.result_cache import get_result_cache
+
+    value, tier = get_result_cache().get(key, generation)
+    if value is None:
+        return None
+    with request_context(query) as request:
+        request["result_cache"] = tier
+        state = _materialize({"original_query": query, **value, "error": None, "result_cache": tier})
+    log_request(query, state, request)
+    return state
+
+
+def _semantic_probe(query: str, generation: str):
+    """Semantic cache lookup; None if the query could not be embedded."""
+    from graph.semantic_cache import get_semantic_cache
+
+    try:
+        return get_semantic_cache().lookup(query, generation)
+    except Exception as e:
+        # The cache is an optimisation; the pipeline can still answer
+        logger.warning("[Semantic cache] lookup failed: %s", e)
+        return None
+
+
+def _semantic_result(query: str, probe) -> dict:
+    """Final state for query from a near-duplicate's cached result."""
+    from graph.semantic_cache import get_semantic_cache
+
+    if config.RERANK_MODE == "two_phase" and config.EXPLAIN_MODE == "background":
+        from graph.explanations import get_explanations
+
+        # The ranking, and so its reasoning, belongs to the matched query; written ones are cache hits
+        ranked = probe.value.get("ranked_vendors") or []
+        get_explanations().schedule(probe.matched_query, [v["candidate_id"] for v in ranked])
+
+    with request_context(query) as request:
+        request["result_cache"] = "semantic"
+        state = _materialize({
+            "original_query": query,
+            **probe.value,
+            "error": None,
+            "result_cache": "semantic",
+            "semantic_match": {"query": probe.matched_query, "similarity": probe.similarity},
+        })
+    log_request(query, state, request)
+    get_semantic_cache().maybe_audit(probe, probe.value, _audit_run)
+    return state
+
+
+def _audit_run(query: str) -> dict:
+    """Full pipeline run for a semantic cache audit (not logged as traffic)."""
+    with suppressed():
+        return _run_pipeline(query)
+
+
+def _run_pipeline(
+    query: str,
+    cache_entry: Optional[tuple[str, str]] = None,
+    probe=None,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    Run the graph once for a query. cache_entry is the result cache's
+    (key, generation) and probe the semantic cache lookup to store the result under.
+    """
+    graph = get_graph()
 
     # Initialize state
-    initial_state: GraphState = {
-        "original_query": query,
-        "extracted_info": None,
-        "candidates": None,
-        "ranked_vendors": None,
-        "error": None,
-    }
+    initial_state = build_initial_state(query, deadline)
+
+    # Run graph (per-node metrics are collected into one request record)
+    with request_context(query) as request:
+        final_state = graph.invoke(initial_state)
+        request["error"] = final_state.get("error")
+    log_request(query, final_state, request)
+
+    # Failed or degraded results are not reused for later requests
+    complete = not final_state.get("error") and not final_state.get("degradations")
+    if cache_entry is not None and complete:
+        from graph.result_cache import cacheable, get_result_cache
+        get_result_cache().put(*cache_entry, cacheable(final_state))
+    if probe is not None and complete:
+        from graph.semantic_cache import get_semantic_cache
+        get_semantic_cache().add(probe, final_state)
 
-    # Run graph
-    final_state = graph.invoke(initial_state)
+    # Vendor details are only expanded once, for the returned results
+    return _materialize(final_state)
 
-    return final_state
+
+def stream_recommendation(query: str, deadline: Optional[float] = None) -> Iterator[tuple[str, dict]]:
+    """
+    Run the pipeline, yielding (node_name, state_update) as each node finishes.
+    """
+    state = build_initial_state(query, request_deadline(deadline))
+    with request_context(query) as request:
+        for chunk in get_graph().stream(state, stream_mode="updates"):
+            for node, update in chunk.items():
+                state = {**state, **update}
+                if update.get("error"):
+                    request["error"] = update["error"]
+                yield node, _materialize(update)
+    log_request(query, state, request)
 
 
 def print_results(state: dict):
@@ -135,5 +344,7 @@ def print_results(state: dict):
         if v.get("certifications"):
             print(f"   Certifications: {v['certifications']}")
 
-        print(f"\n   Reasoning: {v['reasoning']}")
+        # Two-phase rerank leaves reasoning to POST /recommend/explain
+        if v.get("reasoning") is not None:
+            print(f"\n   Reasoning: {v['reasoning']}")
         print("-" * 70)
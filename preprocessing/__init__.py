@@ -4,7 +4,6 @@ Handles data preparation and vector indexing.
 """
 
 from preprocessing.preprocess import preprocess_vendors, save_processed, load_vendors
-from preprocessing.embeddings import index_vendors, get_embeddings, load_vector_store
 
 __all__ = [
     "preprocess_vendors",
@@ -14,3 +13,12 @@ __all__ = [
     "get_embeddings",
     "load_vector_store",
 ]
+
+
+def __getattr__(name):
+    # Indexing helpers are resolved lazily; preprocessing.embeddings needs the
+    # vector store libraries, which are slow to import.
+    if name in ("index_vendors", "get_embeddings", "load_vector_store"):
+        from preprocessing import embeddings
+        return getattr(embeddings, name)
+    raise AttributeError(f"module 'preprocessing' has no attribute {name!r}")
@@ -0,0 +1,219 @@
+"""
+Chroma stores, embedded or on a remote Chroma server.
+
+With CHROMA_MODE="embedded" each store is a PersistentClient on its
+directory, so every node that searches needs its own copy of the index.
+With CHROMA_MODE="http" the indexer and every app node use one Chroma
+server. The process keeps a single HttpClient: its connection pool
+(CHROMA_POOL_SIZE keep-alive connections) is shared by every thread and
+store. A request that fails with a connection error or a 429 / 502 / 503 /
+504 is retried with exponential backoff. Chroma writes are upserts keyed by
+id, so retrying them is safe.
+
+Directories name collections on the server: CHROMA_PERSIST_DIR is
+COLLECTION_NAME, a shard directory such as chroma_shards/region/london is
+"vendors__region__london".
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+from config import (
+    CHROMA_AUTH_TOKEN,
+    CHROMA_HEALTH_INTERVAL_S,
+    CHROMA_HOST,
+    CHROMA_MODE,
+    CHROMA_PERSIST_DIR,
+    CHROMA_POOL_SIZE,
+    CHROMA_PORT,
+    CHROMA_RETRIES,
+    CHROMA_RETRY_BACKOFF_S,
+    CHROMA_SSL,
+    CHROMA_TIMEOUT_S,
+    COLLECTION_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+def is_remote() -> bool:
+    """Whether stores live on a Chroma server (CHROMA_MODE="http")."""
+    if CHROMA_MODE not in ("embedded", "http"):
+        raise ValueError(f"Unknown CHROMA_MODE {CHROMA_MODE!r}; expected 'embedded' or 'http'")
+    return CHROMA_MODE == "http"
+
+
+def server_url() -> str:
+    return f"{'https' if CHROMA_SSL else 'http'}://{CHROMA_HOST}:{CHROMA_PORT}"
+
+
+def collection_name_for(persist_directory: str) -> str:
+    """Server-side collection standing in for a persist directory."""
+    if os.path.normpath(persist_directory) == os.path.normpath(CHROMA_PERSIST_DIR):
+        return COLLECTION_NAME
+    parts = [re.sub(r"[^A-Za-z0-9_-]+", "-", p) for p in os.path.normpath(persist_directory).split(os.sep) if p]
+    # Collection names: 3-512 characters, starting and ending alphanumeric
+    return "__".join([COLLECTION_NAME, *parts[-2:]]).strip("-_")
+
+
+class _RetryingTransport:
+    """httpx transport that retries transient failures (connection errors, RETRY_STATUS)."""
+
+    def __init__(self, transport, retries: int, backoff_s: float):
+        self.transport = transport
+        self.retries = retries
+        self.backoff_s = backoff_s
+
+    def handle_request(self, request):
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                if last:
+                    raise
+                logger.warning("[Chroma] %s %s failed (%s); retrying", request.method, request.url.path, e)
+            else:
+                if response.status_code not in RETRY_STATUS or last:
+                    return response
+                response.close()
+                logger.warning("[Chroma] %s %s returned %d; retrying",
+                               request.method, request.url.path, response.status_code)
+            time.sleep(self.backoff_s * 2 ** attempt)
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@lru_cache(maxsize=1)
+def get_http_client():
+    """
+    The process-wide Chroma HttpClient (pooled connections, retries,
+    CHROMA_TIMEOUT_S per request). Raises ConnectionError if the server
+    does not answer a heartbeat.
+    """
+    import chromadb
+    import httpx
+    from chromadb.config import Settings
+
+    settings = Settings(
+        anonymized_telemetry=False,
+        chroma_http_max_connections=CHROMA_POOL_SIZE,
+        chroma_http_max_keepalive_connections=CHROMA_POOL_SIZE,
+    )
+    headers = {"Authorization": f"Bearer {CHROMA_AUTH_TOKEN}"} if CHROMA_AUTH_TOKEN else None
+    try:
+        client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, ssl=CHROMA_SSL, headers=headers, settings=settings)
+    except Exception as e:
+        # The client checks the server version on creation
+        raise ConnectionError(f"Chroma server at {server_url()} is not reachable: {e}") from e
+
+    # chromadb opens its httpx session without a timeout or retries: swap in
+    # one with both, keeping its headers and pool limits
+    server = client._server
+    old = server._session
+    server._session = httpx.Client(
+        headers=old.headers,
+        timeout=CHROMA_TIMEOUT_S,
+        transport=_RetryingTransport(httpx.HTTPTransport(limits=server.http_limits), CHROMA_RETRIES, CHROMA_RETRY_BACKOFF_S),
+    )
+    old.close()
+
+    try:
+        client.heartbeat()
+    except Exception as e:
+        raise ConnectionError(f"Chroma server at {server_url()} is not reachable: {e}") from e
+    logger.info("[Chroma] Connected to %s (pool of %d connections)", server_url(), CHROMA_POOL_SIZE)
+    return client
+
+
+def open_store(embeddings, persist_directory: str = CHROMA_PERSIST_DIR, **options):
+    """LangChain Chroma store for a persist directory (its server collection in http mode)."""
+    from langchain_chroma import Chroma
+
+    if is_remote():
+        return Chroma(
+            client=get_http_client(),
+            collection_name=collection_name_for(persist_directory),
+            embedding_function=embeddings,
+            **options,
+        )
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        **options,
+    )
+
+
+def store_exists(persist_directory: str = CHROMA_PERSIST_DIR) -> bool:
+    """Whether the store was built (directory on disk, or collection on the server)."""
+    if not is_remote():
+        return os.path.isdir(persist_directory)
+    from chromadb.errors import NotFoundError
+
+    try:
+        get_http_client().get_collection(collection_name_for(persist_directory))
+    except (NotFoundError, ValueError):
+        return False
+    return True
+
+
+def delete_store(persist_directory: str) -> bool:
+    """Delete a store (directory, or server collection). Returns whether one existed."""
+    if not is_remote():
+        if not os.path.isdir(persist_directory):
+            return False
+        import shutil
+
+        shutil.rmtree(persist_directory, ignore_errors=True)
+        return True
+    if not store_exists(persist_directory):
+        return False
+    get_http_client().delete_collection(collection_name_for(persist_directory))
+    return True
+
+
+def describe_store(persist_directory: str = CHROMA_PERSIST_DIR) -> str:
+    """Where a store lives, for messages."""
+    if is_remote():
+        return f"collection '{collection_name_for(persist_directory)}' on {server_url()}"
+    return f"'{persist_directory}'"
+
+
+_health_lock = threading.Lock()
+_health: dict = {"checked_at": None, "result": None}
+
+
+def chroma_health(max_age_s: float = CHROMA_HEALTH_INTERVAL_S) -> dict:
+    """
+    Vector store status for /health. In http mode, a heartbeat round trip;
+    the result is reused for max_age_s so health probes don't load the server.
+    """
+    if not is_remote():
+        return {"mode": "embedded", "path": CHROMA_PERSIST_DIR}
+    with _health_lock:
+        if _health["checked_at"] is not None and time.monotonic() - _health["checked_at"] < max_age_s:
+            return _health["result"]
+        start = time.perf_counter()
+        try:
+            get_http_client().heartbeat()
+            result = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        _health.update(checked_at=time.monotonic(), result={"mode": "http", "url": server_url(), **result})
+        return _health["result"]
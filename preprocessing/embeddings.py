@@ -2,50 +2,59 @@
 Embedding and vector store setup using Google Gemini embeddings and ChromaDB.
 """
 
+from __future__ import annotations
+
 import json
-import shutil
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import providers
 from config import (
-    GOOGLE_API_KEY,
-    EMBEDDING_MODEL,
     CHROMA_PERSIST_DIR,
     COLLECTION_NAME,
+    INDEX_BATCH_SIZE,
+    INDEX_MANIFEST_PATH,
 )
+from preprocessing.chroma_client import delete_store, describe_store, open_store
+from preprocessing.jsonstream import is_jsonl, iter_jsonl, iter_records
+from preprocessing.index_generation import ChangeTracker, bump_generation
+from preprocessing.index_profiles import check_profile, collection_configuration, collection_metadata, get_profile
+from preprocessing.manifest import IndexManifest, batch_digest
+from preprocessing.summaries import refresh_index_summaries
+
+# Vector store libraries are imported inside the functions that use them
+if TYPE_CHECKING:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
 
 
 def get_embeddings() -> GoogleGenerativeAIEmbeddings:
     """Initialize Gemini embeddings for documents."""
-    return GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=GOOGLE_API_KEY,
-        task_type="RETRIEVAL_DOCUMENT"
-    )
+    return providers.get_embeddings(task_type="RETRIEVAL_DOCUMENT")
 
 
 def get_query_embeddings() -> GoogleGenerativeAIEmbeddings:
     """Initialize Gemini embeddings for queries."""
-    return GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=GOOGLE_API_KEY,
-        task_type="RETRIEVAL_QUERY"
-    )
+    return providers.get_embeddings(task_type="RETRIEVAL_QUERY")
 
 
 def load_processed_vendors(path: str) -> list[dict]:
-    """Load preprocessed vendor data."""
+    """Load preprocessed vendor data (JSON array or JSON Lines)."""
+    if is_jsonl(path):
+        return list(iter_jsonl(path))
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def create_documents(vendors: list[dict]) -> tuple[list[Document], list[str]]:
     """Convert processed vendors to LangChain Documents along with their ids."""
+    from langchain_core.documents import Document
+
     documents: list[Document] = []
     ids: list[str] = []
     for vendor in vendors:
@@ -63,24 +72,32 @@ def create_vector_store(documents: list[Document], embeddings: GoogleGenerativeA
     """Create and persist ChromaDB vector store."""
     print(f"Creating vector store with {len(documents)} documents...")
 
-    vector_store = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        collection_name=COLLECTION_NAME,
-        persist_directory=CHROMA_PERSIST_DIR
-    )
+    vector_store = open_store(embeddings)
+    vector_store.add_documents(documents)
 
-    print(f"Vector store created and persisted to {CHROMA_PERSIST_DIR}")
+    print(f"Vector store created and persisted to {describe_store()}")
     return vector_store
 
 
-def load_vector_store(embeddings: GoogleGenerativeAIEmbeddings) -> Chroma:
-    """Load existing ChromaDB vector store."""
-    return Chroma(
-        collection_name=COLLECTION_NAME,
-        persist_directory=CHROMA_PERSIST_DIR,
-        embedding_function=embeddings
-    )
+def load_vector_store(
+    embeddings: GoogleGenerativeAIEmbeddings,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    profile: Optional[dict] = None,
+) -> Chroma:
+    """
+    Load existing ChromaDB vector store (one shard's store when given its directory).
+    With CHROMA_MODE="http", the directory's collection on the Chroma server
+    (see preprocessing.chroma_client).
+    If the collection has to be created, it is created with the given index
+    profile (see preprocessing.index_profiles); an existing one keeps its own.
+    """
+    options = {}
+    if profile is not None:
+        options = {
+            "collection_configuration": collection_configuration(profile),
+            "collection_metadata": collection_metadata(profile),
+        }
+    return open_store(embeddings, persist_directory, **options)
 
 
 def index_vendors(processed_path: str):
@@ -88,65 +105,157 @@ def index_vendors(processed_path: str):
     return index_vendors_with_dedup(processed_path, dedup=True, reset=False)
 
 
-def index_vendors_with_dedup(processed_path: str, dedup: bool = True, reset: bool = False):
+def index_vendors_with_dedup(
+    processed_path: str,
+    dedup: bool = True,
+    reset: bool = False,
+    resume: bool = False,
+    profile: Optional[str] = None,
+):
     """
     Index vendors into ChromaDB with optional deduplication and reset.
 
     Args:
-        processed_path: Path to preprocessed vendors JSON.
+        processed_path: Path to preprocessed vendors (JSON array or JSON Lines).
         dedup: If True, skip documents whose ids already exist in the store.
         reset: If True, delete the existing persisted store before indexing.
+        resume: If True, skip batches the checkpoint manifest records as committed.
+        profile: Index profile name for a new index (default: INDEX_PROFILE).
     """
-    # Load processed data
-    vendors = load_processed_vendors(processed_path)
-    print(f"Loaded {len(vendors)} processed vendors")
+    if reset and resume:
+        raise ValueError("reset and resume cannot be combined")
 
-    if not vendors:
-        print("No vendors to index; exiting.")
-        return None
+    if reset and delete_store(CHROMA_PERSIST_DIR):
+        print(f"Reset requested: removed existing index at {describe_store()}")
+        bump_generation(f"reset {CHROMA_PERSIST_DIR}")
 
-    # Create documents
-    documents, ids = create_documents(vendors)
+    print(f"Indexing processed vendors from {processed_path}")
+    return index_vendor_stream(iter_records(processed_path), dedup=dedup, resume=resume, profile=profile)
 
-    # Initialize embeddings
-    embeddings = get_embeddings()
 
-    persist_path = Path(CHROMA_PERSIST_DIR)
-    if reset and persist_path.exists():
-        print(f"Reset requested: removing existing index at {persist_path}")
-        shutil.rmtree(persist_path, ignore_errors=True)
+def iter_batches(records: Iterable[dict], batch_size: int) -> Iterator[list[dict]]:
+    """Group a stream of records into lists of at most batch_size."""
+    iterator = iter(records)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
 
-    # If no existing store, build fresh
-    if not persist_path.exists():
-        return create_vector_store(documents, embeddings)
 
-    # Otherwise load existing and optionally deduplicate
-    vector_store = load_vector_store(embeddings)
+def iter_pending_batches(
+    records: Iterable[dict],
+    manifest: IndexManifest,
+    stats: dict,
+) -> Iterator[tuple[tuple[int, int, str], list[dict]]]:
+    """
+    Batches not yet committed according to the manifest, each with its
+    (start, end, digest) checkpoint. Committed batches are counted in
+    stats["resumed"] and never reach the embedding model.
+    """
+    stats.setdefault("resumed", 0)
+    start = 0
+    for batch in iter_batches(records, manifest.batch_size):
+        end = start + len(batch)
+        digest = batch_digest(batch)
+        if manifest.is_committed(start, end, digest):
+            stats["resumed"] += len(batch)
+        else:
+            yield (start, end, digest), batch
+        start = end
+
+
+def index_vendor_stream(
+    records: Iterable[dict],
+    dedup: bool = True,
+    reset: bool = False,
+    batch_size: int = INDEX_BATCH_SIZE,
+    resume: bool = False,
+    manifest_path: str = INDEX_MANIFEST_PATH,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    profile: Optional[str] = None,
+):
+    """
+    Index a stream of processed vendors batch by batch.
 
-    existing_ids: set[str] = set()
-    try:
-        existing = vector_store.get(include=[])
-        existing_ids.update(existing.get("ids", []))
-    except Exception as exc:  # pragma: no cover - defensive
-        print(f"Warning: could not read existing ids ({exc}); proceeding without dedup")
-        dedup = False
+    Only one batch of documents is held at a time, so memory does not grow
+    with the number of vendors. Deduplication checks each batch's ids
+    against the store instead of loading every existing id.
 
-    docs_to_add = []
-    ids_to_add = []
-    skipped = 0
+    Records skipped as duplicates still get a new or changed summary
+    written into their index metadata (without re-embedding).
+
+    Any change to the store bumps the index generation
+    (preprocessing.index_generation), which invalidates cached results.
 
-    for doc, doc_id in zip(documents, ids):
-        if dedup and doc_id in existing_ids:
-            skipped += 1
-            continue
-        docs_to_add.append(doc)
-        ids_to_add.append(doc_id)
+    Each written batch is checkpointed in the manifest at manifest_path, so
+    an interrupted run can continue with resume=True without re-embedding
+    what was already committed. Resuming reuses the manifest's batch size.
 
-    if not docs_to_add:
-        print(f"No new documents to add (skipped {skipped} duplicates).")
-        return vector_store
+    Args:
+        records: Processed vendor dicts (e.g. from preprocessing.preprocess.iter_processed).
+        dedup: If True, skip documents whose ids already exist in the store.
+        reset: If True, delete the existing persisted store before indexing.
+        batch_size: Documents embedded and written per call.
+        resume: If True, skip batches the manifest records as committed.
+        manifest_path: Checkpoint manifest location.
+        persist_directory: Chroma directory to index into (a shard's directory when sharded).
+        profile: Index profile name for a new or reset collection (default: INDEX_PROFILE).
+    """
+    if reset and resume:
+        raise ValueError("reset and resume cannot be combined")
 
-    print(f"Adding {len(docs_to_add)} new documents to existing store (skipped {skipped} duplicates).")
-    vector_store.add_documents(documents=docs_to_add, ids=ids_to_add)
-    print(f"Vector store updated and persisted to {CHROMA_PERSIST_DIR}")
+    embeddings = get_embeddings()
+    index_profile = get_profile(profile)
+
+    # Opens the collection, creating it with the index profile if needed
+    vector_store = load_vector_store(embeddings, persist_directory, index_profile)
+    tracker = ChangeTracker(f"index {persist_directory}")
+    if reset:
+        # Recreate through the client rather than deleting files under an open store
+        print(f"Reset requested: clearing collection '{COLLECTION_NAME}' (profile {index_profile['name']!r})")
+        tracker.mark()
+        vector_store.reset_collection()
+    else:
+        check_profile(vector_store, index_profile)
+
+    manifest = IndexManifest.open(manifest_path, batch_size, resume)
+    stats: dict = {"resumed": 0}
+    added = 0
+    skipped = 0
+    summaries_updated = 0
+    next_report = manifest.batch_size * 20
+
+    for checkpoint, batch in iter_pending_batches(records, manifest, stats):
+        documents, ids = create_documents(batch)
+
+        if dedup:
+            existing = set(vector_store.get(ids=ids, include=[]).get("ids", []))
+            seen: set[str] = set()
+            keep = []
+            for doc, doc_id in zip(documents, ids):
+                if doc_id in existing or doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                keep.append((doc, doc_id))
+            skipped += len(ids) - len(keep)
+            if existing:
+                summaries_updated += refresh_index_summaries(
+                    vector_store._collection, [r for r in batch if str(r["id"]) in existing], tracker.mark,
+                )
+            documents = [doc for doc, _ in keep]
+            ids = [doc_id for _, doc_id in keep]
+
+        if documents:
+            tracker.mark()
+            vector_store.add_documents(documents=documents, ids=ids)
+            added += len(documents)
+        manifest.commit([checkpoint])
+
+        if added + skipped >= next_report:
+            print(f"  Indexed {added} documents (skipped {skipped} duplicates)...")
+            next_report += manifest.batch_size * 20
+
+    manifest.finish()
+    tracker.finish()
+    resumed = f", {stats['resumed']} already committed" if stats["resumed"] else ""
+    updated = f", updated {summaries_updated} summaries" if summaries_updated else ""
+    print(f"Indexed {added} documents (skipped {skipped} duplicates{resumed}{updated}) into {describe_store(persist_directory)}")
     return vector_store
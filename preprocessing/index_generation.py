@@ -0,0 +1,145 @@
+"""
+Index generation counter.
+
+Every change to the vector store (documents added, summaries updated, a
+collection reset) bumps a counter persisted in INDEX_GENERATION_PATH.
+Anything derived from search results, such as the pipeline result cache,
+keys its entries by the current generation, so nothing computed against an
+older index is served after a reindex.
+
+The file lives outside the Chroma directories, so --reset-index (which
+deletes them) does not reset it. It also carries a random epoch, so a
+deleted and recreated file never repeats an earlier generation.
+
+With CHROMA_MODE="http" the indexer and the app nodes run on different
+hosts, so the epoch and counter live on the Chroma server instead, in the
+metadata of a "<COLLECTION_NAME>__index-generation" collection that holds
+no documents (path is then ignored). Readers reuse the value for
+INDEX_GENERATION_TTL_S, so a reindex reaches every node within that time.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from config import COLLECTION_NAME, INDEX_GENERATION_PATH, INDEX_GENERATION_TTL_S
+from preprocessing.chroma_client import get_http_client, is_remote
+
+logger = logging.getLogger(__name__)
+
+GENERATION_FIELDS = ("epoch", "counter", "reason", "updated_at")
+
+_lock = threading.Lock()
+# Parsed file, reused while the file (replaced on every bump) is unchanged
+_cached: dict = {"stamp": None, "generation": None}
+# Value read from the server, reused for INDEX_GENERATION_TTL_S
+_remote_cached: dict = {"checked_at": None, "generation": None}
+
+
+def _read(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _format(data: dict) -> str:
+    return f"{data['epoch']}-{data['counter']}" if data else "none"
+
+
+def _server_collection():
+    return get_http_client().get_or_create_collection(f"{COLLECTION_NAME}__index-generation", embedding_function=None)
+
+
+def _read_server() -> dict:
+    metadata = _server_collection().metadata or {}
+    return {field: metadata[field] for field in GENERATION_FIELDS if field in metadata}
+
+
+def _advance(data: dict, reason: str) -> dict:
+    return {
+        "epoch": data.get("epoch") or uuid.uuid4().hex[:12],
+        "counter": data.get("counter", 0) + 1,
+        "reason": reason,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def bump_generation(reason: str, path: str = INDEX_GENERATION_PATH) -> str:
+    """Advance and persist the generation (atomically); returns the new value."""
+    with _lock:
+        if is_remote():
+            data = _advance(_read_server(), reason)
+            _server_collection().modify(metadata=data)
+            _remote_cached.update(checked_at=time.monotonic(), generation=_format(data))
+            return _format(data)
+        data = _advance(_read(path), reason)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    return _format(data)
+
+
+def _server_generation() -> str:
+    with _lock:
+        checked_at = _remote_cached["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < INDEX_GENERATION_TTL_S:
+            return _remote_cached["generation"]
+        try:
+            generation = _format(_read_server())
+        except Exception as e:
+            # Server down: keep the last known value (requests needing the store fail anyway)
+            logger.warning("[Index generation] Reading the generation from the server failed: %s", e)
+            generation = _remote_cached["generation"] or "none"
+        _remote_cached.update(checked_at=time.monotonic(), generation=generation)
+        return generation
+
+
+def current_generation(path: str = INDEX_GENERATION_PATH) -> str:
+    """
+    Current generation as "epoch-counter" ("none" if the index was never
+    built through the indexers). Costs one stat call while the file is
+    unchanged; in http mode, one server round trip per INDEX_GENERATION_TTL_S.
+    """
+    if is_remote():
+        return _server_generation()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return "none"
+    stamp = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _cached["stamp"] != stamp:
+            _cached["generation"] = _format(_read(path))
+            _cached["stamp"] = stamp
+        return _cached["generation"]
+
+
+class ChangeTracker:
+    """
+    Bumps the generation before an indexing run's first write and again when
+    the run finishes, so results cached while it was writing are dropped too.
+    """
+
+    def __init__(self, label: str, path: str = INDEX_GENERATION_PATH):
+        self.label = label
+        self.path = path
+        self.changed = False
+
+    def mark(self):
+        """Call before each write; only the first call bumps."""
+        if not self.changed:
+            self.changed = True
+            bump_generation(f"{self.label}: writing", self.path)
+
+    def finish(self):
+        if self.changed:
+            bump_generation(f"{self.label}: done", self.path)
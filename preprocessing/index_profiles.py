@@ -0,0 +1,88 @@
+"""
+HNSW index profiles for the Chroma collection.
+
+A profile (config.INDEX_PROFILES) picks the distance space and HNSW
+parameters. They are written into the collection's configuration when
+the collection is created, together with the profile name in its
+metadata, so they stay with the index. Retrieval reads the space back
+from the collection rather than from config, so scores match the index
+that was actually built.
+"""
+
+from typing import Optional
+
+from config import INDEX_PROFILE, INDEX_PROFILES
+from preprocessing.index_generation import bump_generation
+
+SPACES = ("l2", "cosine", "ip")
+PROFILE_FIELDS = ("space", "M", "ef_construction", "ef_search")
+
+
+def get_profile(name: Optional[str] = None) -> dict:
+    """Validated copy of a profile from INDEX_PROFILES (default: INDEX_PROFILE)."""
+    name = name or INDEX_PROFILE
+    if name not in INDEX_PROFILES:
+        raise ValueError(f"Unknown INDEX_PROFILE {name!r}; expected one of {', '.join(INDEX_PROFILES)}")
+    profile = {"name": name, **INDEX_PROFILES[name]}
+    missing = [field for field in PROFILE_FIELDS if field not in profile]
+    if missing:
+        raise ValueError(f"Index profile {name!r} is missing {', '.join(missing)}")
+    if profile["space"] not in SPACES:
+        raise ValueError(f"Index profile {name!r}: space must be one of {', '.join(SPACES)}")
+    return profile
+
+
+def collection_configuration(profile: dict) -> dict:
+    """Chroma collection configuration for a profile."""
+    return {
+        "hnsw": {
+            "space": profile["space"],
+            "max_neighbors": profile["M"],
+            "ef_construction": profile["ef_construction"],
+            "ef_search": profile["ef_search"],
+        }
+    }
+
+
+def collection_metadata(profile: dict) -> dict:
+    return {"index_profile": profile["name"]}
+
+
+def collection_settings(collection) -> dict:
+    """Profile settings persisted with an existing Chroma collection."""
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    return {
+        "name": (collection.metadata or {}).get("index_profile"),
+        "space": hnsw.get("space", "l2"),
+        "M": hnsw.get("max_neighbors"),
+        "ef_construction": hnsw.get("ef_construction"),
+        "ef_search": hnsw.get("ef_search"),
+    }
+
+
+def index_space(vector_store) -> str:
+    """Distance space of a vector store (or of every shard of a sharded store)."""
+    space = getattr(vector_store, "space", None)
+    if isinstance(space, str):
+        return space
+    return collection_settings(vector_store._collection)["space"]
+
+
+def check_profile(vector_store, profile: dict):
+    """
+    Compare an existing collection with profile. ef_search can change in
+    place (it applies the next time the index is opened); space, M and
+    ef_construction only change with a rebuild, so differences are reported.
+    """
+    collection = vector_store._collection
+    persisted = collection_settings(collection)
+    if persisted["ef_search"] != profile["ef_search"]:
+        collection.modify(configuration={"hnsw": {"ef_search": profile["ef_search"]}})
+        bump_generation(f"ef_search {persisted['ef_search']} -> {profile['ef_search']}")
+        print(f"  Set ef_search {persisted['ef_search']} -> {profile['ef_search']} (used when the index is next opened)")
+
+    differing = [field for field in ("space", "M", "ef_construction") if persisted[field] != profile[field]]
+    if differing:
+        print(f"  Warning: index was built with profile {persisted['name'] or 'unknown'} "
+              f"({', '.join(f'{f}={persisted[f]}' for f in differing)}); "
+              f"INDEX_PROFILE {profile['name']!r} applies after --reset-index")
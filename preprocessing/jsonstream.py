@@ -0,0 +1,137 @@
+"""
+Constant-memory readers and writers for vendor record files.
+
+Reads either a top-level JSON array (all_results.json) incrementally, or
+JSON Lines, one record at a time. Memory use is bounded by the read chunk
+plus the largest single record, not by the file size.
+"""
+
+import json
+import os
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 1 << 16  # Characters read per refill
+
+_WHITESPACE = " \t\r\n"
+
+
+def is_jsonl(path: str) -> bool:
+    """True for JSON Lines files (by extension, else by the first non-space character)."""
+    if path.endswith((".jsonl", ".ndjson")):
+        return True
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(256)
+            if not chunk:
+                return False
+            stripped = chunk.lstrip()
+            if stripped:
+                return not stripped.startswith("[")
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        started = False
+        need_comma = False
+        eof = False
+
+        while True:
+            # Skip whitespace and separators between elements
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                char = buffer[pos]
+                if not started:
+                    if char != "[":
+                        raise ValueError(f"{path}: expected a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if char == ",":
+                    if not need_comma:
+                        raise ValueError(f"{path}: unexpected ',' in JSON array")
+                    need_comma = False
+                    pos += 1
+                    continue
+                if char == "]":
+                    return
+                if need_comma:
+                    raise ValueError(f"{path}: expected ',' between JSON array elements")
+
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Element continues past the buffer; read more unless at EOF
+                    if eof:
+                        raise
+                else:
+                    # A number at the buffer edge may be truncated, so read more first
+                    if end < len(buffer) or eof:
+                        yield item
+                        pos = end
+                        need_comma = True
+                        continue
+
+            if eof:
+                if not started:
+                    raise ValueError(f"{path}: expected a JSON array")
+                raise ValueError(f"{path}: unterminated JSON array")
+
+            # Drop consumed text and refill
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer += chunk
+            else:
+                eof = True
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """Yield one record per non-blank line of a JSON Lines file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: {e}") from e
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Stream records from a JSON array or JSON Lines file."""
+    return iter_jsonl(path) if is_jsonl(path) else iter_json_array(path)
+
+
+def tee_jsonl(records: Iterable[dict], path: str) -> Iterator[dict]:
+    """
+    Write each record to a JSON Lines file as it passes through.
+
+    The file is written under a temporary name and moved into place only
+    once the stream is exhausted, so an interrupted run never leaves a
+    truncated file at `path`.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            yield record
+    os.replace(tmp_path, path)
+
+
+def write_jsonl(records: Iterable[dict], path: str) -> int:
+    """Write records to a JSON Lines file; returns the number written."""
+    count = 0
+    for _ in tee_jsonl(records, path):
+        count += 1
+    return count
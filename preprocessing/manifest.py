@@ -0,0 +1,189 @@
+"""
+Checkpoint manifest for resumable indexing.
+
+After each batch is committed to the vector store, the manifest records
+the batch's input range (positions in the processed record stream) and a
+content hash of its records, as one line appended (and fsynced) to a
+journal next to the manifest, "<path>.journal". The manifest itself is a
+compact snapshot, rewritten atomically (temp file, fsync, rename) only when
+a run starts, when it finishes and when a manifest is loaded (folding the
+journal in), so each commit costs one short append however many batches
+came before. A line torn by a crash is ignored.
+
+On --resume, batches whose range and hash match a committed entry are
+skipped without being embedded again; changed or missing batches are
+indexed as usual.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+from config import COLLECTION_NAME
+
+MANIFEST_VERSION = 1
+
+
+def batch_digest(records: Iterable[dict]) -> str:
+    """Content hash of a batch of processed records (ids, text and metadata)."""
+    h = hashlib.sha256()
+    for record in records:
+        h.update(str(record["id"]).encode("utf-8"))
+        h.update(b"\0")
+        h.update(record["text"].encode("utf-8"))
+        h.update(b"\0")
+        h.update(json.dumps(record.get("metadata"), sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:32]
+
+
+class IndexManifest:
+    """Committed batches of one indexing run, persisted after every commit."""
+
+    def __init__(self, path: str, data: dict, fresh: bool = False):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.data = data
+        self._fresh = fresh  # Replaces any previous run's files on the first commit
+        self._journal = None  # Opened on the first commit
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fresh(cls, path: str, batch_size: int) -> "IndexManifest":
+        """Start a new manifest (replacing any previous one on the first commit)."""
+        return cls(path, {
+            "version": MANIFEST_VERSION,
+            "collection": COLLECTION_NAME,
+            "batch_size": batch_size,
+            "started_at": time.time(),
+            "updated_at": None,
+            "complete": False,
+            "documents": 0,
+            "batches": {},  # "start-end" -> content hash
+        }, fresh=True)
+
+    @classmethod
+    def read(cls, path: str) -> Optional["IndexManifest"]:
+        """
+        Read a manifest with its journal applied, writing nothing (safe while
+        a run is appending). None if there is none, or it is from another
+        format/collection.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get("version") != MANIFEST_VERSION or data.get("collection") != COLLECTION_NAME:
+            return None
+        manifest = cls(path, data)
+        manifest._replay()
+        return manifest
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IndexManifest"]:
+        """Read a manifest to continue its run, folding the journal into the snapshot."""
+        manifest = cls.read(path)
+        # Also when nothing was read: appending after a torn line would corrupt the next one
+        if manifest is not None and os.path.exists(manifest.journal_path):
+            manifest._save()
+            _remove(manifest.journal_path)
+        return manifest
+
+    @classmethod
+    def open(cls, path: str, batch_size: int, resume: bool) -> "IndexManifest":
+        """
+        Manifest for a run: the previous one when resuming (keeping its batch
+        size so batch boundaries line up), otherwise a fresh one.
+        """
+        if resume:
+            manifest = cls.load(path)
+            if manifest is not None:
+                committed = len(manifest.data["batches"])
+                print(f"Resuming from {path}: {committed} batches "
+                      f"({manifest.data['documents']} documents) already committed")
+                return manifest
+            print(f"No checkpoint manifest at {path}; starting from the beginning")
+        return cls.fresh(path, batch_size)
+
+    @property
+    def batch_size(self) -> int:
+        return self.data["batch_size"]
+
+    def is_committed(self, start: int, end: int, digest: str) -> bool:
+        with self._lock:
+            return self.data["batches"].get(f"{start}-{end}") == digest
+
+    def commit(self, batches: Iterable[tuple[int, int, str]]):
+        """Record (start, end, digest) batches as durably indexed (appended to the journal)."""
+        with self._lock:
+            if self._journal is None:
+                self._open_journal()
+            lines = []
+            for start, end, digest in batches:
+                self._record(start, end, digest)
+                lines.append(json.dumps([start, end, digest]) + "\n")
+            self._journal.write("".join(lines))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def finish(self):
+        """Mark the run complete (every input batch is committed) and compact the journal."""
+        with self._lock:
+            self.data["complete"] = True
+            self._save()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            _remove(self.journal_path)
+
+    def _record(self, start: int, end: int, digest: str):
+        key = f"{start}-{end}"
+        if key not in self.data["batches"]:
+            self.data["documents"] += end - start
+        self.data["batches"][key] = digest
+
+    def _replay(self):
+        """Apply the journal's batches to data."""
+        try:
+            f = open(self.journal_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    start, end, digest = json.loads(line)
+                except ValueError:
+                    # Torn last line: the append never completed, so neither did its commit
+                    break
+                self._record(start, end, digest)
+
+    def _open_journal(self):
+        if self._fresh:
+            # The previous run's journal goes first, so it is never replayed onto this run's snapshot
+            _remove(self.journal_path)
+            self._save()
+            self._fresh = False
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _save(self):
+        self.data["updated_at"] = time.time()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,121 @@
+"""
+Process-pool preprocessing for large vendor dumps.
+
+The input is cut into chunks of consecutive records. Each chunk is
+processed in a worker process with the same process_vendor logic as the
+serial path. JSON Lines input is sent to workers as raw lines, so JSON
+parsing happens in the workers too.
+
+IDs are deterministic regardless of worker count or output order: a vendor
+without an index gets its position in the input file as its id.
+"""
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Union
+
+from config import PREPROCESS_CHUNK_SIZE, PREPROCESS_WORKERS
+from preprocessing.jsonstream import is_jsonl, iter_json_array
+from preprocessing.preprocess import iter_processed
+
+RawUnit = Union[str, dict]  # A JSONL line or an already-parsed vendor
+
+
+def iter_raw_units(path: str) -> Iterator[RawUnit]:
+    """Raw lines from JSON Lines files (parsed by workers), parsed vendors from JSON arrays."""
+    if not is_jsonl(path):
+        yield from iter_json_array(path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def _process_chunk(start: int, units: list[RawUnit]) -> tuple[list[dict], dict, list]:
+    """Worker: preprocess one chunk. Returns (records, stats, skipped vendor indexes)."""
+    vendors = (json.loads(unit) if isinstance(unit, str) else unit for unit in units)
+    stats: dict = {}
+    skipped: list = []
+    records = list(iter_processed(vendors, stats, start=start, skipped=skipped))
+    return records, stats, skipped
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Worker count: None uses PREPROCESS_WORKERS, 0 means one per CPU."""
+    workers = PREPROCESS_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def iter_processed_parallel(
+    units: Iterable[RawUnit],
+    workers: Optional[int] = None,
+    chunk_size: int = PREPROCESS_CHUNK_SIZE,
+    ordered: bool = True,
+    stats: Optional[dict] = None,
+) -> Iterator[dict]:
+    """
+    Preprocess a stream of raw vendors on a process pool.
+
+    At most 2 * workers chunks are in flight, so input is read only as fast
+    as results are consumed and memory stays bounded.
+
+    Args:
+        units: Raw vendors or JSONL lines, in input order (see iter_raw_units).
+        workers: Processes to use (None: PREPROCESS_WORKERS, 0 or less: all CPUs).
+        chunk_size: Records per work unit.
+        ordered: Yield records in input order; if False, chunks are yielded as they finish.
+        stats: Optional dict updated in place with success/fallback/skipped counts.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("success", "fallback", "skipped"):
+        stats.setdefault(key, 0)
+
+    workers = resolve_workers(workers)
+    max_in_flight = workers * 2
+    iterator = iter(units)
+
+    def collect(future: Future) -> list[dict]:
+        records, chunk_stats, skipped = future.result()
+        for key, value in chunk_stats.items():
+            stats[key] += value
+        for index in skipped:
+            print(f"  Skipping vendor {index}: insufficient data")
+        return records
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: dict[Future, int] = {}  # future -> chunk number
+        finished: dict[int, Future] = {}  # completed out of order (ordered mode)
+        next_chunk = 0
+        next_to_yield = 0
+        position = 0
+        exhausted = False
+
+        while pending or finished or not exhausted:
+            # Keep the pool fed up to the in-flight limit
+            while not exhausted and len(pending) + len(finished) < max_in_flight:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending[pool.submit(_process_chunk, position, chunk)] = next_chunk
+                position += len(chunk)
+                next_chunk += 1
+
+            if ordered and next_to_yield in finished:
+                yield from collect(finished.pop(next_to_yield))
+                next_to_yield += 1
+                continue
+
+            if not pending:
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                number = pending.pop(future)
+                if ordered:
+                    finished[number] = future
+                else:
+                    yield from collect(future)
@@ -0,0 +1,313 @@
+"""
+Pipelined preprocess -> embed -> index.
+
+Three stages run concurrently, connected by bounded queues:
+
+    records ──▶ [batcher] ──queue──▶ [embed workers x N] ──queue──▶ [writer] ──▶ Chroma
+
+- batcher:  pulls preprocessed records from the input stream and groups
+            them into batches of INDEX_BATCH_SIZE (dropping ids already
+            in the store when dedup is on)
+- embed:    N threads, each calling embed_documents on one batch at a time
+- writer:   upserts precomputed vectors into the collection in batches of
+            CHROMA_WRITE_BATCH_SIZE, then checkpoints the embedding batches
+            it wrote in the index manifest (see preprocessing.manifest)
+
+A full queue blocks the stage feeding it (backpressure), so memory is
+bounded by the queue sizes and wall time approaches the slowest stage
+rather than the sum of the stages.
+"""
+
+import queue
+import threading
+import time
+from typing import Iterable, Optional
+
+from config import (
+    CHROMA_PERSIST_DIR,
+    CHROMA_WRITE_BATCH_SIZE,
+    COLLECTION_NAME,
+    INDEX_BATCH_SIZE,
+    INDEX_MANIFEST_PATH,
+    PIPELINE_EMBED_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+)
+from preprocessing.embeddings import get_embeddings, iter_pending_batches, load_vector_store
+from preprocessing.index_generation import ChangeTracker
+from preprocessing.index_profiles import check_profile, get_profile
+from preprocessing.manifest import IndexManifest
+from preprocessing.summaries import refresh_index_summaries
+
+_DONE = object()
+
+
+class StageStats:
+    """Work and wait time for one pipeline stage (shared by its threads)."""
+
+    def __init__(self, name: str, threads: int = 1):
+        self.name = name
+        self.threads = threads
+        self.records = 0
+        self.batches = 0
+        self.busy_s = 0.0      # Time spent doing the stage's own work
+        self.starved_s = 0.0   # Time waiting for input
+        self.blocked_s = 0.0   # Time waiting for room downstream (backpressure)
+        self._lock = threading.Lock()
+
+    def add(self, records: int = 0, batches: int = 0, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0):
+        with self._lock:
+            self.records += records
+            self.batches += batches
+            self.busy_s += busy
+            self.starved_s += starved
+            self.blocked_s += blocked
+
+    def summary(self) -> dict:
+        per_thread = self.records / self.busy_s if self.busy_s else 0.0
+        return {
+            "threads": self.threads,
+            "records": self.records,
+            "batches": self.batches,
+            "busy_s": round(self.busy_s, 3),
+            "starved_s": round(self.starved_s, 3),
+            "blocked_s": round(self.blocked_s, 3),
+            # Wall time the stage needs on its own (work spread over its threads)
+            "stage_s": round(self.busy_s / self.threads, 3),
+            # Records/sec the stage could sustain if never starved or blocked
+            "capacity_rps": round(per_thread * self.threads, 1),
+        }
+
+
+class _Aborted(Exception):
+    """Raised in a stage thread when another stage has failed."""
+
+
+def _put(q: queue.Queue, item, abort: threading.Event) -> float:
+    """Blocking put that gives up when the pipeline aborts. Returns seconds waited."""
+    start = time.perf_counter()
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return time.perf_counter() - start
+        except queue.Full:
+            if abort.is_set():
+                raise _Aborted()
+
+
+def _get(q: queue.Queue, abort: threading.Event):
+    """Blocking get that gives up when the pipeline aborts. Returns (item, seconds waited)."""
+    start = time.perf_counter()
+    while True:
+        try:
+            return q.get(timeout=0.1), time.perf_counter() - start
+        except queue.Empty:
+            if abort.is_set():
+                raise _Aborted()
+
+
+def run_index_pipeline(
+    records: Iterable[dict],
+    dedup: bool = True,
+    reset: bool = False,
+    embed_workers: int = PIPELINE_EMBED_WORKERS,
+    batch_size: int = INDEX_BATCH_SIZE,
+    write_batch_size: int = CHROMA_WRITE_BATCH_SIZE,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    resume: bool = False,
+    manifest_path: str = INDEX_MANIFEST_PATH,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    profile: Optional[str] = None,
+) -> dict:
+    """
+    Embed and index a stream of processed vendors with overlapping stages.
+
+    Args:
+        records: Processed vendor dicts (e.g. iter_processed(iter_records(path))).
+            Preprocessing happens lazily as the batcher pulls from this stream.
+        dedup: If True, skip documents whose ids already exist in the store.
+        reset: If True, clear the collection before indexing.
+        embed_workers: Concurrent embedding threads.
+        batch_size: Records per embedding call.
+        write_batch_size: Vectors per Chroma upsert.
+        queue_size: Batches each queue holds before its producer blocks.
+        resume: If True, skip batches the checkpoint manifest records as committed.
+        manifest_path: Checkpoint manifest location.
+        persist_directory: Chroma directory to index into (a shard's directory when sharded).
+        profile: Index profile name for a new or reset collection (default: INDEX_PROFILE).
+
+    Returns:
+        {"wall_s", "max_stage_s", "sum_stage_s", "records_per_sec", "indexed", "skipped",
+         "resumed", "summaries_updated", "stages": {name: StageStats.summary()}}
+    """
+    if reset and resume:
+        raise ValueError("reset and resume cannot be combined")
+
+    embeddings = get_embeddings()
+    index_profile = get_profile(profile)
+    vector_store = load_vector_store(embeddings, persist_directory, index_profile)
+    # Bumps the index generation around writes (see preprocessing.index_generation)
+    tracker = ChangeTracker(f"index {persist_directory}")
+    if reset:
+        print(f"Reset requested: clearing collection '{COLLECTION_NAME}' (profile {index_profile['name']!r})")
+        tracker.mark()
+        vector_store.reset_collection()
+    else:
+        check_profile(vector_store, index_profile)
+    collection = vector_store._collection
+    manifest = IndexManifest.open(manifest_path, batch_size, resume)
+    progress: dict = {"resumed": 0}
+
+    to_embed: queue.Queue = queue.Queue(maxsize=queue_size)
+    to_write: queue.Queue = queue.Queue(maxsize=queue_size)
+    abort = threading.Event()
+    errors: list[BaseException] = []
+    skipped = [0]
+    summaries_updated = [0]  # Existing documents whose summary metadata changed
+
+    preprocess = StageStats("preprocess")
+    embed = StageStats("embed", threads=embed_workers)
+    write = StageStats("write")
+
+    def run_stage(fn):
+        def target():
+            try:
+                fn()
+            except _Aborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                abort.set()
+        return target
+
+    def batcher():
+        iterator = iter_pending_batches(records, manifest, progress)
+        while True:
+            start = time.perf_counter()
+            item = next(iterator, None)
+            if item is None:
+                break
+            checkpoint, batch = item
+            if dedup:
+                ids = [str(r["id"]) for r in batch]
+                existing = set(collection.get(ids=ids, include=[])["ids"])
+                fresh, seen = [], set()
+                for record, doc_id in zip(batch, ids):
+                    if doc_id not in existing and doc_id not in seen:
+                        seen.add(doc_id)
+                        fresh.append(record)
+                skipped[0] += len(batch) - len(fresh)
+                if existing:
+                    summaries_updated[0] += refresh_index_summaries(
+                        collection, [r for r in batch if str(r["id"]) in existing], tracker.mark,
+                    )
+                batch = fresh
+            preprocess.add(records=len(batch), batches=1, busy=time.perf_counter() - start)
+            if batch:
+                preprocess.add(blocked=_put(to_embed, (checkpoint, batch), abort))
+            else:
+                # Every record is already in the store; nothing to embed or write
+                manifest.commit([checkpoint])
+        for _ in range(embed_workers):
+            _put(to_embed, _DONE, abort)
+
+    def embedder():
+        while True:
+            batch, waited = _get(to_embed, abort)
+            embed.add(starved=waited)
+            if batch is _DONE:
+                break
+            checkpoint, batch = batch
+            start = time.perf_counter()
+            texts = [r["text"] for r in batch]
+            vectors = embeddings.embed_documents(texts)
+            embed.add(records=len(batch), batches=1, busy=time.perf_counter() - start)
+            embed.add(blocked=_put(to_write, (checkpoint, batch, vectors), abort))
+        _put(to_write, _DONE, abort)
+
+    def writer():
+        pending_records: list[dict] = []
+        pending_vectors: list = []
+        pending_checkpoints: list[tuple[int, int, str]] = []
+        finished_workers = 0
+
+        def flush():
+            start = time.perf_counter()
+            tracker.mark()
+            collection.upsert(
+                ids=[str(r["id"]) for r in pending_records],
+                embeddings=pending_vectors,
+                documents=[r["text"] for r in pending_records],
+                metadatas=[{**r["metadata"], "doc_id": str(r["id"])} for r in pending_records],
+            )
+            manifest.commit(pending_checkpoints)
+            write.add(records=len(pending_records), batches=1, busy=time.perf_counter() - start)
+            pending_records.clear()
+            pending_vectors.clear()
+            pending_checkpoints.clear()
+
+        while finished_workers < embed_workers:
+            item, waited = _get(to_write, abort)
+            write.add(starved=waited)
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            checkpoint, batch, vectors = item
+            pending_checkpoints.append(checkpoint)
+            pending_records.extend(batch)
+            pending_vectors.extend(vectors)
+            if len(pending_records) >= write_batch_size:
+                flush()
+        if pending_records:
+            flush()
+
+    threads = [threading.Thread(target=run_stage(batcher), name="pipeline-preprocess")]
+    threads += [
+        threading.Thread(target=run_stage(embedder), name=f"pipeline-embed-{i}") for i in range(embed_workers)
+    ]
+    threads.append(threading.Thread(target=run_stage(writer), name="pipeline-write"))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        abort.set()
+        for thread in threads:
+            thread.join()
+        raise
+    wall = time.perf_counter() - start
+
+    tracker.finish()
+    if errors:
+        raise errors[0]
+    manifest.finish()
+
+    stages = {stage.name: stage.summary() for stage in (preprocess, embed, write)}
+    return {
+        "wall_s": round(wall, 3),
+        # Sequential phases would take about sum_stage_s; a balanced pipeline about max_stage_s
+        "max_stage_s": max(stage["stage_s"] for stage in stages.values()),
+        "sum_stage_s": round(sum(stage["stage_s"] for stage in stages.values()), 3),
+        "records_per_sec": round(write.records / wall, 1) if wall else 0.0,
+        "indexed": write.records,
+        "skipped": skipped[0],
+        "resumed": progress["resumed"],
+        "summaries_updated": summaries_updated[0],
+        "stages": stages,
+    }
+
+
+def print_pipeline_report(report: dict):
+    """Print per-stage throughput for a run_index_pipeline result."""
+    resumed = f", {report['resumed']} already committed" if report.get("resumed") else ""
+    updated = f", updated {report['summaries_updated']} summaries" if report.get("summaries_updated") else ""
+    print(f"  Indexed {report['indexed']} documents (skipped {report['skipped']} duplicates{resumed}{updated}) "
+          f"in {report['wall_s']:.1f}s ({report['records_per_sec']:.0f} records/s)")
+    print(f"  Slowest stage {report['max_stage_s']:.1f}s, sum of stages {report['sum_stage_s']:.1f}s")
+    print(f"  {'stage':<11}{'threads':>8}{'busy s':>10}{'starved s':>11}{'blocked s':>11}{'capacity/s':>12}")
+    for name, stage in report["stages"].items():
+        print(f"  {name:<11}{stage['threads']:>8}{stage['busy_s']:>10.2f}{stage['starved_s']:>11.2f}"
+              f"{stage['blocked_s']:>11.2f}{stage['capacity_rps']:>12.0f}")
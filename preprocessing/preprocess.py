@@ -2,14 +2,23 @@
 Preprocess vendor data from all_results.json for embedding.
 Combines relevant text fields into a single searchable string per vendor.
 Handles failed extractions with fallback to raw vendor fields.
+
+preprocess_vendors works on whole lists; iter_processed is the streaming
+equivalent used with preprocessing.jsonstream for large dumps.
 """
 
 import json
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from config import PREPROCESS_WORKERS
+from preprocessing.jsonstream import iter_jsonl, is_jsonl, write_jsonl
 
 
 def load_vendors(json_path: str) -> list[dict]:
-    """Load vendor data from JSON file."""
+    """Load vendor data from a JSON array (or JSON Lines) file."""
+    if is_jsonl(json_path):
+        return list(iter_jsonl(json_path))
     with open(json_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
@@ -115,69 +124,120 @@ def combine_text_fields(vendor: dict) -> str:
     return "\n".join(parts)
 
 
-def preprocess_vendors(json_path: str) -> list[dict]:
+def process_vendor(vendor: dict, fallback_id: int) -> Optional[dict]:
+    """
+    Build the processed record for one raw vendor.
+
+    Returns None when the vendor has too little text to embed.
+    fallback_id (the vendor's input position) is used as the id when it has no index.
+    """
+    extracted = vendor.get("extracted") or {}
+
+    # Generate combined text (handles both success and fallback)
+    text = combine_text_fields(vendor)
+
+    # Skip if we have no meaningful text
+    if len(text.strip()) < 20:
+        return None
+
+    return {
+        "id": str(vendor.get("index", fallback_id)),
+        "text": text,
+        "metadata": {
+            "index": vendor.get("index"),
+            "vendor": vendor.get("vendor"),
+            "company_name": extracted.get("company_name") or vendor.get("company_name"),
+            "trading_name": extracted.get("trading_name"),
+            "services": extracted.get("services"),
+            "products": extracted.get("products"),
+            "industry": extracted.get("industry"),
+            "about": extracted.get("about"),
+            "city": extracted.get("city"),
+            "country": extracted.get("country"),
+            "address": extracted.get("address") or vendor.get("known_address"),
+            "phone": extracted.get("phone"),
+            "email": extracted.get("email"),
+            "website": extracted.get("website"),
+            "employees": extracted.get("employees"),
+            "certifications": extracted.get("certifications"),
+            "confidence": extracted.get("confidence"),
+            "extraction_status": vendor.get("status"),
+        }
+    }
+
+
+def iter_processed(
+    vendors: Iterable[dict],
+    stats: Optional[dict] = None,
+    start: int = 0,
+    skipped: Optional[list] = None,
+) -> Iterator[dict]:
+    """
+    Lazily preprocess a stream of raw vendors.
+
+    Args:
+        vendors: Raw vendor records (any iterable, e.g. iter_records(path)).
+        stats: Optional dict updated in place with success/fallback/skipped counts.
+        start: Input position of the first vendor. Vendors without an index use
+            their position as id, so ids don't depend on how the input is split.
+        skipped: If given, indexes of skipped vendors are appended here instead of printed.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("success", "fallback", "skipped"):
+        stats.setdefault(key, 0)
+
+    for position, vendor in enumerate(vendors, start):
+        record = process_vendor(vendor, position)
+        if record is None:
+            if skipped is None:
+                print(f"  Skipping vendor {vendor.get('index')}: insufficient data")
+            else:
+                skipped.append(vendor.get("index"))
+            stats["skipped"] += 1
+            continue
+
+        if vendor.get("status") == "success":
+            stats["success"] += 1
+        else:
+            stats["fallback"] += 1
+
+        yield record
+
+
+def preprocess_vendors(json_path: str, workers: int = PREPROCESS_WORKERS, ordered: bool = True) -> list[dict]:
     """
     Preprocess all vendors for embedding.
     Includes vendors with failed extractions using fallback data.
 
+    Args:
+        json_path: Raw vendors (JSON array or JSON Lines).
+        workers: Processes to use; 1 runs in this process, 0 uses every CPU.
+        ordered: With several workers, keep input order (ids are the same either way).
+
     Returns list of dicts with:
-        - id: unique identifier (index)
+        - id: unique identifier (index, else input position)
         - text: combined text for embedding
         - metadata: vendor info for display
     """
-    vendors = load_vendors(json_path)
-    processed = []
-    success_count = 0
-    fallback_count = 0
-
-    for vendor in vendors:
-        extracted = vendor.get("extracted") or {}
-        is_success = vendor.get("status") == "success"
-
-        # Generate combined text (handles both success and fallback)
-        text = combine_text_fields(vendor)
+    stats: dict = {}
+    if workers == 1:
+        processed = list(iter_processed(load_vendors(json_path), stats))
+    else:
+        from preprocessing.parallel import iter_processed_parallel, iter_raw_units
 
-        # Skip if we have no meaningful text
-        if len(text.strip()) < 20:
-            print(f"  Skipping vendor {vendor.get('index')}: insufficient data")
-            continue
+        processed = list(iter_processed_parallel(
+            iter_raw_units(json_path), workers=workers, ordered=ordered, stats=stats,
+        ))
 
-        if is_success:
-            success_count += 1
-        else:
-            fallback_count += 1
-
-        processed.append({
-            "id": str(vendor.get("index", len(processed))),
-            "text": text,
-            "metadata": {
-                "index": vendor.get("index"),
-                "vendor": vendor.get("vendor"),
-                "company_name": extracted.get("company_name") or vendor.get("company_name"),
-                "trading_name": extracted.get("trading_name"),
-                "services": extracted.get("services"),
-                "products": extracted.get("products"),
-                "industry": extracted.get("industry"),
-                "about": extracted.get("about"),
-                "city": extracted.get("city"),
-                "country": extracted.get("country"),
-                "address": extracted.get("address") or vendor.get("known_address"),
-                "phone": extracted.get("phone"),
-                "email": extracted.get("email"),
-                "website": extracted.get("website"),
-                "employees": extracted.get("employees"),
-                "certifications": extracted.get("certifications"),
-                "confidence": extracted.get("confidence"),
-                "extraction_status": vendor.get("status"),
-            }
-        })
-
-    print(f"  Processed: {success_count} successful, {fallback_count} with fallback data")
+    print(f"  Processed: {stats['success']} successful, {stats['fallback']} with fallback data")
     return processed
 
 
 def save_processed(processed: list[dict], output_path: str):
-    """Save processed vendors to JSON."""
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(processed, f, indent=2, ensure_ascii=False)
+    """Save processed vendors to JSON (JSON Lines if output_path ends in .jsonl)."""
+    if output_path.endswith(".jsonl"):
+        write_jsonl(processed, output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(processed, f, indent=2, ensure_ascii=False)
     print(f"Saved {len(processed)} processed vendors to {output_path}")
@@ -0,0 +1,182 @@
+"""
+Shard assignment for the vector index.
+
+With SHARD_KEY set, every processed vendor belongs to exactly one shard:
+  - "region":   the region of the vendor's city (SHARD_REGIONS)
+  - "industry": the bucket of the vendor's industry (SHARD_INDUSTRY_BUCKETS)
+  - "hash":     a stable hash of the vendor id, modulo SHARD_COUNT
+
+Vendors that match no region or bucket go to SHARD_OTHER. Each shard is a
+separate Chroma directory (or server collection) with its own checkpoint
+manifest, so one shard can be rebuilt or resumed without touching the others.
+"""
+
+import json
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from config import (
+    SHARD_COUNT,
+    SHARD_INDUSTRY_BUCKETS,
+    SHARD_KEY,
+    SHARD_OTHER,
+    SHARD_PARTITION_DIR,
+    SHARD_PERSIST_DIR,
+    SHARD_REGIONS,
+)
+
+SHARD_KEYS = ("region", "industry", "hash")
+
+
+def check_shard_key(key: Optional[str] = SHARD_KEY) -> str:
+    """Return key if it is a supported shard key, else raise ValueError."""
+    if key not in SHARD_KEYS:
+        raise ValueError(f"Unknown SHARD_KEY {key!r}; expected one of {', '.join(SHARD_KEYS)}")
+    return key
+
+
+@lru_cache(maxsize=None)
+def _patterns(kind: str) -> list[tuple[str, re.Pattern]]:
+    """Compiled whole-word patterns for the region or industry table."""
+    table = SHARD_REGIONS if kind == "region" else SHARD_INDUSTRY_BUCKETS
+    return [
+        (name, re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE))
+        for name, terms in table.items()
+    ]
+
+
+def _match(kind: str, text: Optional[str]) -> Optional[str]:
+    """First table entry with a term occurring in text as a whole word."""
+    if not text:
+        return None
+    for name, pattern in _patterns(kind):
+        if pattern.search(text):
+            return name
+    return None
+
+
+def region_of(text: Optional[str]) -> Optional[str]:
+    """Region for a city, address or free-text location, or None if unknown."""
+    return _match("region", text)
+
+
+@lru_cache(maxsize=1)
+def _place_pattern() -> re.Pattern:
+    terms = sorted({term for terms in SHARD_REGIONS.values() for term in terms}, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE)
+
+
+def place_names(text: Optional[str]) -> frozenset[str]:
+    """Place names from SHARD_REGIONS occurring in text as whole words (lowercased)."""
+    if not text:
+        return frozenset()
+    return frozenset(match.lower() for match in _place_pattern().findall(text))
+
+
+def industry_bucket_of(text: Optional[str]) -> Optional[str]:
+    """Industry bucket for an industry or job type, or None if unknown."""
+    return _match("industry", text)
+
+
+def hash_shard_name(n: int) -> str:
+    return f"h{n:02d}"
+
+
+def hash_shard(doc_id: str, count: int = SHARD_COUNT) -> str:
+    """Shard for a vendor id under SHARD_KEY = "hash" (stable across processes)."""
+    return hash_shard_name(zlib.crc32(str(doc_id).encode("utf-8")) % count)
+
+
+def shard_names(key: Optional[str] = SHARD_KEY) -> list[str]:
+    """Every shard a key can produce, in a stable order."""
+    key = check_shard_key(key)
+    if key == "hash":
+        return [hash_shard_name(n) for n in range(SHARD_COUNT)]
+    table = SHARD_REGIONS if key == "region" else SHARD_INDUSTRY_BUCKETS
+    return [*table, SHARD_OTHER]
+
+
+def shard_for_record(record: dict, key: Optional[str] = SHARD_KEY) -> str:
+    """Shard a processed vendor record belongs to."""
+    key = check_shard_key(key)
+    if key == "hash":
+        return hash_shard(record["id"])
+    metadata = record.get("metadata") or {}
+    if key == "region":
+        shard = region_of(metadata.get("city")) or region_of(metadata.get("address"))
+    else:
+        shard = industry_bucket_of(metadata.get("industry"))
+    return shard or SHARD_OTHER
+
+
+def shard_dir(shard: str, key: Optional[str] = SHARD_KEY) -> str:
+    """Chroma persist directory for one shard."""
+    return os.path.join(SHARD_PERSIST_DIR, check_shard_key(key), shard)
+
+
+def shard_manifest_path(shard: str, key: Optional[str] = SHARD_KEY) -> str:
+    """Checkpoint manifest for one shard (kept with the shard's store)."""
+    return os.path.join(shard_dir(shard, key), "index_manifest.json")
+
+
+def shard_partition_path(shard: str, key: Optional[str] = SHARD_KEY) -> str:
+    """Processed vendors of one shard, written by partition_records."""
+    return os.path.join(SHARD_PARTITION_DIR, check_shard_key(key), f"{shard}.jsonl")
+
+
+def existing_shards(key: Optional[str] = SHARD_KEY) -> list[str]:
+    """Shards that have a persisted store (on disk, or on the Chroma server)."""
+    from preprocessing.chroma_client import store_exists
+
+    return [shard for shard in shard_names(key) if store_exists(shard_dir(shard, key))]
+
+
+def partition_records(
+    records: Iterable[dict],
+    key: Optional[str] = SHARD_KEY,
+    shards: Optional[Iterable[str]] = None,
+) -> dict[str, int]:
+    """
+    Split processed records into one JSONL file per shard in a single pass.
+
+    Only the shards listed in shards (default: all) are written. Each file
+    is written under a temporary name and moved into place once the input
+    is exhausted. Returns {shard: record count} for shards with records.
+    """
+    key = check_shard_key(key)
+    wanted = set(shards) if shards is not None else set(shard_names(key))
+    unknown = wanted - set(shard_names(key))
+    if unknown:
+        raise ValueError(f"Unknown {key} shards: {', '.join(sorted(unknown))}")
+
+    files: dict = {}
+    counts: dict[str, int] = {}
+    try:
+        for record in records:
+            shard = shard_for_record(record, key)
+            if shard not in wanted:
+                continue
+            f = files.get(shard)
+            if f is None:
+                path = shard_partition_path(shard, key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                f = files[shard] = open(f"{path}.tmp", "w", encoding="utf-8")
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            counts[shard] = counts.get(shard, 0) + 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    for shard in files:
+        path = shard_partition_path(shard, key)
+        os.replace(f"{path}.tmp", path)
+    # A shard that is now empty must not keep a stale partition
+    for shard in wanted - set(files):
+        path = shard_partition_path(shard, key)
+        if os.path.exists(path):
+            os.remove(path)
+    return counts
@@ -0,0 +1,222 @@
+"""
+Offline vendor summaries for short rerank prompts.
+
+Each processed vendor gets a compact, ranking-oriented summary (key
+services, sectors, region, certifications) written by the LLM and capped
+at SUMMARY_MAX_TOKENS. The summary is stored as metadata["summary"], so it
+reaches the processed file, the index metadata and the vendor catalog.
+
+Summaries are cached in SUMMARY_CACHE_PATH together with a hash of the
+fields they are written from (and of the prompt). A vendor is summarised
+again only when that hash changes. New summaries are appended to the cache
+as each batch finishes, so an interrupted run keeps what it already paid for.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+import providers
+from config import (
+    INDEX_BATCH_SIZE,
+    SUMMARY_CACHE_PATH,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_WORKERS,
+    VENDOR_SUMMARY_PROMPT,
+)
+from preprocessing.jsonstream import iter_jsonl
+
+# Metadata fields a summary is written from, with their prompt labels
+SUMMARY_FIELDS = (
+    ("company_name", "Company"),
+    ("trading_name", "Also known as"),
+    ("services", "Services"),
+    ("products", "Products"),
+    ("industry", "Industry"),
+    ("about", "About"),
+    ("city", "City"),
+    ("country", "Country"),
+    ("certifications", "Certifications"),
+    ("employees", "Employees"),
+)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def cap_summary(text: str, max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """Single-line summary cut at a word boundary to about max_tokens."""
+    text = re.sub(r"\s+", " ", text.strip().strip("`\"'")).strip()
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0].rstrip(",;:-")
+    return cut + "..."
+
+
+def vendor_details(metadata: dict) -> str:
+    """The vendor fields shown to the summary prompt, one per line."""
+    lines = []
+    for name, label in SUMMARY_FIELDS:
+        value = metadata.get(name)
+        if value not in (None, ""):
+            lines.append(f"- {label}: {value}")
+    return "\n".join(lines)
+
+
+def summary_prompt(metadata: dict, max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    # Roughly 0.75 words per token
+    return VENDOR_SUMMARY_PROMPT.format(max_words=max(5, max_tokens * 3 // 4), vendor=vendor_details(metadata))
+
+
+def content_hash(metadata: dict, max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """Hash of everything a summary depends on: source fields, prompt and length cap."""
+    digest = hashlib.sha256()
+    digest.update(VENDOR_SUMMARY_PROMPT.encode("utf-8"))
+    digest.update(str(max_tokens).encode("utf-8"))
+    for name, _ in SUMMARY_FIELDS:
+        digest.update(b"\0")
+        digest.update(json.dumps(metadata.get(name), ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class SummaryCache:
+    """id -> (content hash, summary), loaded from and appended to a JSONL file."""
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH):
+        self.path = path
+        self.entries: dict[str, tuple[str, str]] = {}
+        self._lines = 0
+        if os.path.exists(path):
+            # Later lines win, so appended entries replace older ones
+            for entry in iter_jsonl(path):
+                self.entries[str(entry["id"])] = (entry["hash"], entry["summary"])
+                self._lines += 1
+
+    def lookup(self, doc_id: str, digest: str) -> Optional[str]:
+        entry = self.entries.get(doc_id)
+        return entry[1] if entry is not None and entry[0] == digest else None
+
+    def append(self, rows: list[tuple[str, str, str]]):
+        """Record (id, hash, summary) rows and write them to the cache file."""
+        if not rows:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for doc_id, digest, summary in rows:
+                self.entries[doc_id] = (digest, summary)
+                f.write(json.dumps({"id": doc_id, "hash": digest, "summary": summary}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._lines += len(rows)
+
+    def compact(self):
+        """Rewrite the file with one line per vendor once replaced entries have piled up."""
+        if self._lines <= len(self.entries):
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, (digest, summary) in self.entries.items():
+                f.write(json.dumps({"id": doc_id, "hash": digest, "summary": summary}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+def summarize_vendor(llm, metadata: dict, max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """One LLM call producing the capped summary for a vendor's metadata."""
+    response = llm.invoke(summary_prompt(metadata, max_tokens))
+    return cap_summary(response.content, max_tokens)
+
+
+def iter_summarized(
+    records: Iterable[dict],
+    cache_path: str = SUMMARY_CACHE_PATH,
+    workers: int = SUMMARY_WORKERS,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+    stats: Optional[dict] = None,
+) -> Iterator[dict]:
+    """
+    Add metadata["summary"] to a stream of processed records, in order.
+
+    Cached summaries whose content hash still matches are reused; the rest
+    are generated with up to `workers` concurrent LLM calls per batch. A
+    vendor whose call fails is passed through without a summary (the rerank
+    prompt then shows its full fields) and is retried on the next run.
+
+    stats (if given) is updated with cached / generated / failed counts.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("cached", "generated", "failed"):
+        stats.setdefault(key, 0)
+
+    cache = SummaryCache(cache_path)
+    llm = providers.get_llm()
+
+    def generate(metadata: dict) -> Optional[str]:
+        try:
+            return summarize_vendor(llm, metadata, max_tokens) or None
+        except Exception as e:
+            print(f"  Summary failed for {metadata.get('company_name')!r}: {e}")
+            return None
+
+    iterator = iter(records)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="summary") as pool:
+        while batch := list(islice(iterator, INDEX_BATCH_SIZE)):
+            pending = []
+            for record in batch:
+                metadata = record["metadata"]
+                digest = content_hash(metadata, max_tokens)
+                summary = cache.lookup(str(record["id"]), digest)
+                if summary is None:
+                    pending.append((record, digest))
+                else:
+                    metadata["summary"] = summary
+                    stats["cached"] += 1
+
+            generated = []
+            for (record, digest), summary in zip(pending, pool.map(generate, [r["metadata"] for r, _ in pending])):
+                if summary is not None:
+                    record["metadata"]["summary"] = summary
+                    generated.append((str(record["id"]), digest, summary))
+            cache.append(generated)
+            stats["generated"] += len(generated)
+            stats["failed"] += len(pending) - len(generated)
+
+            yield from batch
+
+    cache.compact()
+
+
+def print_summary_stats(stats: dict):
+    failed = f", {stats['failed']} failed" if stats.get("failed") else ""
+    print(f"  Summaries: {stats['cached']} cached, {stats['generated']} generated{failed}")
+
+
+def refresh_index_summaries(collection, records: list[dict], before_write: Optional[Callable] = None) -> int:
+    """
+    Copy summaries of records already in the collection into their index
+    metadata where it differs. Only metadata is updated; nothing is re-embedded.
+    before_write (if given) is called before the collection is modified.
+
+    Returns:
+        Number of documents updated.
+    """
+    summaries = {str(r["id"]): r["metadata"]["summary"] for r in records if r["metadata"].get("summary")}
+    if not summaries:
+        return 0
+    current = collection.get(ids=list(summaries), include=["metadatas"])
+    stale = [
+        doc_id for doc_id, metadata in zip(current["ids"], current["metadatas"])
+        if (metadata or {}).get("summary") != summaries[doc_id]
+    ]
+    if stale:
+        if before_write is not None:
+            before_write()
+        collection.update(ids=stale, metadatas=[{"summary": summaries[doc_id]} for doc_id in stale])
+    return len(stale)
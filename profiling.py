@@ -0,0 +1,280 @@
+"""
+Opt-in CPU (cProfile) and memory (tracemalloc) profiling of pipeline sections.
+
+    with profiling("cpu") as profiler:
+        run_recommendation(query)
+    print(profiler.report())
+
+While a profiler is active, every graph node (graph.instrumentation.
+instrument_node) and every block run under profile_section(name), such as
+the run_preprocessing.py phases, is profiled as a section. Repeated calls of
+a section are merged. On exit, one file per section and summary.json are
+written to a new directory under PROFILE_DIR:
+  - cpu: <section>.prof (pstats; open with `python -m pstats` or snakeviz)
+    and <section>.txt (top functions by cumulative time). The summary also
+    splits each section's own time by package (json, langchain_core, ssl...).
+  - mem: <section>.txt (allocation sites that grew during the section);
+    the summary has the peak traced memory and the net growth per section.
+
+cProfile only sees the thread running the section, so work handed to a
+thread pool (multi-query searches, pipelined indexing stages) shows up as
+waiting. A section started inside another on the same thread is counted in
+the outer one. tracemalloc traces every thread, so profile one request at a
+time in mem mode.
+
+With no profiler active, a section costs one global lookup.
+"""
+
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from config import PROFILE_DIR, PROFILE_TOP_N, PROFILE_TRACEMALLOC_FRAMES
+
+MODES = ("cpu", "mem")
+
+# The profiler of the current run (None when profiling is off)
+ACTIVE: Optional["Profiler"] = None
+
+
+def _short_path(filename: str) -> str:
+    """Filename relative to the sys.path entry it was imported from."""
+    for root in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(root.rstrip(os.sep) + os.sep):
+            return os.path.relpath(filename, root)
+    return filename
+
+
+def _package(filename: str, function: str) -> str:
+    """Top-level package a profiled function belongs to ("_socket", "json", "graph"...)."""
+    if filename == "~":
+        # Built-ins: "<method 'recv_into' of '_ssl._SSLSocket' objects>", "<built-in method _json.scanstring>"
+        match = re.search(r"of '([\w]+)[.']|method ([\w]+)\.", function)
+        return next(filter(None, match.groups())) if match else "builtins"
+    path = _short_path(filename)
+    if path.startswith("<"):
+        return path
+    return path.split(os.sep)[0].removesuffix(".py")
+
+
+def _file_name(section: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", section)
+
+
+class Profiler:
+    """Profiles of named sections for one run, in "cpu" or "mem" mode."""
+
+    def __init__(self, mode: str, output_dir: Optional[str] = None, top_n: int = PROFILE_TOP_N):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.output_dir = output_dir or os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{mode}")
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self.sections: dict[str, dict] = {}  # name -> calls, wall_s (and peak_kb, net_kb for mem)
+        self._stats: dict = {}  # name -> pstats.Stats (cpu)
+        self._sites: dict[str, dict[str, list[int]]] = {}  # name -> site -> [bytes, blocks] (mem)
+        self.summary: Optional[dict] = None
+
+    def start(self):
+        if self.mode == "mem":
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def section(self, name: str):
+        """Profile the block as section name (nested sections count in the outer one)."""
+        if getattr(self._local, "active", False):
+            yield
+            return
+        self._local.active = True
+        try:
+            if self.mode == "cpu":
+                with self._cpu_section(name):
+                    yield
+            else:
+                with self._mem_section(name):
+                    yield
+        finally:
+            self._local.active = False
+
+    def _record(self, name: str, elapsed: float) -> dict:
+        section = self.sections.setdefault(name, {"calls": 0, "wall_s": 0.0})
+        section["calls"] += 1
+        section["wall_s"] += elapsed
+        return section
+
+    @contextmanager
+    def _cpu_section(self, name: str):
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._record(name, elapsed)
+                if name in self._stats:
+                    self._stats[name].add(profile)
+                else:
+                    self._stats[name] = pstats.Stats(profile)
+
+    @contextmanager
+    def _mem_section(self, name: str):
+        import tracemalloc
+
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            # Leave out the snapshots' own bookkeeping
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+            with self._lock:
+                section = self._record(name, elapsed)
+                section["peak_kb"] = max(section.get("peak_kb", 0.0), round((peak - base) / 1024, 1))
+                section["net_kb"] = round(section.get("net_kb", 0.0) + (current - base) / 1024, 1)
+                sites = self._sites.setdefault(name, {})
+                for stat in diff:
+                    if stat.size_diff > 0:
+                        frame = stat.traceback[0]
+                        totals = sites.setdefault(f"{_short_path(frame.filename)}:{frame.lineno}", [0, 0])
+                        totals[0] += stat.size_diff
+                        totals[1] += stat.count_diff
+
+    # -------------------------------------------------------------------------
+    # Output
+    # -------------------------------------------------------------------------
+
+    def _cpu_summary(self, name: str, path_prefix: str) -> dict:
+        stats = self._stats[name]
+        stats.dump_stats(f"{path_prefix}.prof")
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(self.top_n)
+        with open(f"{path_prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_n]
+        by_package: dict[str, float] = {}
+        for (filename, _, function), (_, _, tottime, _, _) in stats.stats.items():
+            package = _package(filename, function)
+            by_package[package] = by_package.get(package, 0.0) + tottime
+        return {
+            "cpu_s": round(stats.total_tt, 4),
+            "top_functions": [
+                {
+                    "function": f"{_short_path(filename)}:{line}({function})" if filename != "~" else function,
+                    "calls": ncalls,
+                    "self_s": round(tottime, 4),
+                    "cumulative_s": round(cumtime, 4),
+                }
+                for (filename, line, function), (_, ncalls, tottime, cumtime, _) in rows
+            ],
+            "by_package_s": {
+                package: round(seconds, 4)
+                for package, seconds in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:10]
+            },
+        }
+
+    def _mem_summary(self, name: str, path_prefix: str) -> dict:
+        sites = sorted(self._sites.get(name, {}).items(), key=lambda item: item[1][0], reverse=True)
+        with open(f"{path_prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(f"Allocation sites that grew during '{name}' ({self.sections[name]['calls']} calls)\n\n")
+            for site, (size, count) in sites[:self.top_n]:
+                f.write(f"{size / 1024:12.1f} KiB {count:10d} blocks  {site}\n")
+        return {
+            "top_sites": [
+                {"site": site, "size_kb": round(size / 1024, 1), "blocks": count} for site, (size, count) in sites[:self.top_n]
+            ],
+        }
+
+    def write(self) -> dict:
+        """Write the per-section files and summary.json; returns the summary."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        sections = {}
+        with self._lock:
+            for name, section in self.sections.items():
+                path_prefix = os.path.join(self.output_dir, _file_name(name))
+                details = self._cpu_summary(name, path_prefix) if self.mode == "cpu" else self._mem_summary(name, path_prefix)
+                sections[name] = {**section, "wall_s": round(section["wall_s"], 4), **details}
+        self.summary = {"mode": self.mode, "output_dir": self.output_dir, "sections": sections}
+        with open(os.path.join(self.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary, f, indent=2)
+        return self.summary
+
+    def report(self, top: int = 5) -> str:
+        """Readable summary: each section with its top functions or allocation sites."""
+        summary = self.summary or self.write()
+        lines = [f"Profile ({self.mode}) written to {self.output_dir}"]
+        for name, section in summary["sections"].items():
+            if self.mode == "cpu":
+                packages = ", ".join(f"{p} {s:.3f}s" for p, s in list(section["by_package_s"].items())[:4])
+                lines.append(f"  {name}: {section['calls']} calls, {section['wall_s']:.3f}s wall, "
+                             f"{section['cpu_s']:.3f}s profiled ({packages})")
+                for row in section["top_functions"][:top]:
+                    lines.append(f"      {row['cumulative_s']:8.3f}s cum {row['self_s']:8.3f}s self  {row['function']}")
+            else:
+                lines.append(f"  {name}: {section['calls']} calls, peak {section['peak_kb']:.1f} KiB, "
+                             f"net {section['net_kb']:+.1f} KiB")
+                for row in section["top_sites"][:top]:
+                    lines.append(f"      {row['size_kb']:10.1f} KiB {row['blocks']:8d} blocks  {row['site']}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profiling(mode: Optional[str], output_dir: Optional[str] = None, top_n: int = PROFILE_TOP_N):
+    """
+    Profile the sections run inside the block and write the results on exit.
+    Yields the Profiler, or None (and profiles nothing) when mode is None.
+    """
+    global ACTIVE
+    if mode is None:
+        yield None
+        return
+    if ACTIVE is not None:
+        raise RuntimeError("A profiler is already active")
+    profiler = Profiler(mode, output_dir, top_n)
+    profiler.start()
+    ACTIVE = profiler
+    try:
+        yield profiler
+    finally:
+        ACTIVE = None
+        profiler.stop()
+        profiler.write()
+
+
+def profile_section(name: str):
+    """Context manager profiling the block as section name while a profiler is active."""
+    profiler = ACTIVE
+    return nullcontext() if profiler is None else profiler.section(name)
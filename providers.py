@@ -0,0 +1,95 @@
+"""
+Model client factories for the Vendor Recommender System.
+
+The graph nodes and the indexer obtain their LLM and embedding clients
+through these functions, so benchmarks and local runs can substitute
+stand-in implementations without touching node code.
+
+langchain_google_genai is imported on first use (it takes seconds to
+import), and the API key is validated only when a Gemini client is built.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from config import (
+    EMBEDDING_MODEL,
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    require_google_api_key,
+)
+
+# Optional overrides: llm() -> chat model, embeddings(task_type) -> embeddings
+_overrides: dict[str, Optional[Callable]] = {"llm": None, "embeddings": None}
+
+# Gemini clients are reused across requests so connections stay warm
+_clients: dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _cached_client(key: str, factory: Callable):
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def get_llm():
+    """Initialize the chat LLM used for extraction and reranking."""
+    if _overrides["llm"] is not None:
+        return _overrides["llm"]()
+
+    def build():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=LLM_MODEL,
+            google_api_key=require_google_api_key(),
+            temperature=LLM_TEMPERATURE,
+        )
+
+    return _cached_client("llm", build)
+
+
+def get_embeddings(task_type: str = "RETRIEVAL_DOCUMENT"):
+    """Initialize the embedding client for documents or queries."""
+    if _overrides["embeddings"] is not None:
+        return _overrides["embeddings"](task_type)
+
+    def build():
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=require_google_api_key(),
+            task_type=task_type,
+        )
+
+    return _cached_client(f"embeddings:{task_type}", build)
+
+
+def set_providers(llm: Optional[Callable] = None, embeddings: Optional[Callable] = None):
+    """
+    Replace the LLM and/or embedding factories process-wide.
+
+    Args:
+        llm: Zero-argument factory returning a chat model (None keeps Gemini).
+        embeddings: Factory taking task_type and returning embeddings (None keeps Gemini).
+    """
+    _overrides["llm"] = llm
+    _overrides["embeddings"] = embeddings
+
+
+@contextmanager
+def use_providers(llm: Optional[Callable] = None, embeddings: Optional[Callable] = None):
+    """Temporarily replace the LLM and/or embedding factories."""
+    previous = dict(_overrides)
+    set_providers(llm=llm, embeddings=embeddings)
+    try:
+        yield
+    finally:
+        _overrides.update(previous)
@@ -11,12 +11,54 @@ Run this BEFORE using the recommender system.
 
 Usage:
     python run_preprocessing.py
+    python run_preprocessing.py --stream                 # Constant memory, JSONL output
+    python run_preprocessing.py --stream --input dump.jsonl
+    python run_preprocessing.py --stream --workers 0     # Preprocess on every CPU
+    python run_preprocessing.py --pipelined              # Overlap preprocess, embed and write
+    python run_preprocessing.py --stream --resume        # Continue an interrupted run
+    python run_preprocessing.py --stream --summarize     # Add LLM vendor summaries (cached by content hash)
+    SHARD_KEY=region python run_preprocessing.py --stream              # One index per region
+    SHARD_KEY=region python run_preprocessing.py --shard london --reset-index  # Rebuild one shard
+    python run_preprocessing.py --profile cpu            # cProfile per phase (or mem: tracemalloc)
 """
 
 import argparse
-from preprocessing.preprocess import preprocess_vendors, save_processed
-from preprocessing.embeddings import index_vendors_with_dedup, get_query_embeddings, load_vector_store
-from config import RAW_DATA_PATH, PROCESSED_DATA_PATH
+import sys
+from preprocessing.preprocess import preprocess_vendors, save_processed, iter_processed
+from preprocessing.embeddings import (
+    index_vendors_with_dedup,
+    index_vendor_stream,
+    get_query_embeddings,
+    load_vector_store,
+)
+from preprocessing.chroma_client import delete_store, describe_store
+from preprocessing.jsonstream import iter_jsonl, iter_records, tee_jsonl
+from preprocessing.parallel import iter_processed_parallel, iter_raw_units
+from preprocessing.index_generation import bump_generation
+from preprocessing.pipeline import run_index_pipeline, print_pipeline_report
+from preprocessing.summaries import iter_summarized, print_summary_stats
+from profiling import MODES as PROFILE_MODES, profile_section, profiling
+from preprocessing.sharding import (
+    check_shard_key,
+    partition_records,
+    shard_dir,
+    shard_manifest_path,
+    shard_names,
+    shard_partition_path,
+)
+from config import (
+    RAW_DATA_PATH,
+    PROCESSED_DATA_PATH,
+    PROCESSED_JSONL_PATH,
+    PREPROCESS_WORKERS,
+    PIPELINE_EMBED_WORKERS,
+    INDEX_MANIFEST_PATH,
+    INDEX_PROFILE,
+    INDEX_PROFILES,
+    SHARD_KEY,
+    SUMMARY_CACHE_PATH,
+    MissingAPIKeyError,
+)
 
 
 def parse_args():
@@ -26,49 +68,257 @@ def parse_args():
         action="store_true",
         help="Delete any existing Chroma index before indexing (start clean)."
     )
+    parser.add_argument(
+        "--index-profile",
+        choices=sorted(INDEX_PROFILES),
+        default=INDEX_PROFILE,
+        help="HNSW profile (distance space, M, ef) for a new or reset index (default: %(default)s)."
+    )
     parser.add_argument(
         "--no-dedup",
         action="store_true",
         help="Disable deduplication (allow re-adding existing ids)."
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run: batches recorded in the checkpoint manifest "
+             f"({INDEX_MANIFEST_PATH}) are not embedded again. Use the same mode and input."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream records through preprocessing and indexing in constant memory "
+             f"(writes {PROCESSED_JSONL_PATH})."
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Like --stream, but preprocessing, embedding and Chroma writes run concurrently "
+             "through bounded queues."
+    )
+    parser.add_argument(
+        "--embed-workers",
+        type=int,
+        default=PIPELINE_EMBED_WORKERS,
+        help="Concurrent embedding calls in --pipelined mode (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--input",
+        default=RAW_DATA_PATH,
+        help="Raw vendor file: JSON array or JSON Lines (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=PREPROCESS_WORKERS,
+        help="Processes for preprocessing (1 = in-process, 0 = one per CPU; default: %(default)s)."
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="With --workers, emit records as chunks finish instead of in input order."
+    )
+    parser.add_argument(
+        "--summarize",
+        action="store_true",
+        help="Add a short LLM-written summary to each vendor for summary-mode rerank prompts. "
+             f"Summaries are cached in {SUMMARY_CACHE_PATH} and only regenerated when a vendor changes."
+    )
+    parser.add_argument(
+        "--shard",
+        action="append",
+        help="With SHARD_KEY set, index only this shard (repeatable); other shards are left untouched."
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        help="Profile each phase with cProfile (cpu) or tracemalloc (mem)."
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Directory for the profile files (default: a new one under PROFILE_DIR)."
+    )
+    args = parser.parse_args()
+    if args.shard:
+        if not SHARD_KEY:
+            parser.error("--shard needs SHARD_KEY to be set (region, industry or hash)")
+        unknown = set(args.shard) - set(shard_names(check_shard_key(SHARD_KEY)))
+        if unknown:
+            parser.error(f"unknown {SHARD_KEY} shards: {', '.join(sorted(unknown))}; "
+                         f"choose from {', '.join(shard_names(SHARD_KEY))}")
+    if args.resume and args.reset_index:
+        parser.error("--resume cannot be combined with --reset-index")
+    if args.resume and args.unordered:
+        # Checkpoints are keyed by position in the processed stream
+        parser.error("--resume needs records in input order; drop --unordered")
+    return args
+
+
+def stream_processed(args, stats: dict):
+    """Processed records streamed from the raw input and written to the JSONL output."""
+    if args.workers == 1:
+        records = iter_processed(iter_records(args.input), stats)
+    else:
+        records = iter_processed_parallel(
+            iter_raw_units(args.input), workers=args.workers, ordered=not args.unordered, stats=stats,
+        )
+    if args.summarize:
+        records = iter_summarized(records, stats=stats.setdefault("summaries", {}))
+    return tee_jsonl(records, PROCESSED_JSONL_PATH)
+
+
+def preprocess_all(args) -> list[dict]:
+    """Preprocess the whole input in memory (with summaries if requested) and save it."""
+    processed = preprocess_vendors(args.input, workers=args.workers, ordered=not args.unordered)
+    if args.summarize:
+        print("  Summarising vendors...")
+        summary_stats: dict = {}
+        processed = list(iter_summarized(processed, stats=summary_stats))
+        print_summary_stats(summary_stats)
+    save_processed(processed, PROCESSED_DATA_PATH)
+    return processed
+
+
+def run_streaming(args):
+    """Preprocess and index one record at a time; output is written as JSON Lines."""
+    print("\n[Step 1+2] Streaming preprocessing into the index...")
+    stats: dict = {}
+    # Records are preprocessed as the indexer pulls them: one phase
+    with profile_section("preprocess+index"):
+        index_vendor_stream(
+            stream_processed(args, stats),
+            dedup=not args.no_dedup,
+            reset=args.reset_index,
+            resume=args.resume,
+            profile=args.index_profile,
+        )
+    print_stream_summary(stats)
+
+
+def run_pipelined(args):
+    """Preprocess, embed and index concurrently with bounded queues between stages."""
+    print(f"\n[Step 1+2] Pipelined preprocessing -> embedding ({args.embed_workers} workers) -> indexing...")
+    stats: dict = {}
+    # Profiles the batcher on this thread; the embed and write stages run on their own threads
+    with profile_section("pipeline"):
+        report = run_index_pipeline(
+            stream_processed(args, stats),
+            dedup=not args.no_dedup,
+            reset=args.reset_index,
+            embed_workers=args.embed_workers,
+            resume=args.resume,
+            profile=args.index_profile,
+        )
+    print_pipeline_report(report)
+    print_stream_summary(stats)
+
+
+def run_sharded(args):
+    """Preprocess, split the records by SHARD_KEY, and index each shard into its own store."""
+    key = check_shard_key(SHARD_KEY)
+    shards = args.shard or shard_names(key)
+
+    print(f"\n[Step 1] Preprocessing and partitioning by {key} ({len(shards)} shards)...")
+    stats: dict = {}
+    with profile_section("preprocess+partition"):
+        if args.stream or args.pipelined:
+            records = stream_processed(args, stats)
+        else:
+            records = preprocess_all(args)
+        counts = partition_records(records, key, shards)
+    if stats:
+        print_stream_summary(stats)
+
+    print(f"\n[Step 2] Indexing {len(counts)} shards...")
+    for shard in shards:
+        persist_directory = shard_dir(shard, key)
+        if shard not in counts:
+            if args.reset_index and delete_store(persist_directory):
+                print(f"\n  Shard '{shard}': no vendors; removed {describe_store(persist_directory)}")
+                bump_generation(f"removed shard {persist_directory}")
+            continue
+
+        print(f"\n  Shard '{shard}' ({counts[shard]} vendors) -> {describe_store(persist_directory)}")
+        options = dict(
+            dedup=not args.no_dedup,
+            reset=args.reset_index,
+            resume=args.resume,
+            manifest_path=shard_manifest_path(shard, key),
+            persist_directory=persist_directory,
+            profile=args.index_profile,
+        )
+        records = iter_jsonl(shard_partition_path(shard, key))
+        with profile_section(f"index:{shard}"):
+            if args.pipelined:
+                print_pipeline_report(run_index_pipeline(records, embed_workers=args.embed_workers, **options))
+            else:
+                index_vendor_stream(records, **options)
+
+
+def print_stream_summary(stats: dict):
+    print(f"  Processed: {stats['success']} successful, {stats['fallback']} with fallback data, "
+          f"{stats['skipped']} skipped")
+    if "summaries" in stats:
+        print_summary_stats(stats["summaries"])
+    print(f"  Saved processed vendors to {PROCESSED_JSONL_PATH}")
 
 
 def main():
     """Run the full preprocessing pipeline."""
     args = parse_args()
 
-    print("=" * 60)
-    print("VENDOR DATA PREPROCESSING")
-    print("=" * 60)
+    with profiling(args.profile, args.profile_dir) as profiler:
+        print("=" * 60)
+        print("VENDOR DATA PREPROCESSING")
+        print("=" * 60)
 
-    # Step 1: Preprocess vendors
-    print("\n[Step 1] Preprocessing vendor data...")
-    processed = preprocess_vendors(RAW_DATA_PATH)
-    save_processed(processed, PROCESSED_DATA_PATH)
+        if SHARD_KEY:
+            run_sharded(args)
+        elif args.pipelined:
+            run_pipelined(args)
+        elif args.stream:
+            run_streaming(args)
+        else:
+            # Step 1: Preprocess vendors
+            print("\n[Step 1] Preprocessing vendor data...")
+            with profile_section("preprocess"):
+                processed = preprocess_all(args)
 
-    print(f"  Processed {len(processed)} vendors")
+            print(f"  Processed {len(processed)} vendors")
 
-    # Step 2: Create embeddings and index
-    print("\n[Step 2] Creating embeddings and indexing...")
-    vector_store = index_vendors_with_dedup(
-        PROCESSED_DATA_PATH,
-        dedup=not args.no_dedup,
-        reset=args.reset_index,
-    )
+            # Step 2: Create embeddings and index
+            print("\n[Step 2] Creating embeddings and indexing...")
+            with profile_section("index"):
+                index_vendors_with_dedup(
+                    PROCESSED_DATA_PATH,
+                    dedup=not args.no_dedup,
+                    reset=args.reset_index,
+                    resume=args.resume,
+                    profile=args.index_profile,
+                )
+
+        # Step 3: Verify with test search
+        print("\n[Step 3] Verifying index with test search...")
+        with profile_section("verify"):
+            query_embeddings = get_query_embeddings()
+            if SHARD_KEY:
+                from graph.shard_router import open_sharded_store
+
+                vs = open_sharded_store(query_embeddings)
+            else:
+                vs = load_vector_store(query_embeddings)
 
-    # Step 3: Verify with test search
-    print("\n[Step 3] Verifying index with test search...")
-    query_embeddings = get_query_embeddings()
-    vs = load_vector_store(query_embeddings)
+            test_query = "fire protection sprinkler systems"
+            results = vs.similarity_search_with_score(test_query, k=3)
 
-    test_query = "fire protection sprinkler systems"
-    results = vs.similarity_search_with_score(test_query, k=3)
+            print(f"\n  Test query: '{test_query}'")
+            print("  " + "-" * 40)
+            for i, (doc, score) in enumerate(results, 1):
+                print(f"  [{i}] {doc.metadata.get('company_name')} (score: {score:.4f})")
 
-    print(f"\n  Test query: '{test_query}'")
-    print("  " + "-" * 40)
-    for i, (doc, score) in enumerate(results, 1):
-        print(f"  [{i}] {doc.metadata.get('company_name')} (score: {score:.4f})")
+    if profiler is not None:
+        print("\n" + profiler.report())
 
     print("\n" + "=" * 60)
     print("PREPROCESSING COMPLETE")
@@ -78,4 +328,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except MissingAPIKeyError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -9,10 +9,18 @@ A LangGraph-based recommendation system that:
 Usage:
     python run_recommender.py                    # Interactive mode
     python run_recommender.py "your query here"  # Single query mode
+    python run_recommender.py --batch queries.txt --workers 4 --output results.jsonl
+    python run_recommender.py --profile cpu "your query here"  # Per-node cProfile (or mem: tracemalloc)
 """
 
+import argparse
+import json
 import sys
+import time
+from config import MissingAPIKeyError
 from graph.workflow import run_recommendation, print_results
+from graph.instrumentation import configure_logging
+from profiling import MODES as PROFILE_MODES, profiling
 
 
 def interactive_mode():
@@ -61,15 +69,83 @@ def single_query_mode(query: str):
     print_results(result)
 
 
+def read_queries(path: str) -> list[str]:
+    """Queries from a text file (one per line) or JSON Lines ({"query": ...} per line)."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = str(json.loads(line).get("query") or "").strip()
+            if line:
+                queries.append(line)
+    return queries
+
+
+def batch_mode(path: str, workers: int, output: str):
+    """Run every query of a file on worker processes and write one JSON line per result."""
+    from service.app import summarize_state
+    from service.workers import WorkerPool
+
+    queries = read_queries(path)
+    print(f"\nRunning {len(queries)} queries from {path}...")
+    with WorkerPool(workers) as pool:
+        print(f"  {pool.workers} workers ready")
+        start = time.perf_counter()
+        futures = [pool.submit(query) for query in queries]
+        errors = 0
+        with open(output, "w", encoding="utf-8") as out:
+            for query, future in zip(queries, futures):
+                try:
+                    body = summarize_state(future.result())
+                except Exception as e:
+                    body = {"query": query, "error": str(e)}
+                errors += bool(body.get("error"))
+                out.write(json.dumps(body, default=str) + "\n")
+        elapsed = time.perf_counter() - start
+    print(f"  {len(queries)} queries in {elapsed:.2f}s ({len(queries) / elapsed:.2f} queries/s), {errors} errors")
+    print(f"  Saved results to {output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recommend vendors for a job request.")
+    parser.add_argument("query", nargs="*", help="Job request (interactive mode when omitted).")
+    parser.add_argument("--batch", metavar="FILE", help="Run the queries in FILE (one per line, or JSONL).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch (default: WORKER_PROCESSES; 0 = one per CPU).")
+    parser.add_argument("--output", default="output/batch_results.jsonl", help="Results file for --batch.")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="Profile each graph node with cProfile (cpu) or tracemalloc (mem).")
+    parser.add_argument("--profile-dir", help="Directory for the profile files (default: a new one under PROFILE_DIR).")
+    args = parser.parse_args()
+    if args.profile and args.batch:
+        parser.error("--profile profiles this process; it cannot be combined with --batch (worker processes)")
+    return args
+
+
 def main():
     """Main entry point."""
-    if len(sys.argv) > 1:
-        # Single query from command line
-        query = " ".join(sys.argv[1:])
-        single_query_mode(query)
-    else:
-        # Interactive mode
-        interactive_mode()
+    args = parse_args()
+    configure_logging()
+
+    try:
+        with profiling(args.profile, args.profile_dir) as profiler:
+            if args.batch:
+                batch_mode(args.batch, args.workers, args.output)
+            elif args.query:
+                # Single query from command line
+                query = " ".join(args.query)
+                single_query_mode(query)
+            else:
+                # Interactive mode
+                interactive_mode()
+        if profiler is not None:
+            print("\n" + profiler.report())
+    except MissingAPIKeyError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
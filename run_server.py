@@ -0,0 +1,101 @@
+"""
+Vendor Recommender - HTTP Service
+
+Serves recommendations from a long-running process so the compiled graph,
+LLM clients and vector store stay warm between requests.
+
+Usage:
+    python run_server.py                         # Serve on 127.0.0.1:8000
+    python run_server.py --port 9000 --max-concurrency 16
+    python run_server.py --stub-llm              # Local load testing without Gemini
+    python run_server.py --workers 4             # Pipelines in 4 processes sharing a mapped index
+    QUERY_LOG=1 python run_server.py --prewarm 200  # Log queries; warm caches from the log
+
+    curl -X POST localhost:8000/recommend -d '{"query": "burst pipe in Leeds"}'
+    curl -N -X POST localhost:8000/recommend/stream -d '{"query": "burst pipe in Leeds"}'
+    curl localhost:8000/health
+"""
+
+import argparse
+
+from config import (
+    PREWARM_TOP_N,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_MAX_CONCURRENCY,
+    SERVICE_MAX_QUEUE,
+    SERVICE_REQUEST_TIMEOUT_S,
+    SERVICE_SHUTDOWN_GRACE_S,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the vendor recommendation HTTP service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=SERVICE_MAX_CONCURRENCY,
+                        help="Pipelines running at once.")
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE,
+                        help="Requests allowed to wait for a worker before 503.")
+    parser.add_argument("--timeout", type=float, default=SERVICE_REQUEST_TIMEOUT_S,
+                        help="Per-request deadline in seconds (504 when exceeded).")
+    parser.add_argument("--shutdown-grace", type=float, default=SERVICE_SHUTDOWN_GRACE_S,
+                        help="Seconds to drain in-flight requests on shutdown.")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="Run pipelines in N worker processes sharing a memory-mapped index "
+                             "(0 = one per CPU; default: in this process).")
+    parser.add_argument("--prewarm", type=int, default=PREWARM_TOP_N, metavar="N",
+                        help="After startup, run the N most frequent query-log queries to warm the caches.")
+    parser.add_argument("--stub-llm", action="store_true",
+                        help="Replace Gemini chat calls with the offline stand-in (load testing).")
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="Also replace query embeddings (index must be built with the same stand-in).")
+    parser.add_argument("--stub-latency", default="lognormal:0.3,0.3",
+                        help="Latency distribution for the stub LLM, e.g. const:0.2 or uniform:0.1,0.5.")
+    return parser.parse_args()
+
+
+def main():
+    """Start the ASGI service under uvicorn."""
+    args = parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required for the HTTP service: pip install uvicorn")
+
+    from graph.instrumentation import configure_logging
+    from service.app import create_app
+    from service.workers import resolve_workers
+
+    configure_logging()
+
+    worker_initializer, worker_initargs = None, ()
+    if args.stub_llm or args.stub_embeddings:
+        from benchmarks.fakes import install_stub_providers
+
+        worker_initializer = install_stub_providers
+        worker_initargs = (args.stub_latency if args.stub_llm else None, args.stub_embeddings)
+        install_stub_providers(*worker_initargs)
+
+    app = create_app(
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        request_timeout=args.timeout,
+        shutdown_grace=args.shutdown_grace,
+        prewarm_top_n=args.prewarm,
+        workers=0 if args.workers is None else resolve_workers(args.workers),
+        worker_initializer=worker_initializer,
+        worker_initargs=worker_initargs,
+    )
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        timeout_graceful_shutdown=int(args.shutdown_grace),
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""
+HTTP recommendation service (ASGI).
+"""
+
+from service.app import RecommenderApp, create_app
+
+__all__ = ["RecommenderApp", "create_app"]
@@ -0,0 +1,449 @@
+"""
+ASGI application serving vendor recommendations.
+
+Keeps the compiled graph, LLM clients and vector store warm for the life of
+the process, runs pipelines on a bounded worker pool with a bounded wait
+queue and per-request deadlines, and drains in-flight work on shutdown.
+With prewarm_top_n, the most frequent queries of the query log are run in
+the background after startup to fill the result caches. With workers > 0,
+/recommend pipelines run in that many worker processes sharing a
+memory-mapped index (service/workers.py); this process is their supervisor.
+
+Routes:
+    POST /recommend          {"query": "..."} -> ranked vendors (JSON)
+    POST /recommend/stream   {"query": "..."} -> per-node updates (Server-Sent Events)
+    POST /recommend/explain  {"query": "...", "candidate_ids": [...]} -> reasoning per vendor
+                             (written on demand and cached; two-phase rerank)
+    GET  /health             readiness, load and warm-up status
+    GET  /metrics            Prometheus text from graph.instrumentation
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+from config import (
+    PREWARM_TOP_N,
+    PREWARM_WORKERS,
+    REQUEST_DEADLINE_S,
+    SERVICE_MAX_CONCURRENCY,
+    SERVICE_MAX_QUEUE,
+    SERVICE_REQUEST_TIMEOUT_S,
+    SERVICE_SHUTDOWN_GRACE_S,
+)
+
+logger = logging.getLogger(__name__)
+
+_STREAM_END = object()
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted (queue full or draining)."""
+
+
+def summarize_state(state: dict) -> dict:
+    """Response body for a finished pipeline run."""
+    return {
+        "query": state.get("original_query"),
+        "extracted_info": state.get("extracted_info"),
+        "candidate_count": len(state.get("candidates") or []),
+        "ranked_vendors": state.get("ranked_vendors") or [],
+        "error": state.get("error"),
+        "cached": bool(state.get("result_cache")),
+        "semantic_match": state.get("semantic_match"),
+        "degradations": state.get("degradations") or [],
+    }
+
+
+class RecommenderApp:
+    """ASGI callable with bounded concurrency and graceful shutdown."""
+
+    def __init__(
+        self,
+        max_concurrency: int = SERVICE_MAX_CONCURRENCY,
+        max_queue: int = SERVICE_MAX_QUEUE,
+        request_timeout: float = SERVICE_REQUEST_TIMEOUT_S,
+        shutdown_grace: float = SERVICE_SHUTDOWN_GRACE_S,
+        prewarm_top_n: int = PREWARM_TOP_N,
+        workers: int = 0,
+        worker_initializer: Optional[Callable] = None,
+        worker_initargs: tuple = (),
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.shutdown_grace = shutdown_grace
+        self.prewarm_top_n = prewarm_top_n
+        self.workers = workers
+        self.worker_initializer = worker_initializer
+        self.worker_initargs = worker_initargs
+        self.worker_pool = None  # service.workers.WorkerPool when workers > 0
+
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="recommender")
+        self.slots = None  # asyncio.Semaphore, created on the server's event loop
+        self.inflight = 0
+        self.waiting = 0
+        self.draining = False
+        self.warm = False
+        self.warm_errors: list[str] = []
+        self.prewarm_status: dict = {"queries": 0, "done": 0, "errors": 0, "running": False}
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def warm_up(self):
+        """Build the graph and open shared clients before taking traffic."""
+        import providers
+        from graph.workflow import get_graph
+        from graph.nodes.retrieve import get_vector_store
+        from graph.catalog import get_catalog
+
+        get_graph()
+        providers.get_llm()
+        try:
+            if self.workers:
+                self.start_workers()
+            get_vector_store()
+            get_catalog()
+        except FileNotFoundError as e:
+            self.warm_errors.append(str(e))
+            logger.warning("[Service] %s", e)
+        self.warm = True
+
+    def start_workers(self):
+        """Start the worker processes; this process then searches the same mapped index."""
+        import config
+        from service.workers import WorkerPool
+
+        config.VECTOR_BACKEND = "mmap"
+        self.worker_pool = WorkerPool(
+            self.workers, initializer=self.worker_initializer, initargs=self.worker_initargs,
+        ).start()
+
+    def prewarm(self):
+        """
+        Run the top-N logged queries through the pipeline so the result and
+        semantic caches start warm. Runs alongside traffic with PREWARM_WORKERS
+        threads of its own and stops early when the service drains.
+        """
+        import config
+        from graph.query_log import suppressed, top_queries
+        from graph.workflow import run_recommendation
+
+        if not (config.RESULT_CACHE or config.SEMANTIC_CACHE):
+            logger.warning("[Service] Pre-warm skipped: RESULT_CACHE and SEMANTIC_CACHE are off")
+            return
+        queries = top_queries(self.prewarm_top_n)
+        status = self.prewarm_status
+        status.update(queries=len(queries), running=True)
+
+        def warm_one(query: str):
+            if self.draining:
+                return
+            try:
+                with suppressed():
+                    state = run_recommendation(query)
+                status["errors" if state.get("error") else "done"] += 1
+            except Exception as e:
+                status["errors"] += 1
+                logger.warning("[Service] Pre-warm failed for %r: %s", query, e)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=PREWARM_WORKERS, thread_name_prefix="prewarm") as pool:
+            list(pool.map(warm_one, queries))
+        status["running"] = False
+        logger.info("[Service] Pre-warmed %d/%d logged queries in %.2fs",
+                    status["done"], len(queries), time.perf_counter() - start)
+
+    async def startup(self):
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        start = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.warm_up)
+        logger.info("[Service] Warm in %.2fs", time.perf_counter() - start)
+        if self.prewarm_top_n > 0:
+            threading.Thread(target=self.prewarm, name="prewarm", daemon=True).start()
+
+    async def shutdown(self):
+        """Stop admitting requests and wait (up to the grace period) for in-flight work."""
+        self.draining = True
+        deadline = time.monotonic() + self.shutdown_grace
+        while (self.inflight or self.waiting) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.inflight:
+            logger.warning("[Service] Shutdown with %d requests still running", self.inflight)
+        if self.worker_pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.worker_pool.close)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------------------------------------------------------------
+    # Bounded execution
+    # -------------------------------------------------------------------------
+
+    async def _acquire_slot(self, timeout: float):
+        if self.draining:
+            raise Overloaded("Service is shutting down")
+        if not self.slots.locked():
+            # A free slot: acquired without waiting, so it never counts against max_queue
+            await self.slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                raise Overloaded("Request queue is full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), timeout)
+            finally:
+                self.waiting -= 1
+        self.inflight += 1
+
+    def _release_slot(self, _future=None):
+        self.inflight -= 1
+        self.slots.release()
+
+    def _submit(self, fn: Callable, *args) -> asyncio.Future:
+        """
+        Start fn on the worker pool (a slot must already be held).
+
+        The slot is released only when the worker actually finishes, so a
+        timed-out pipeline still counts against max_concurrency.
+        """
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def pipeline_deadline(self) -> float:
+        """
+        Deadline for a request arriving now (time.monotonic()): REQUEST_DEADLINE_S,
+        at most the service's request timeout, so the graph degrades before a 504.
+        """
+        budget = min(REQUEST_DEADLINE_S or self.request_timeout, self.request_timeout)
+        return time.monotonic() + budget
+
+    async def run_bounded(self, fn: Callable, *args):
+        """Run fn on the worker pool within the request deadline (queue wait included)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        await self._acquire_slot(self.request_timeout)
+        future = self._submit(fn, *args)
+        return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+
+    # -------------------------------------------------------------------------
+    # ASGI
+    # -------------------------------------------------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        path, method = scope["path"], scope["method"]
+
+        if path == "/health" and method == "GET":
+            return await self._health(send)
+        if path == "/metrics" and method == "GET":
+            from graph.instrumentation import metrics_prometheus
+            return await _send_body(send, 200, metrics_prometheus().encode(), b"text/plain; version=0.0.4")
+        if path == "/recommend/explain" and method in ("GET", "POST"):
+            payload = await _read_payload(scope, receive)
+            query = str(payload.get("query") or "").strip()
+            candidate_ids = payload.get("candidate_ids") or []
+            if isinstance(candidate_ids, str):
+                candidate_ids = [c for c in candidate_ids.split(",") if c]
+            if not query or not isinstance(candidate_ids, list) or not candidate_ids:
+                return await _send_json(send, 400, {"error": "Missing 'query' or 'candidate_ids'"})
+            return await self._explain(query, [str(c) for c in candidate_ids], send)
+        if path in ("/recommend", "/recommend/stream") and method in ("GET", "POST"):
+            query = await _read_query(scope, receive)
+            if not query:
+                return await _send_json(send, 400, {"error": "Missing 'query'"})
+            if path == "/recommend":
+                return await self._recommend(query, send)
+            return await self._recommend_stream(query, send)
+        return await _send_json(send, 404, {"error": f"No route for {method} {path}"})
+
+    async def _health(self, send):
+        from graph.explanations import explanation_stats
+        from graph.result_cache import result_cache_stats
+        from graph.semantic_cache import semantic_cache_stats
+        from graph.singleflight import coalescing_stats
+        from preprocessing.chroma_client import chroma_health
+
+        # A heartbeat round trip with CHROMA_MODE=http (cached for CHROMA_HEALTH_INTERVAL_S)
+        vector_store = await asyncio.get_running_loop().run_in_executor(None, chroma_health)
+        status = "draining" if self.draining else ("ok" if self.warm else "starting")
+        if status == "ok" and vector_store.get("ok") is False:
+            status = "vector_store_unavailable"
+        await _send_json(send, 200 if status == "ok" else 503, {
+            "status": status,
+            "warm": self.warm,
+            "warm_errors": self.warm_errors,
+            "prewarm": self.prewarm_status,
+            "inflight": self.inflight,
+            "queued": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "coalescing": coalescing_stats(),
+            "result_cache": result_cache_stats(),
+            "semantic_cache": semantic_cache_stats(),
+            "explanations": explanation_stats(),
+            "workers": self.worker_pool.stats() if self.worker_pool is not None else None,
+            "vector_store": vector_store,
+        })
+
+    async def _recommend(self, query: str, send):
+        from graph.workflow import run_recommendation
+
+        start = time.perf_counter()
+        try:
+            run = self.worker_pool.run if self.worker_pool is not None else run_recommendation
+            state = await self.run_bounded(run, query, self.pipeline_deadline())
+        except Overloaded as e:
+            return await _send_json(send, 503, {"error": str(e)}, [(b"retry-after", b"1")])
+        except asyncio.TimeoutError:
+            return await _send_json(send, 504, {"error": f"Request exceeded {self.request_timeout}s"})
+        except Exception as e:
+            logger.exception("[Service] Pipeline failed")
+            return await _send_json(send, 500, {"error": f"Pipeline failed: {e}"})
+
+        body = summarize_state(state)
+        body["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        await _send_json(send, 200, body)
+
+    async def _explain(self, query: str, candidate_ids: list[str], send):
+        from graph.explanations import get_explanations
+
+        try:
+            explanations = await self.run_bounded(get_explanations().explain, query, candidate_ids)
+        except Overloaded as e:
+            return await _send_json(send, 503, {"error": str(e)}, [(b"retry-after", b"1")])
+        except asyncio.TimeoutError:
+            return await _send_json(send, 504, {"error": f"Request exceeded {self.request_timeout}s"})
+        except Exception as e:
+            logger.exception("[Service] Explanation failed")
+            return await _send_json(send, 500, {"error": f"Explanation failed: {e}"})
+
+        await _send_json(send, 200, {
+            "query": query,
+            "explanations": explanations,
+            "missing": [cid for cid in candidate_ids if cid not in explanations],
+        })
+
+    async def _recommend_stream(self, query: str, send):
+        from graph.workflow import stream_recommendation
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        pipeline_deadline = self.pipeline_deadline()
+
+        def produce():
+            try:
+                for node, update in stream_recommendation(query, pipeline_deadline):
+                    loop.call_soon_threadsafe(events.put_nowait, (node, update))
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, ("error", {"error": f"Pipeline failed: {e}"}))
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, _STREAM_END)
+
+        try:
+            await self._acquire_slot(self.request_timeout)
+        except Overloaded as e:
+            return await _send_json(send, 503, {"error": str(e)}, [(b"retry-after", b"1")])
+        except asyncio.TimeoutError:
+            return await _send_json(send, 504, {"error": f"Request exceeded {self.request_timeout}s"})
+
+        deadline = loop.time() + self.request_timeout
+        self._submit(produce)
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+
+        try:
+            while True:
+                item = await asyncio.wait_for(events.get(), max(0.0, deadline - loop.time()))
+                if item is _STREAM_END:
+                    break
+                node, update = item
+                await send({"type": "http.response.body", "body": _sse(node, update), "more_body": True})
+            await send({"type": "http.response.body", "body": _sse("done", {}), "more_body": False})
+        except asyncio.TimeoutError:
+            payload = {"error": f"Request exceeded {self.request_timeout}s"}
+            await send({"type": "http.response.body", "body": _sse("error", payload), "more_body": False})
+
+
+# =============================================================================
+# HTTP helpers
+# =============================================================================
+
+async def _read_payload(scope, receive) -> dict:
+    """JSON body fields over the query-string parameters (?q= is short for ?query=)."""
+    params = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+    if "q" in params:
+        params.setdefault("query", params.pop("q"))
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            params.update(data)
+    return params
+
+
+async def _read_query(scope, receive) -> str:
+    """Query from a JSON body {"query": ...} or the ?q= / ?query= parameter."""
+    return str((await _read_payload(scope, receive)).get("query") or "").strip()
+
+
+async def _send_body(send, status: int, body: bytes, content_type: bytes, extra_headers=None):
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers + (extra_headers or [])})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, payload: dict, extra_headers=None):
+    body = json.dumps(payload, default=str).encode()
+    await _send_body(send, status, body, b"application/json", extra_headers)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+def create_app(**kwargs) -> RecommenderApp:
+    """Create the ASGI app (kwargs override the SERVICE_* config values)."""
+    return RecommenderApp(**kwargs)
+
+
+app = create_app()
@@ -0,0 +1,338 @@
+"""
+Multi-process execution: a supervisor and N worker processes.
+
+Worker processes each have their own interpreter, so CPU-bound work (JSON
+parsing, prompt building, vector search) runs on every core. Opening
+chroma_db in each of them would hold one copy of the index per process;
+instead the supervisor exports the vectors once (graph/mapped_index.py) and
+compiles the vendor catalog, and the workers map both read-only, sharing
+the pages through the OS page cache.
+
+The supervisor feeds queries to the workers through one work queue; each
+worker runs WORKER_THREADS queries at a time and sends the final states
+back on a result queue, which resolve the futures returned by submit(). A
+worker that dies is restarted, and the queries it had taken are re-queued
+(up to WORKER_MAX_RETRIES times).
+
+The supervisor and the workers share the explanation cache through a SQLite
+file (EXPLAIN_CACHE_DB, or WORKER_EXPLAIN_CACHE_DB), so reasoning a worker
+wrote in the background is found when the supervisor serves an explain request.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import count
+from typing import Callable, Optional
+
+from config import (
+    WORKER_EXPLAIN_CACHE_DB,
+    WORKER_MAX_RETRIES,
+    WORKER_PROCESSES,
+    WORKER_START_TIMEOUT_S,
+    WORKER_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised for a query whose worker process died on every attempt."""
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Worker count: None uses WORKER_PROCESSES, 0 means one per CPU."""
+    workers = WORKER_PROCESSES if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def process_memory() -> dict:
+    """
+    This process's memory in MB: rss (all resident pages, shared ones
+    included), pss (shared pages divided among the processes mapping them)
+    and private (pages no other process shares). Linux only; rss elsewhere.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    except OSError:
+        import resource
+
+        return {"rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "private_mb": round(private / 1024, 1),
+    }
+
+
+def prepare_shared_index():
+    """Compile the catalog and export the vectors for the current index (supervisor, before forking workers)."""
+    from graph.catalog import get_catalog
+    from graph.mapped_index import ensure_export
+
+    get_catalog()
+    ensure_export()
+
+
+def share_explanations():
+    """Back this process's explanation cache with the pool's SQLite file (before first use)."""
+    import config
+
+    if config.EXPLAIN_CACHE_DB is None:
+        config.EXPLAIN_CACHE_DB = WORKER_EXPLAIN_CACHE_DB
+
+
+def _worker_main(worker_id: int, tasks, results, threads: int, initializer: Optional[Callable], initargs: tuple):
+    """Worker process: load the shared index and run queries from the work queue."""
+    import config
+
+    config.VECTOR_BACKEND = "mmap"
+    share_explanations()
+    from graph.instrumentation import configure_logging
+
+    configure_logging()
+    if initializer is not None:
+        initializer(*initargs)
+
+    from graph.catalog import get_catalog
+    from graph.nodes.retrieve import get_vector_store
+    from graph.workflow import get_graph, run_recommendation
+
+    try:
+        get_graph()
+        get_vector_store()
+        get_catalog()
+    except Exception as e:
+        results.put(("failed", worker_id, None, f"{type(e).__name__}: {e}"))
+        return
+    results.put(("ready", worker_id, None, process_memory()))
+
+    def serve():
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            job_id, query, deadline = task
+            results.put(("started", worker_id, job_id, None))
+            try:
+                results.put(("done", worker_id, job_id, run_recommendation(query, deadline)))
+            except Exception as e:
+                results.put(("error", worker_id, job_id, f"{type(e).__name__}: {e}"))
+
+    pool = [threading.Thread(target=serve, name=f"worker-{worker_id}-{i}") for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(("exit", worker_id, None, process_memory()))
+
+
+class WorkerPool:
+    """Supervisor of worker processes fed through one work queue."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threads: int = WORKER_THREADS,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ):
+        self.workers = resolve_workers(workers)
+        self.threads = threads
+        self.initializer = initializer
+        self.initargs = initargs
+
+        # spawn: workers start from a clean interpreter, not a fork of a threaded parent
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes: dict[int, multiprocessing.Process] = {}
+        self._lock = threading.Lock()
+        self._jobs: dict[int, tuple[Future, str, Optional[float]]] = {}
+        self._taken: dict[int, set[int]] = {}  # worker -> jobs it started
+        self._attempts: dict[int, int] = {}
+        self._ids = count()
+        self._collector: Optional[threading.Thread] = None
+        self._closing = False  # No new queries or restarts
+        self._stopped = False  # Collector done (after the workers exited)
+        self.restarts = 0
+        self.completed = 0
+        self.memory: dict[int, dict] = {}  # worker -> memory at ready (updated at exit)
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self, timeout: float = WORKER_START_TIMEOUT_S) -> "WorkerPool":
+        """Prepare the shared index, start the workers and wait until each is ready."""
+        prepare_shared_index()
+        share_explanations()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        deadline = time.monotonic() + timeout
+        ready: set[int] = set()
+        while len(ready) < self.workers:
+            try:
+                kind, worker_id, _, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [w for w, process in self._processes.items() if w not in ready and not process.is_alive()]
+                if dead:
+                    self.close()
+                    raise RuntimeError(f"Worker {dead[0]} exited during start (code {self._processes[dead[0]].exitcode})")
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise TimeoutError(f"{self.workers - len(ready)} workers not ready after {timeout:g}s")
+                continue
+            if kind == "failed":
+                self.close()
+                raise RuntimeError(f"Worker {worker_id} failed to start: {payload}")
+            ready.add(worker_id)
+            self.memory[worker_id] = payload
+
+        self._collector = threading.Thread(target=self._collect, name="worker-supervisor", daemon=True)
+        self._collector.start()
+        logger.info("[Workers] %d workers ready (%d threads each)", self.workers, self.threads)
+        return self
+
+    def _spawn(self, worker_id: int):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._tasks, self._results, self.threads, self.initializer, self.initargs),
+            name=f"recommender-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._taken[worker_id] = set()
+
+    def close(self, timeout: float = 10.0):
+        """Let the workers finish queued queries, then stop them."""
+        self._closing = True
+        for _ in range(len(self._processes) * self.threads):
+            self._tasks.put(None)
+        deadline = time.monotonic() + timeout
+        # The collector keeps reading results meanwhile: a worker can't exit with unread results
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._stopped = True
+        if self._collector is not None:
+            self._collector.join(timeout=1.0)
+        self._drain_results()
+        with self._lock:
+            for future, _, _ in self._jobs.values():
+                future.set_exception(WorkerCrashed("Worker pool closed"))
+            self._jobs.clear()
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Work
+    # -------------------------------------------------------------------------
+
+    def submit(self, query: str, deadline: Optional[float] = None) -> Future:
+        """Queue a query; the future resolves to run_recommendation's final state."""
+        if self._closing:
+            raise RuntimeError("Worker pool is closed")
+        future: Future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            self._jobs[job_id] = (future, query, deadline)
+        self._tasks.put((job_id, query, deadline))
+        return future
+
+    def run(self, query: str, deadline: Optional[float] = None) -> dict:
+        """Run one query on a worker (blocking)."""
+        return self.submit(query, deadline).result()
+
+    def map(self, queries: list[str]) -> list[dict]:
+        """Run queries across the workers; states in input order."""
+        return [future.result() for future in [self.submit(q) for q in queries]]
+
+    # -------------------------------------------------------------------------
+    # Supervision
+    # -------------------------------------------------------------------------
+
+    def _collect(self):
+        while not self._stopped:
+            try:
+                message = self._results.get(timeout=0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            self._handle(message)
+
+    def _drain_results(self):
+        while True:
+            try:
+                self._handle(self._results.get_nowait())
+            except (queue.Empty, OSError, ValueError):
+                return
+
+    def _handle(self, message: tuple):
+        kind, worker_id, job_id, payload = message
+        if kind in ("ready", "exit"):
+            self.memory[worker_id] = payload
+            return
+        if kind == "started":
+            self._taken.setdefault(worker_id, set()).add(job_id)
+            return
+        if kind not in ("done", "error"):
+            return
+        self._taken.get(worker_id, set()).discard(job_id)
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            self._attempts.pop(job_id, None)
+        if job is None:
+            return
+        self.completed += 1
+        if kind == "done":
+            job[0].set_result(payload)
+        else:
+            job[0].set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive() or self._closing:
+                continue
+            logger.warning("[Workers] Worker %d exited (code %s); restarting", worker_id, process.exitcode)
+            lost = self._taken.pop(worker_id, set())
+            self.restarts += 1
+            self._spawn(worker_id)
+            for job_id in lost:
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                    attempts = self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+                    if job is not None and attempts > WORKER_MAX_RETRIES:
+                        del self._jobs[job_id]
+                if job is None:
+                    continue
+                if attempts > WORKER_MAX_RETRIES:
+                    job[0].set_exception(WorkerCrashed(f"Worker died running {job[1]!r}"))
+                else:
+                    self._tasks.put((job_id, job[1], job[2]))
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._jobs)
+        return {
+            "workers": self.workers,
+            "threads": self.threads,
+            "alive": sum(process.is_alive() for process in self._processes.values()),
+            "pending": pending,
+            "completed": self.completed,
+            "restarts": self.restarts,
+            "memory": {str(worker_id): memory for worker_id, memory in sorted(self.memory.items())},
+        }